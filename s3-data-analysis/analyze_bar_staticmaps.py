@@ -1,22 +1,14 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 from urllib.parse import urlparse
 import time
 
-def download_json(s3_path, local_path):
-    """从S3下载JSON文件"""
-    print(f"下载 {s3_path}")
-    cmd = ['aws', 's3', 'cp', s3_path, local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"下载失败: {result.stderr}")
+import catalog_store
+import s3_client
 
 def check_s3_file_exists(s3_path):
     """检查S3文件是否存在"""
-    cmd = ['aws', 's3', 'ls', s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return result.returncode == 0 and len(result.stdout.strip()) > 0
+    return s3_client.object_exists(s3_path)
 
 def extract_merchant_directory(photo_url):
     """从photos URL中提取商户目录"""
@@ -33,8 +25,7 @@ def extract_merchant_directory(photo_url):
 
 def analyze_staticmaps(json_file, env):
     """分析静态地图的存在情况"""
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = catalog_store.load(json_file)
     
     exists_list = []  # 清单A: 静态地图存在的商户
     missing_list = [] # 清单B: 静态地图缺失的商户
@@ -90,10 +81,6 @@ def main():
     print("# CCt#28: 分析Bar分类静态地图")
     print(f"开始时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # 下载JSON文件
-    download_json('s3://baliciaga-database/data/bars-dev.json', 'bars-dev.json')
-    download_json('s3://baliciaga-database/data/bars.json', 'bars.json')
-    
     # 分析两个环境
     dev_results = analyze_staticmaps('bars-dev.json', 'dev')
     prod_results = analyze_staticmaps('bars.json', 'prod')
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
-import json
-import subprocess
-import re
-from collections import defaultdict
+"""
+JSON文件URL一致性审计
+8个目录文件的全部引用由 catalog_reconcile 一次对账，相册不一致的URL之外同时报告S3中缺失和格式不对的引用；
+url_rules 规则集的逐条违规数单列一节。
+"""
+import catalog_reconcile
+import catalog_store
+import url_rules
 
 # 定义所有需要审计的文件及其预期路径
 AUDIT_CONFIG = [
@@ -64,79 +68,56 @@ AUDIT_CONFIG = [
     }
 ]
 
-def download_file(s3_path, local_file):
-    """下载S3文件"""
-    cmd = ['aws', 's3', 'cp', s3_path, local_file]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return result.returncode == 0
-
-def check_url_consistency(url, expected_path):
-    """检查URL是否包含预期路径"""
-    if not url:
-        return True  # 空URL不算错误
-    
-    # 检查URL中是否包含预期路径
-    return f"/{expected_path}/" in url
-
-def audit_json_file(config):
-    """审计单个JSON文件"""
+def audit_json_file(config, result):
+    """从对账结果中整理单个JSON文件的审计结果"""
     print(f"\n审计文件: {config['file']}")
     print(f"预期路径: {config['expected_path']}")
     
-    # 下载文件
-    if not download_file(config['s3_path'], config['file']):
-        print(f"  ❌ 无法下载文件")
+    if config['file'] in result.errors:
+        print(f"  ❌ 无法下载文件: {result.errors[config['file']]}")
         return None
+    entries = result.select(catalog=config['file'])
     
-    # 读取JSON
-    with open(config['file'], 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    def describe(entry):
+        return {
+            'merchant': entry['merchant'],
+            'field': entry['field'],
+            'url': entry['url'],
+            'expected_path': config['expected_path'],
+            'actual': entry['actual']
+        }
     
-    # 统计
-    total_items = len(data)
-    total_photos = 0
-    total_staticmaps = 0
-    incorrect_urls = []
-    
-    # 检查每个商户
-    for item in data:
-        merchant_name = item.get('name', 'Unknown')
-        
-        # 检查photos数组
-        if 'photos' in item and item['photos']:
-            for idx, photo_url in enumerate(item['photos']):
-                total_photos += 1
-                if not check_url_consistency(photo_url, config['expected_path']):
-                    incorrect_urls.append({
-                        'merchant': merchant_name,
-                        'field': f'photos[{idx}]',
-                        'url': photo_url,
-                        'expected_path': config['expected_path']
-                    })
-        
-        # 检查staticMapS3Url
-        if 'staticMapS3Url' in item and item['staticMapS3Url']:
-            total_staticmaps += 1
-            if not check_url_consistency(item['staticMapS3Url'], config['expected_path']):
-                incorrect_urls.append({
-                    'merchant': merchant_name,
-                    'field': 'staticMapS3Url',
-                    'url': item['staticMapS3Url'],
-                    'expected_path': config['expected_path']
-                })
+    incorrect_urls = [describe(e) for e in entries if e['class'] == 'wrong-album']
     
     # 返回审计结果
     return {
         'file': config['file'],
         'expected_path': config['expected_path'],
-        'total_items': total_items,
-        'total_photos': total_photos,
-        'total_staticmaps': total_staticmaps,
+        'total_items': result.loaded[config['file']],
+        'total_photos': sum(1 for e in entries if e['field'].startswith('photos')),
+        'total_staticmaps': sum(1 for e in entries if e['field'] == 'staticMapS3Url'),
         'incorrect_urls': incorrect_urls,
+        'missing_urls': [describe(e) for e in entries if e['class'] == 'missing'],
+        'wrong_format_urls': [describe(e) for e in entries if e['class'] == 'wrong-format'],
         'is_consistent': len(incorrect_urls) == 0
     }
 
-def generate_markdown_report(all_results):
+def generate_rule_section(counts, checked):
+    """url_rules 各规则在每个文件中的违规数"""
+    names = [r['name'] for r in url_rules.RULES]
+    lines = ["## URL规则检查\n"]
+    lines.append("| 文件 | " + " | ".join(names) + " |")
+    lines.append("|---" * (len(names) + 1) + "|")
+    for config in AUDIT_CONFIG:
+        cells = [f"{counts[config['file']][name]}/{checked[config['file']][name]}" for name in names]
+        lines.append(f"| {config['file']} | " + " | ".join(cells) + " |")
+    lines.append("")
+    for r in url_rules.RULES:
+        lines.append(f"- `{r['name']}`: {r['description']}")
+    lines.append("")
+    return "\n".join(lines)
+
+def generate_markdown_report(all_results, rule_section=None):
     """生成Markdown报告"""
     report = []
     report.append("# JSON文件URL一致性审计报告\n")
@@ -152,6 +133,9 @@ def generate_markdown_report(all_results):
     report.append(f"- ✅ 一致的文件：{consistent_files}")
     report.append(f"- ❌ 不一致的文件：{inconsistent_files}\n")
     
+    if rule_section:
+        report.append(rule_section)
+    
     # 详细结果
     report.append("## 详细审计结果\n")
     
@@ -164,6 +148,8 @@ def generate_markdown_report(all_results):
         report.append(f"- **商户总数**: {result['total_items']}")
         report.append(f"- **图片URL总数**: {result['total_photos']}")
         report.append(f"- **静态地图URL总数**: {result['total_staticmaps']}")
+        report.append(f"- **S3中缺失**: {len(result['missing_urls'])}")
+        report.append(f"- **格式不对**: {len(result['wrong_format_urls'])}")
         
         if result['is_consistent']:
             report.append("- **结果**: ✅ 一致")
@@ -187,25 +173,25 @@ def generate_markdown_report(all_results):
 def main():
     print("开始JSON文件URL一致性审计...")
     
-    all_results = []
+    # 一次对账覆盖全部文件
+    result = catalog_reconcile.run([config['file'] for config in AUDIT_CONFIG])
+    all_results = [audit_json_file(config, result) for config in AUDIT_CONFIG]
     
-    # 审计每个文件
-    for config in AUDIT_CONFIG:
-        result = audit_json_file(config)
-        all_results.append(result)
+    # 全部URL规则一次匹配（目录文件ETag未变时直接读本地缓存）
+    catalogs = {
+        config['file']: catalog_store.load(config['file'])
+        for config in AUDIT_CONFIG if config['file'] not in result.errors
+    }
+    _, counts, checked = url_rules.check_catalogs(catalogs)
     
     # 生成报告
-    report = generate_markdown_report(all_results)
+    report = generate_markdown_report(all_results, generate_rule_section(counts, checked))
     
     # 保存报告
     with open('url_consistency_audit_report.md', 'w', encoding='utf-8') as f:
         f.write(report)
     
     print("\n审计完成！报告已保存到 url_consistency_audit_report.md")
-    
-    # 清理下载的文件
-    for config in AUDIT_CONFIG:
-        subprocess.run(['rm', '-f', config['file']], capture_output=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
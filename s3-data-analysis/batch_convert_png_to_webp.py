@@ -1,141 +1,56 @@
 #!/usr/bin/env python3
-import subprocess
 import json
-import os
-import tempfile
-import shutil
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-def check_dependencies():
-    """检查必要的依赖"""
-    # 检查cwebp
-    try:
-        subprocess.run(['cwebp', '-version'], capture_output=True, check=True)
-        print("✓ cwebp 已安装")
-        return 'cwebp'
-    except:
-        print("⚠️  cwebp 未安装，尝试使用 ImageMagick...")
-        try:
-            subprocess.run(['convert', '-version'], capture_output=True, check=True)
-            print("✓ ImageMagick 已安装")
-            return 'imagemagick'
-        except:
-            print("❌ 未找到图片转换工具，尝试安装...")
-            # 尝试安装cwebp
-            try:
-                subprocess.run(['brew', 'install', 'webp'], check=True)
-                print("✓ 成功安装 cwebp")
-                return 'cwebp'
-            except:
-                print("❌ 无法安装必要的工具")
-                return None
-
-def convert_single_file(file_info, converter, temp_dir):
-    """转换单个PNG文件到WebP"""
-    try:
-        s3_path = file_info['path']
-        key = file_info['key']
-        album = file_info['album']
-        
-        # 生成本地临时文件路径
-        merchant_name = key.split('/')[-2]
-        png_path = os.path.join(temp_dir, f"{album}_{merchant_name}_staticmap.png")
-        webp_path = os.path.join(temp_dir, f"{album}_{merchant_name}_staticmap.webp")
-        
-        # 1. 下载PNG文件
-        download_cmd = ['aws', 's3', 'cp', s3_path, png_path]
-        result = subprocess.run(download_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return f"❌ 下载失败 {key}: {result.stderr}"
-        
-        # 2. 转换PNG到WebP
-        if converter == 'cwebp':
-            # 使用cwebp，质量设置为90
-            convert_cmd = ['cwebp', '-q', '90', png_path, '-o', webp_path]
-        else:
-            # 使用ImageMagick
-            convert_cmd = ['convert', png_path, '-quality', '90', webp_path]
-        
-        result = subprocess.run(convert_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return f"❌ 转换失败 {key}: {result.stderr}"
-        
-        # 3. 上传WebP文件到相同路径
-        webp_s3_path = s3_path.replace('staticmap.png', 'staticmap.webp')
-        upload_cmd = ['aws', 's3', 'cp', webp_path, webp_s3_path]
-        result = subprocess.run(upload_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return f"❌ 上传失败 {key}: {result.stderr}"
-        
-        # 4. 删除原始PNG文件
-        delete_cmd = ['aws', 's3', 'rm', s3_path]
-        result = subprocess.run(delete_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return f"⚠️  删除PNG失败 {key}: {result.stderr} (WebP已上传)"
-        
-        # 5. 清理临时文件
-        os.remove(png_path)
-        os.remove(webp_path)
-        
-        return f"✅ 成功 {key}"
-        
-    except Exception as e:
-        return f"❌ 错误 {file_info['key']}: {str(e)}"
+import image_transcoder
+import s3_client
+import transcode_pipeline
 
 def batch_convert_all():
     """批量转换所有PNG文件"""
-    # 检查依赖
-    converter = check_dependencies()
-    if not converter:
-        print("无法继续，缺少必要的转换工具")
-        return
-    
     # 加载文件列表
     with open('staticmap_pngs_to_convert.json', 'r', encoding='utf-8') as f:
         files = json.load(f)
     
     print(f"\n准备转换 {len(files)} 个文件...")
     
-    # 创建临时目录
-    temp_dir = tempfile.mkdtemp(prefix='png_to_webp_')
-    print(f"临时目录: {temp_dir}")
-    
     # 记录开始时间
     start_time = datetime.now()
     
-    # 使用线程池并行处理
+    # 下载/编码/上传三阶段流水线: I/O在线程里做，编码在按CPU核数创建的进程池里做，
+    # 阶段间用有界队列衔接；上传成功的原始PNG按每1000个一批删除
     successful = 0
     failed = 0
     results = []
+    all_stats = []
     
     print("\n开始批量转换...")
     print("=" * 80)
     
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        # 提交所有任务
-        future_to_file = {
-            executor.submit(convert_single_file, file_info, converter, temp_dir): file_info 
-            for file_info in files
-        }
-        
-        # 处理完成的任务
-        for future in as_completed(future_to_file):
-            file_info = future_to_file[future]
-            result = future.result()
+    pipeline = transcode_pipeline.TranscodePipeline(delete_source=True, quality=90)
+    jobs = [(f['path'], image_transcoder.webp_key_for(f['path'])) for f in files]
+    for s3_path, _, stats, error in pipeline.run(jobs):
+        key = s3_client.parse_s3_path(s3_path)[1]
+        if error is None:
+            successful += 1
+            all_stats.append(stats)
+            result = f"✅ 成功 {key}: {image_transcoder.format_stats(stats)}"
+        elif stats:
+            # WebP已上传（上传时已计为成功），这一批删除PNG失败
+            result = f"⚠️  删除PNG失败 {key}: {error} (WebP已上传)"
             results.append(result)
-            
-            if result.startswith("✅"):
-                successful += 1
-            else:
-                failed += 1
-            
-            # 实时显示进度
-            total_processed = successful + failed
-            print(f"[{total_processed}/{len(files)}] {result}")
+            print(f"    {result}")
+            continue
+        else:
+            failed += 1
+            result = f"❌ 错误 {key}: {str(error)}"
+        results.append(result)
+        
+        # 实时显示进度
+        print(f"[{successful + failed}/{len(files)}] {result}")
     
-    # 清理临时目录
-    shutil.rmtree(temp_dir)
+    print("\n流水线各阶段:")
+    print(pipeline.metrics.summary())
     
     # 计算耗时
     elapsed = datetime.now() - start_time
@@ -145,6 +60,10 @@ def batch_convert_all():
     print(f"转换完成！耗时: {elapsed}")
     print(f"✅ 成功: {successful} 个文件")
     print(f"❌ 失败: {failed} 个文件")
+    summary = image_transcoder.summarize(all_stats)
+    if all_stats:
+        print(f"总大小: {summary['src_bytes'] / 1024 / 1024:.1f} MB -> {summary['dst_bytes'] / 1024 / 1024:.1f} MB "
+              f"(压缩比 {summary['ratio']:.2f}), 编码总耗时 {summary['encode_ms'] / 1000:.1f} 秒")
     
     # 保存详细结果
     with open('conversion_results.json', 'w', encoding='utf-8') as f:
@@ -153,6 +72,7 @@ def batch_convert_all():
             'successful': successful,
             'failed': failed,
             'elapsed': str(elapsed),
+            'compression': summary,
             'details': results
         }, f, ensure_ascii=False, indent=2)
     
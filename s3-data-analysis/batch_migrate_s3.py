@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 import json
-import subprocess
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+import s3_client
+
 def extract_s3_path(cloudfront_url):
     """从CloudFront URL提取S3路径"""
     match = re.search(r'cloudfront\.net/(.+?)$', cloudfront_url)
@@ -15,12 +16,10 @@ def extract_s3_path(cloudfront_url):
 def copy_s3_file(source, destination):
     """执行单个S3复制操作"""
     try:
-        cmd = ['aws', 's3', 'cp', source, destination]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            return f"Success: {source} -> {destination}"
-        else:
-            return f"Failed: {source} -> {destination}: {result.stderr}"
+        s3_client.copy_object(source, destination)
+        return f"Success: {source} -> {destination}"
+    except s3_client.ClientError as e:
+        return f"Failed: {source} -> {destination}: {e}"
     except Exception as e:
         return f"Error: {source} -> {destination}: {str(e)}"
 
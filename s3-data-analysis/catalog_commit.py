@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+批量原子提交目录JSON
+先把多个目录文件的新内容暂存，提交时:
+  1. 并发上传到 data/.staging/<commit_id>/ 下
+  2. 校验线上文件的ETag没有在读取之后被别人改过
+  3. 备份线上版本后，用服务端复制把暂存文件并发换上线；任何一个失败都回滚到备份
+  4. 对所有变更路径只发一次CloudFront失效请求
+返回一条提交记录，取代每个文件各自上传+各自失效的做法。
+"""
+import hashlib
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+import catalog_store
+import s3_client
+
+DISTRIBUTION_ID = 'E2OWVXNIWJXMFR'
+STAGING_PREFIX = 'data/.staging/'
+
+
+def serialize(data):
+    """与现有脚本一致的JSON格式"""
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def create_invalidation(paths, distribution_id=DISTRIBUTION_ID):
+    """对一组路径发起一次CloudFront失效，返回失效ID"""
+    client = boto3.client('cloudfront')
+    result = client.create_invalidation(
+        DistributionId=distribution_id,
+        InvalidationBatch={
+            'Paths': {'Quantity': len(paths), 'Items': sorted(paths)},
+            'CallerReference': f"catalog-{uuid.uuid4().hex}"
+        }
+    )
+    return result['Invalidation']['Id']
+
+
+class CatalogCommit:
+    """暂存多个目录文件的修改并一次性提交"""
+
+    def __init__(self, message='', distribution_id=DISTRIBUTION_ID, max_workers=8):
+        self.message = message
+        self.distribution_id = distribution_id
+        self.max_workers = max_workers
+        self.staged = {}
+
+    def stage(self, json_file, data, base_etag=None):
+        """暂存一个目录文件的新内容；base_etag为读取时的ETag，用于提交前的冲突检查"""
+        body = serialize(data)
+        entry = catalog_store.cached_entry(json_file)
+        if base_etag is None and entry:
+            base_etag = entry['etag']
+        # 内容与线上缓存一致时无需提交
+        if entry and entry['etag'] == base_etag and entry['sha256'] == hashlib.sha256(body).hexdigest():
+            self.staged.pop(json_file, None)
+            return False
+        self.staged[json_file] = {'body': body, 'base_etag': base_etag}
+        return True
+
+    def _run_parallel(self, fn, items):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fn, items))
+
+    def commit(self, dry_run=False):
+        """提交所有暂存的文件，返回提交记录"""
+        commit_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:8]
+        started = time.time()
+        files = sorted(self.staged)
+        record = {
+            'id': commit_id,
+            'message': self.message,
+            'files': [],
+            'invalidation_id': None,
+            'dry_run': dry_run
+        }
+        if not files:
+            print("ℹ️  没有需要提交的目录文件变更")
+            return record
+        if dry_run:
+            for json_file in files:
+                print(f"  [DRY RUN] Would commit {catalog_store.catalog_key(json_file)}")
+                record['files'].append({'file': json_file, 'bytes': len(self.staged[json_file]['body'])})
+            return record
+
+        staging = f"s3://{s3_client.BUCKET}/{STAGING_PREFIX}{commit_id}/"
+        live = {f: f"s3://{s3_client.BUCKET}/{catalog_store.catalog_key(f)}" for f in files}
+
+        try:
+            # 1. 并发上传到暂存区
+            self._run_parallel(
+                lambda f: s3_client.upload_bytes(self.staged[f]['body'], staging + f, 'application/json'),
+                files
+            )
+
+            # 2. 冲突检查并备份线上版本
+            def check_and_backup(json_file):
+                head = s3_client.head_object(live[json_file])
+                current = head['ETag'].strip('"') if head else None
+                base = self.staged[json_file]['base_etag']
+                if base is not None and current != base:
+                    raise Exception(f"{json_file} 在读取后已被修改 (ETag {base} -> {current})")
+                if head:
+                    s3_client.copy_object(live[json_file], staging + 'backup/' + json_file)
+                return current
+            previous = dict(zip(files, self._run_parallel(check_and_backup, files)))
+
+            # 3. 换上线，失败时回滚
+            def publish(json_file):
+                try:
+                    return json_file, s3_client.copy_object(staging + json_file, live[json_file]), None
+                except Exception as e:
+                    return json_file, None, e
+            results = self._run_parallel(publish, files)
+            failed = [(f, e) for f, _, e in results if e is not None]
+            if failed:
+                for json_file, _, error in results:
+                    if error is None and previous[json_file] is not None:
+                        s3_client.copy_object(staging + 'backup/' + json_file, live[json_file])
+                    elif error is None:
+                        s3_client.delete_object(live[json_file])
+                raise Exception(f"提交失败，已回滚: {failed[0][0]}: {failed[0][1]}")
+        finally:
+            s3_client.delete_prefix(staging)
+
+        for json_file, etag, _ in results:
+            catalog_store.remember(json_file, self.staged[json_file]['body'], etag)
+            record['files'].append({
+                'file': json_file,
+                'etag': etag.strip('"'),
+                'previous_etag': previous[json_file],
+                'bytes': len(self.staged[json_file]['body'])
+            })
+
+        # 4. 一次失效覆盖所有变更路径
+        paths = [f"/{catalog_store.catalog_key(f)}" for f in files]
+        try:
+            record['invalidation_id'] = create_invalidation(paths, self.distribution_id)
+        except Exception as e:
+            print(f"⚠️  CloudFront失效请求失败: {e}")
+        record['elapsed'] = round(time.time() - started, 3)
+        self.staged = {}
+        return record
+
+
+def print_commit(record):
+    """打印提交记录"""
+    print(f"\n提交 {record['id']}: {record['message']}")
+    for item in record['files']:
+        print(f"  ✅ {item['file']} ({item['bytes']} bytes)")
+    if record['invalidation_id']:
+        print(f"  CloudFront失效: {record['invalidation_id']} ({len(record['files'])} 个路径)")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+带索引的商户目录模型
+把 data/*.json（经 catalog_store 缓存）和 data-to-migrate/*.prod.json 载入内存，
+按 placeId、slug、标准化名称、商户相册目录（从photos URL推出）建立哈希索引，
+让原来 O(n·m) 的嵌套循环对账变成 O(n+m) 的哈希连接。
+"""
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import catalog_store
+
+MIGRATION_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data-to-migrate'
+)
+MIGRATION_FILES = {
+    'cafes.prod.json': 'cafe',
+    'dining.prod.json': 'dining',
+    'bars.prod.json': 'bar',
+    'coworking.prod.json': 'cowork'
+}
+
+PLACE_ID_SUFFIX = re.compile(r'_(ChIJ[A-Za-z0-9_-]+)$')
+ALBUM_SEGMENT = re.compile(r'^(cafe|dining|bar|cowork)-image-(dev|prod)$|^image-v2$')
+
+
+def normalize_name(name):
+    """把商户名或目录名标准化为与相册目录一致的小写短横线格式（去掉placeId后缀、重音和撇号）"""
+    if not name:
+        return ''
+    name = PLACE_ID_SUFFIX.sub('', name.strip().rstrip('/'))
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    name = re.sub(r"['’]", '', name.lower())
+    return re.sub(r'[^a-z0-9]+', '-', name).strip('-')
+
+
+def split_place_id(directory):
+    """把 merchant_ChIJxxx 目录拆成 (商户目录, placeId)，没有placeId时placeId为None"""
+    directory = directory.rstrip('/')
+    match = PLACE_ID_SUFFIX.search(directory)
+    if match:
+        return directory[:match.start()], match.group(1)
+    return directory, None
+
+
+def merchant_directory(url):
+    """从photos/staticMap URL或S3 key中提取商户目录（相册下的第一级目录）"""
+    if not url:
+        return None
+    path = urlparse(url).path if '://' in url else url
+    parts = path.strip('/').split('/')
+    for i, part in enumerate(parts[:-1]):
+        if ALBUM_SEGMENT.match(part):
+            return parts[i + 1] if i + 2 < len(parts) else None
+    return None
+
+
+class Catalog:
+    """内存中的商户目录，带 placeId / slug / 名称 / 目录 四个哈希索引"""
+
+    def __init__(self):
+        self.records = []
+        self.by_place_id = defaultdict(list)
+        self.by_slug = defaultdict(list)
+        self.by_name = defaultdict(list)
+        self.by_directory = defaultdict(list)
+
+    def add(self, item, source, category=None, env=None):
+        """加入一个商户条目并更新索引"""
+        record = {'item': item, 'source': source, 'category': category, 'env': env}
+        self.records.append(record)
+        if item.get('placeId'):
+            self.by_place_id[item['placeId']].append(record)
+        if item.get('slug'):
+            self.by_slug[item['slug']].append(record)
+        if item.get('name'):
+            self.by_name[normalize_name(item['name'])].append(record)
+
+        directories = set()
+        for url in (item.get('photos') or []) + [item.get('staticMapS3Url')]:
+            directory = merchant_directory(url)
+            if directory:
+                directories.add(normalize_name(directory))
+        for directory in directories:
+            self.by_directory[directory].append(record)
+        return record
+
+    def add_items(self, items, source, category=None, env=None):
+        for item in items:
+            self.add(item, source, category, env)
+
+    def find_by_place_id(self, place_id):
+        return self.by_place_id.get(place_id, [])
+
+    def find_by_slug(self, slug):
+        return self.by_slug.get(slug, [])
+
+    def find_by_name(self, name):
+        return self.by_name.get(normalize_name(name), [])
+
+    def find_by_directory(self, directory):
+        return self.by_directory.get(normalize_name(split_place_id(directory)[0]), [])
+
+    def find(self, key):
+        """按 placeId -> 目录 -> slug -> 名称 的顺序查找商户"""
+        _, place_id = split_place_id(key)
+        return (
+            self.find_by_place_id(place_id or key)
+            or self.find_by_directory(key)
+            or self.find_by_slug(key)
+            or self.find_by_name(key)
+        )
+
+    def search(self, fragment):
+        """模糊查找: 标准化名称以 fragment 开头的商户，没有时退回包含它的商户（忽略短横线）
+        在名称索引的键上线性扫描，供 find 精确查找落空时使用"""
+        needle = normalize_name(fragment)
+        if not needle:
+            return []
+        prefix = [r for name, records in self.by_name.items() if name.startswith(needle) for r in records]
+        if prefix:
+            return prefix
+        compact = needle.replace('-', '')
+        return [r for name, records in self.by_name.items() if compact in name.replace('-', '') for r in records]
+
+    def __len__(self):
+        return len(self.records)
+
+    @classmethod
+    def load(cls, json_files=None, include_migration=True):
+        """从S3目录文件（默认8个）和 data-to-migrate 载入"""
+        catalog = cls()
+        for json_file in json_files or catalog_store.CATALOG_FILES:
+            album = catalog_store.album_for(json_file) or ''
+            category, _, env = album.partition('-image-')
+            catalog.add_items(catalog_store.load(json_file), json_file, category or None, env or None)
+        if include_migration:
+            for filename, category in MIGRATION_FILES.items():
+                path = os.path.join(MIGRATION_DIR, filename)
+                if os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        catalog.add_items(json.load(f), filename, category, 'migrate')
+        return catalog
+
+    @classmethod
+    def from_local_files(cls, paths):
+        """从本地JSON文件载入"""
+        catalog = cls()
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                album = catalog_store.album_for(path) or ''
+                category, _, env = album.partition('-image-')
+                catalog.add_items(data, os.path.basename(path), category or None, env or None)
+        return catalog
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+目录引用与桶清单对账
+comprehensive_staticmap_audit / staticmap_comprehensive_scan / audit_all_json_urls / verify_migration_results /
+final_verification 各自重新下载目录、重新列举相册再做一遍同样的比较。这里统一成一次对账:
+8个目录文件中的每个 photos / staticMapS3Url 引用和 s3_inventory 快照中8个相册的每个对象，
+各建一次哈希索引后线性连接，每个引用归入一类:
+
+    correct       在目录对应的相册里，对象存在，扩展名为 .webp
+    wrong-album   指向别的相册（另一环境、另一分类或 image-v2）
+    wrong-format  在正确相册但扩展名不是 .webp，或对象不存在而同一商户的对象在别的路径/扩展名下存在
+    missing       在正确相册，对象不存在，也找不到替代对象
+另外相册中既没有被引用、也不是某个 wrong-format 引用的替代对象的图片归为 orphaned（尺寸变体除外）。
+
+默认增量对账: 上次的逐商户结果按目录文件ETag和相册清单哈希保存在本地，重跑时只评估条目变化了、
+或所在商户目录有新增/修改/删除对象的商户，其余直接合并上次结果。--full 时全部重新评估。
+
+    python3 catalog_reconcile.py                              # 全部8个目录文件和8个相册
+    python3 catalog_reconcile.py --field staticMapS3Url --json report.json
+    python3 catalog_reconcile.py --full
+    python3 catalog_reconcile.py --self-test                  # 随机变更目录和桶，校验增量结果与全量一致
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import catalog_index
+import catalog_store
+import photo_variants
+import promotion_manifest
+import s3_client
+import s3_inventory
+import url_extractor
+
+CLASSES = ('correct', 'missing', 'wrong-album', 'wrong-format', 'orphaned')
+FIELDS = ('photos', 'staticMapS3Url')
+EXPECTED_EXTENSION = '.webp'
+IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.avif')
+STATE_PATH = os.environ.get(
+    'RECONCILE_STATE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.reconcile_state.json')
+)
+STATE_VERSION = 1
+SELF_TEST_ROUNDS = 40
+
+
+def object_kind(key):
+    """按文件名区分静态地图和照片"""
+    return 'staticmap' if 'static' in key.rsplit('/', 1)[-1].lower() else 'photo'
+
+
+def item_references(item, json_file, album, fields=FIELDS):
+    """一个商户条目中的引用 [{catalog, album, merchant, placeId, field, url, key}]"""
+    refs = []
+    base = {
+        'catalog': json_file, 'expected_album': album,
+        'merchant': item.get('name', 'Unknown'), 'placeId': item.get('placeId')
+    }
+    if 'photos' in fields:
+        for i, url in enumerate(item.get('photos') or []):
+            if isinstance(url, str) and url:
+                refs.append(dict(base, field=f'photos[{i}]', url=url, key=url_extractor.parse_url(url).key))
+    if 'staticMapS3Url' in fields and isinstance(item.get('staticMapS3Url'), str) and item['staticMapS3Url']:
+        url = item['staticMapS3Url']
+        refs.append(dict(base, field='staticMapS3Url', url=url, key=url_extractor.parse_url(url).key))
+    return refs
+
+
+class BucketIndex:
+    """一次遍历清单建立的哈希索引: key集合、去扩展名的key、按 (相册, placeId/目录) 的静态地图"""
+
+    def __init__(self, inventory, albums=None):
+        self.albums = set(albums or s3_client.ALBUMS)
+        self.keys = {}
+        self.by_stem = {}
+        self.maps_by_place_id = {}
+        self.maps_by_directory = {}
+        for album in sorted(self.albums):
+            for key, entry in inventory.objects(f"{album}/"):
+                if not key.lower().endswith(IMAGE_EXTENSIONS) or photo_variants.is_variant(key):
+                    continue
+                self.keys[key] = entry
+                self.by_stem.setdefault(os.path.splitext(key)[0], []).append(key)
+                if object_kind(key) == 'staticmap':
+                    directory = catalog_index.merchant_directory(key)
+                    if directory:
+                        base, place_id = catalog_index.split_place_id(directory)
+                        if place_id:
+                            self.maps_by_place_id.setdefault((album, place_id), key)
+                        self.maps_by_directory.setdefault((album, catalog_index.normalize_name(base)), key)
+
+    def alternative(self, ref):
+        """引用的对象不存在或格式不对时，同一商户的替代对象"""
+        key = ref['key']
+        siblings = [k for k in self.by_stem.get(os.path.splitext(key)[0], []) if k != key]
+        preferred = [k for k in siblings if k.endswith(EXPECTED_EXTENSION)]
+        if preferred or siblings:
+            return (preferred or siblings)[0]
+        if object_kind(key) != 'staticmap' or key in self.keys:
+            return None
+        album = ref['expected_album']
+        directory = catalog_index.merchant_directory(key) or ''
+        return (
+            self.maps_by_place_id.get((album, ref['placeId']))
+            or self.maps_by_directory.get((album, catalog_index.normalize_name(ref['merchant'])))
+            or self.maps_by_directory.get((album, catalog_index.normalize_name(directory)))
+        )
+
+    def classify(self, ref):
+        """就地为引用填上 class / exists / actual，返回引用"""
+        album = ref['key'].split('/', 1)[0]
+        ref['album'] = album
+        ref['exists'] = ref['key'] in self.keys if album in self.albums else None
+        ref['actual'] = None
+        if album != ref['expected_album']:
+            ref['class'] = 'wrong-album'
+        elif ref['exists'] and ref['key'].lower().endswith(EXPECTED_EXTENSION):
+            ref['class'] = 'correct'
+        else:
+            ref['actual'] = self.alternative(ref)
+            ref['class'] = 'wrong-format' if ref['exists'] or ref['actual'] else 'missing'
+        return ref
+
+
+class Reconciliation:
+    """对账结果: entries 为全部引用，orphans 为没有被引用的对象 [{key, album, kind}]，
+    objects 为参与对账的相册对象 {key: 清单条目}，loaded 为 {目录文件: 商户数}，errors 为载入失败的 {目录文件: 异常}"""
+
+    def __init__(self, entries, orphans, objects=None, loaded=None, errors=None):
+        self.entries = entries
+        self.orphans = orphans
+        self.objects = objects or {}
+        self.loaded = loaded or {}
+        self.errors = errors or {}
+        self.stats = None
+
+    def select(self, cls=None, catalog=None, album=None, kind=None):
+        """按分类 / 目录文件 / 期望相册 / 对象类型筛选引用"""
+        return [
+            e for e in self.entries
+            if (cls is None or e['class'] == cls)
+            and (catalog is None or e['catalog'] == catalog)
+            and (album is None or e['expected_album'] == album)
+            and (kind is None or object_kind(e['key']) == kind)
+        ]
+
+    def orphaned(self, album=None, kind=None):
+        return [
+            o for o in self.orphans
+            if (album is None or o['album'] == album) and (kind is None or o['kind'] == kind)
+        ]
+
+    def keys(self, album=None, kind=None):
+        """参与对账的相册对象key"""
+        return sorted(
+            key for key in self.objects
+            if (album is None or key.split('/', 1)[0] == album) and (kind is None or object_kind(key) == kind)
+        )
+
+    def counts(self):
+        """{目录文件: Counter(分类)}，孤立对象按相册计入 orphaned"""
+        counts = defaultdict(Counter)
+        for e in self.entries:
+            counts[e['catalog']][e['class']] += 1
+        for o in self.orphans:
+            counts[o['album']]['orphaned'] += 1
+        return counts
+
+    def to_json(self):
+        return {'entries': self.entries, 'orphans': self.orphans}
+
+
+def find_orphans(bucket, entries, fields=FIELDS):
+    """相册中既没有被引用、也不是替代对象的图片"""
+    referenced = set()
+    for e in entries:
+        # 格式错误引用的替代对象是修复目标，不算孤立
+        referenced.update(key for key in (e['key'], e['actual']) if key)
+    # 只引用了静态地图时照片都会被当成孤立对象，孤立对象只统计被审计的类型
+    kinds = {'photo' if field == 'photos' else 'staticmap' for field in fields}
+    return [
+        {'key': key, 'album': key.split('/', 1)[0], 'kind': object_kind(key)}
+        for key in bucket.keys
+        if key not in referenced and object_kind(key) in kinds
+    ]
+
+
+def reconcile(catalogs, inventory, albums=None, fields=FIELDS, bucket=None):
+    """catalogs 为 {目录文件: 条目列表或逐条产出条目的迭代器}；返回 Reconciliation"""
+    bucket = bucket or BucketIndex(inventory, albums)
+    entries = []
+    loaded = {}
+    for json_file, data in catalogs.items():
+        album = catalog_store.album_for(json_file)
+        loaded[json_file] = 0
+        for item in data:
+            loaded[json_file] += 1
+            entries.extend(bucket.classify(ref) for ref in item_references(item, json_file, album, fields))
+    return Reconciliation(entries, find_orphans(bucket, entries, fields), bucket.keys, loaded)
+
+
+# ---- 增量对账 ----
+# 本地状态按 (审计字段, 目录文件) 保存上次的逐商户结果，以及当时各相册清单的哈希:
+#   相册哈希 = 各商户目录哈希的哈希，目录哈希 = 目录下 (key, ETag) 列表的哈希
+# 目录文件ETag和相册哈希都没变时直接合并上次结果；否则只重新评估条目有变化、
+# 或依赖的 (相册, 目录 / placeId / 商户名) 下有新增、修改、删除对象的商户。
+
+def merchant_hash(item, fields=FIELDS):
+    """只覆盖对账用到的字段，条目其他字段的修改不触发重新评估"""
+    relevant = {name: item.get(name) for name in ('name', 'placeId', *fields)}
+    return hashlib.sha256(json.dumps(relevant, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _directory_tokens(album, directory):
+    """一个商户目录的变化会影响的依赖标记"""
+    base, place_id = catalog_index.split_place_id(directory)
+    tokens = {f"dir|{album}|{directory}", f"name|{album}|{catalog_index.normalize_name(base)}"}
+    if place_id:
+        tokens.add(f"place|{album}|{place_id}")
+    return tokens
+
+
+def dependencies(refs):
+    """商户的对账结果依赖的标记: 引用和替代对象所在目录，以及期望相册下的 placeId / 商户名 / 目录名"""
+    tokens = set()
+    for ref in refs:
+        for key in (ref['key'], ref['actual']):
+            if key:
+                tokens.add(f"dir|{key.split('/', 1)[0]}|{catalog_index.merchant_directory(key) or ''}")
+        album = ref['expected_album']
+        if ref['placeId']:
+            tokens.add(f"place|{album}|{ref['placeId']}")
+        tokens.add(f"name|{album}|{catalog_index.normalize_name(ref['merchant'])}")
+        tokens.add(f"name|{album}|{catalog_index.normalize_name(catalog_index.merchant_directory(ref['key']) or '')}")
+    return sorted(tokens)
+
+
+def listing_hashes(bucket):
+    """{相册: (相册哈希, {目录: 目录哈希})}"""
+    digests = defaultdict(hashlib.sha256)
+    for key in sorted(bucket.keys):
+        album = key.split('/', 1)[0]
+        digests[(album, catalog_index.merchant_directory(key) or '')].update(
+            f"{key}\0{bucket.keys[key]['etag']}\n".encode('utf-8')
+        )
+    listings = {album: {} for album in bucket.albums}
+    for (album, directory), digest in digests.items():
+        listings[album][directory] = digest.hexdigest()
+    return {
+        album: (hashlib.sha256(json.dumps(dirs, sort_keys=True).encode('utf-8')).hexdigest(), dirs)
+        for album, dirs in listings.items()
+    }
+
+
+def changed_tokens(previous_dirs, current_dirs, album):
+    tokens = set()
+    for directory in set(previous_dirs) | set(current_dirs):
+        if previous_dirs.get(directory) != current_dirs.get(directory):
+            tokens |= _directory_tokens(album, directory)
+    return tokens
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'version': STATE_VERSION, 'runs': {}, 'listings': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    return state if state.get('version') == STATE_VERSION else {'version': STATE_VERSION, 'runs': {}, 'listings': {}}
+
+
+def save_state(state, path=STATE_PATH):
+    # 回收不再被任何目录文件引用的清单快照
+    used = {h for run in state['runs'].values() for c in run.values() for h in c['albums'].values()}
+    state['listings'] = {h: dirs for h, dirs in state['listings'].items() if h in used}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def reconcile_incremental(catalogs, etags, bucket, fields=FIELDS, state=None):
+    """与 reconcile 结果相同，但复用 state 中未受影响商户的上次结果；就地更新 state
+    返回的 Reconciliation.stats 为 {reused, evaluated, catalogs_unchanged}"""
+    state = state if state is not None else load_state()
+    run_state = state['runs'].setdefault(','.join(fields), {})
+    listings = listing_hashes(bucket)
+    for album_hash, dirs in listings.values():
+        state['listings'][album_hash] = dirs
+    stats = {'reused': 0, 'evaluated': 0, 'catalogs_unchanged': 0}
+    entries = []
+    loaded = {}
+
+    for json_file, data in catalogs.items():
+        album = catalog_store.album_for(json_file)
+        previous = run_state.get(json_file)
+        current_albums = {a: h for a, (h, _) in listings.items()}
+        dirty = set()
+        if previous and set(previous['albums']) == set(current_albums):
+            for a, h in current_albums.items():
+                if previous['albums'][a] != h:
+                    old_dirs = state['listings'].get(previous['albums'][a])
+                    if old_dirs is None:
+                        previous = None
+                        break
+                    dirty |= changed_tokens(old_dirs, listings[a][1], a)
+        else:
+            previous = None
+
+        if previous and previous['etag'] == etags.get(json_file) and not dirty:
+            stats['catalogs_unchanged'] += 1
+            stats['reused'] += len(previous['merchants'])
+            loaded[json_file] = len(previous['merchants'])
+            for merchant in previous['merchants'].values():
+                entries.extend(merchant['entries'])
+            previous['albums'] = current_albums
+            # 流式读取时目录内容无需下载，直接关闭响应流
+            if hasattr(data, 'close'):
+                data.close()
+            continue
+
+        merchants = {}
+        old_merchants = previous['merchants'] if previous else {}
+        for item in data:
+            name = promotion_manifest.entry_key(item)
+            suffix = 1
+            while name in merchants:
+                suffix += 1
+                name = f"{promotion_manifest.entry_key(item)}#{suffix}"
+            digest = merchant_hash(item, fields)
+            old = old_merchants.get(name)
+            if old and old['hash'] == digest and not dirty.intersection(old['deps']):
+                merchants[name] = old
+                stats['reused'] += 1
+            else:
+                refs = [bucket.classify(ref) for ref in item_references(item, json_file, album, fields)]
+                merchants[name] = {'hash': digest, 'entries': refs, 'deps': dependencies(refs)}
+                stats['evaluated'] += 1
+            entries.extend(merchants[name]['entries'])
+        loaded[json_file] = len(merchants)
+        run_state[json_file] = {'etag': etags.get(json_file), 'albums': current_albums, 'merchants': merchants}
+
+    result = Reconciliation(entries, find_orphans(bucket, entries, fields), bucket.keys, loaded)
+    result.stats = stats
+    return result
+
+
+def run(json_files=None, fields=FIELDS, incremental=True):
+    """流式读取目录文件（ETag未变时读本地缓存）并和清单快照对账；incremental 时复用上次未受影响的结果
+    各目录文件的条件请求并行发出，条目在对账时逐个解析，不在内存中保留整个文件"""
+    json_files = json_files or catalog_store.CATALOG_FILES
+    catalogs = {}
+    etags = {}
+    errors = {}
+
+    def load(json_file):
+        try:
+            return json_file, catalog_store.stream_with_etag(json_file), None
+        except Exception as e:
+            return json_file, None, e
+
+    with ThreadPoolExecutor(max_workers=len(json_files)) as executor:
+        for json_file, loaded, error in executor.map(load, json_files):
+            if error:
+                errors[json_file] = error
+            else:
+                catalogs[json_file], etags[json_file] = loaded
+    albums = [catalog_store.album_for(json_file) for json_file in json_files]
+    albums = sorted({album for album in albums if album})
+    bucket = BucketIndex(s3_inventory.load_inventory(albums), albums)
+    if incremental:
+        state = load_state()
+        result = reconcile_incremental(catalogs, etags, bucket, fields, state)
+        save_state(state)
+    else:
+        result = reconcile(catalogs, None, albums, fields, bucket)
+    result.errors = errors
+    return result
+
+
+def print_summary(result, json_files=None):
+    counts = result.counts()
+    header = f"{'':<20}" + ''.join(f"{cls:>14}" for cls in CLASSES)
+    print(header)
+    for json_file in json_files or catalog_store.CATALOG_FILES:
+        album = catalog_store.album_for(json_file)
+        row = dict(counts.get(json_file, {}), orphaned=counts.get(album, {}).get('orphaned', 0))
+        print(f"{json_file:<20}" + ''.join(f"{row.get(cls, 0):>14}" for cls in CLASSES))
+
+
+# ---- 自检 ----
+
+_SELF_TEST_CATALOGS = ('bars-dev.json', 'bars.json', 'cafes-dev.json')
+_SELF_TEST_NAMES = ('Platonic', 'The Shady Fox', 'Black Sand Brewery', 'Miss Fish', 'Hippie Fish',
+                    'La Baracca', "Te'amo", 'Amolas Cafe', 'Motion Cafe', 'Crate Cafe')
+_SELF_TEST_FILES = ('photo_1.webp', 'photo_2.png', 'photo_3.jpg', 'staticmap.webp', 'staticmap.png',
+                    'map_static.webp', f'{photo_variants.VARIANT_DIR}/photo_1_640w.webp')
+
+
+def _self_test_key(rng, merchants, albums, album=None):
+    """随机对象key: 多数在 album（期望相册），其余在另一环境/分类的相册或 image-v2，目录带或不带 placeId"""
+    name, place_id = rng.choice(merchants)
+    slug = catalog_index.normalize_name(name)
+    directory = rng.choice((slug, f"{slug}_{place_id}", name.replace("'", '')))
+    if album is None or rng.random() < 0.25:
+        album = rng.choice(albums + ['image-v2'])
+    return f"{album}/{directory}/{rng.choice(_SELF_TEST_FILES)}"
+
+
+def _self_test_item(rng, merchants, albums, album):
+    name, place_id = rng.choice(merchants)
+    item = {'name': name, 'rating': rng.randint(1, 5)}
+    if rng.random() < 0.8:
+        item['placeId'] = place_id
+    item['photos'] = [f"https://d2cmxnft4myi1k.cloudfront.net/{_self_test_key(rng, merchants, albums, album)}"
+                      for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.8:
+        item['staticMapS3Url'] = f"https://d2cmxnft4myi1k.cloudfront.net/{_self_test_key(rng, merchants, albums, album)}"
+    return item
+
+
+def _self_test_mutate(rng, catalogs, objects, merchants, albums):
+    """对目录或桶做一次随机变更"""
+    json_file = rng.choice(_SELF_TEST_CATALOGS)
+    data = catalogs[json_file]
+    album = catalog_store.album_for(json_file)
+    action = rng.choice(('photo', 'staticmap', 'add-item', 'remove-item', 'rating', 'reorder',
+                         'add-object', 'remove-object', 'etag', 'reference-object'))
+    if action == 'photo' and data:
+        item = rng.choice(data)
+        photos = item.setdefault('photos', [])
+        if photos and rng.random() < 0.5:
+            photos.pop(rng.randrange(len(photos)))
+        else:
+            photos.append(f"https://d2cmxnft4myi1k.cloudfront.net/{_self_test_key(rng, merchants, albums, album)}")
+    elif action == 'staticmap' and data:
+        rng.choice(data)['staticMapS3Url'] = f"https://d2cmxnft4myi1k.cloudfront.net/{_self_test_key(rng, merchants, albums, album)}"
+    elif action == 'add-item':
+        data.insert(rng.randint(0, len(data)), _self_test_item(rng, merchants, albums, album))
+    elif action == 'remove-item' and data:
+        data.pop(rng.randrange(len(data)))
+    elif action == 'rating' and data:
+        rng.choice(data)['rating'] = rng.randint(1, 5)
+    elif action == 'reorder':
+        rng.shuffle(data)
+    elif action == 'remove-object' and objects:
+        del objects[rng.choice(sorted(objects))]
+    elif action == 'etag' and objects:
+        objects[rng.choice(sorted(objects))]['etag'] = f"{rng.getrandbits(128):032x}"
+    elif action == 'reference-object' and data:
+        # 让某个引用的对象出现，覆盖 missing -> correct / wrong-format 的转变
+        refs = item_references(rng.choice(data), json_file, album)
+        if refs:
+            key = rng.choice(refs)['key']
+            if key.split('/', 1)[0] in albums:
+                objects[key] = {'size': 1024, 'etag': f"{rng.getrandbits(128):032x}", 'mtime': ''}
+    else:
+        key = _self_test_key(rng, merchants, albums, album)
+        if key.split('/', 1)[0] in albums:
+            objects[key] = {'size': 1024, 'etag': f"{rng.getrandbits(128):032x}", 'mtime': ''}
+    return f"{json_file} {action}"
+
+
+def self_test(rounds=SELF_TEST_ROUNDS, seed=20240601):
+    """随机生成目录和桶清单，每轮做几次随机变更后比较增量对账和全量对账的结果
+    状态每轮经 save_state / load_state 往返一次，和真实运行一样从磁盘读取上次结果"""
+    rng = random.Random(seed)
+    albums = sorted({catalog_store.album_for(f) for f in _SELF_TEST_CATALOGS})
+    merchants = [(name, 'ChIJ' + ''.join(rng.choice('abcdefghijkLMNOP0123456789_-') for _ in range(10)))
+                 for name in _SELF_TEST_NAMES]
+    catalogs = {f: [_self_test_item(rng, merchants, albums, catalog_store.album_for(f)) for _ in range(rng.randint(4, 8))]
+                for f in _SELF_TEST_CATALOGS}
+    objects = {}
+    for _ in range(120):
+        key = _self_test_key(rng, merchants, albums, rng.choice(albums))
+        if key.split('/', 1)[0] in albums:
+            objects[key] = {'size': 1024, 'etag': f"{rng.getrandbits(128):032x}", 'mtime': ''}
+
+    root = tempfile.mkdtemp(prefix='catalog_reconcile_')
+    inventory_path = os.path.join(root, 'inventory.json')
+    state_path = os.path.join(root, 'state.json')
+    totals = Counter()
+    for round_no in range(rounds + 1):
+        actions = [] if round_no == 0 else [
+            _self_test_mutate(rng, catalogs, objects, merchants, albums) for _ in range(rng.randint(1, 3))
+        ]
+        with open(inventory_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': s3_inventory.SNAPSHOT_VERSION, 'albums': {
+                album: {'refreshed_at': time.time(),
+                        'objects': {k: dict(e) for k, e in objects.items() if k.startswith(f"{album}/")}}
+                for album in albums
+            }}, f)
+        bucket = BucketIndex(s3_inventory.Inventory(inventory_path), albums)
+        etags = {f: hashlib.md5(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+                 for f, data in catalogs.items()}
+        state = load_state(state_path)
+        for fields in (FIELDS, ('staticMapS3Url',)):
+            full = reconcile({f: json.loads(json.dumps(data)) for f, data in catalogs.items()},
+                             None, albums, fields, BucketIndex(s3_inventory.Inventory(inventory_path), albums))
+            incremental = reconcile_incremental({f: iter(json.loads(json.dumps(data))) for f, data in catalogs.items()},
+                                                etags, bucket, fields, state)
+            assert incremental.to_json() == full.to_json(), f"第{round_no}轮 {','.join(fields)} 结果不一致: {actions}"
+            assert incremental.loaded == full.loaded, f"第{round_no}轮 {','.join(fields)} 商户数不一致: {actions}"
+            totals.update(incremental.stats)
+            for counter in full.counts().values():
+                totals.update(counter)
+        save_state(state, state_path)
+
+    print(f"{rounds} 轮随机变更，增量对账与全量对账一致")
+    print(f"  重新评估 {totals['evaluated']} 个商户, 沿用上次结果 {totals['reused']} 个, "
+          f"未变化的目录文件 {totals['catalogs_unchanged']} 个")
+    print('  ' + ', '.join(f"{cls} {totals[cls]}" for cls in CLASSES))
+    assert totals['reused'] and totals['evaluated'] and totals['catalogs_unchanged']
+    assert all(totals[cls] for cls in CLASSES)
+
+
+def main():
+    args = sys.argv[1:]
+    if '--self-test' in args:
+        self_test()
+        return
+    fields = FIELDS
+    output = None
+    if '--field' in args:
+        i = args.index('--field')
+        fields = (args[i + 1],)
+        del args[i:i + 2]
+    if '--json' in args:
+        i = args.index('--json')
+        output = args[i + 1]
+        del args[i:i + 2]
+    json_files = [a for a in args if not a.startswith('--')] or catalog_store.CATALOG_FILES
+
+    start = time.time()
+    result = run(json_files, fields, incremental='--full' not in args)
+    print(f"对账 {len(result.entries)} 个引用, {len(result.orphans)} 个孤立对象 ({time.time() - start:.2f} 秒)")
+    if result.stats:
+        print(f"增量: 重新评估 {result.stats['evaluated']} 个商户, 沿用上次结果 {result.stats['reused']} 个 "
+              f"(未变化的目录文件 {result.stats['catalogs_unchanged']} 个)")
+    print()
+    for json_file, error in result.errors.items():
+        print(f"❌ 无法载入 {json_file}: {error}")
+    print_summary(result, json_files)
+
+    for cls in ('wrong-album', 'wrong-format', 'missing'):
+        entries = result.select(cls)
+        if not entries:
+            continue
+        print(f"\n{cls}: {len(entries)} 个")
+        for e in entries[:20]:
+            actual = f" -> {e['actual']}" if e['actual'] else ''
+            print(f"  {e['catalog']} {e['merchant']} {e['field']}: {e['key']}{actual}")
+        if len(entries) > 20:
+            print(f"  ... 还有 {len(entries) - 20} 个")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result.to_json(), f, ensure_ascii=False, indent=2)
+        print(f"\n详细结果已保存到 {output}")
+
+
+if __name__ == "__main__":
+    main()
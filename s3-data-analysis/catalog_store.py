@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+商户目录JSON存储
+cafes / dining / bars / cowork 的 data/*.json 在本地按内容寻址缓存（sha256），
+每次读取用 If-None-Match 带上缓存的ETag向S3做条件请求：文件未变时只花一次304往返，
+直接返回已解析的对象。
+stream / stream_with_etag 经 catalog_stream 逐个产出商户条目，下载时边解析边写入缓存，不在内存中保留整个文件。
+
+    python3 catalog_store.py   # 预热/校验全部8个目录文件的缓存
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import catalog_stream
+import s3_client
+from s3_client import ClientError
+
+CACHE_DIR = os.environ.get(
+    'CATALOG_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.catalog_cache')
+)
+DATA_PREFIX = 'data/'
+
+# 四个分类在dev/prod两个环境下的目录文件和相册
+CATEGORIES = [
+    {
+        'name': 'cafe',
+        'dev_json': 'cafes-dev.json',
+        'prod_json': 'cafes.json',
+        'dev_album': 'cafe-image-dev',
+        'prod_album': 'cafe-image-prod'
+    },
+    {
+        'name': 'dining',
+        'dev_json': 'dining-dev.json',
+        'prod_json': 'dining.json',
+        'dev_album': 'dining-image-dev',
+        'prod_album': 'dining-image-prod'
+    },
+    {
+        'name': 'bar',
+        'dev_json': 'bars-dev.json',
+        'prod_json': 'bars.json',
+        'dev_album': 'bar-image-dev',
+        'prod_album': 'bar-image-prod'
+    },
+    {
+        'name': 'cowork',
+        'dev_json': 'cowork-dev.json',
+        'prod_json': 'cowork.json',
+        'dev_album': 'cowork-image-dev',
+        'prod_album': 'cowork-image-prod'
+    }
+]
+
+CATALOG_FILES = [c[f'{env}_json'] for c in CATEGORIES for env in ('dev', 'prod')]
+
+_index_lock = threading.Lock()
+
+
+def catalog_key(json_file):
+    """目录文件名 -> S3 key"""
+    return json_file if json_file.startswith(DATA_PREFIX) else DATA_PREFIX + json_file
+
+
+def album_for(json_file):
+    """目录文件对应的相册"""
+    name = os.path.basename(json_file)
+    for category in CATEGORIES:
+        for env in ('dev', 'prod'):
+            if category[f'{env}_json'] == name:
+                return category[f'{env}_album']
+    return None
+
+
+def _index_path():
+    return os.path.join(CACHE_DIR, 'index.json')
+
+
+def _blob_path(digest):
+    return os.path.join(CACHE_DIR, 'objects', f"{digest}.json")
+
+
+def _read_index():
+    if not os.path.exists(_index_path()):
+        return {}
+    with open(_index_path(), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def cached_entry(json_file):
+    """返回缓存索引中的条目 {etag, sha256, fetched_at}，没有则返回None"""
+    with _index_lock:
+        return _read_index().get(catalog_key(json_file))
+
+
+def remember(json_file, body, etag):
+    """把一份目录文件内容写入内容寻址缓存并更新索引"""
+    digest = hashlib.sha256(body).hexdigest()
+    blob = _blob_path(digest)
+    if not os.path.exists(blob):
+        _write_atomic(blob, body)
+    _update_index(json_file, digest, etag)
+    return digest
+
+
+def _update_index(json_file, digest, etag):
+    with _index_lock:
+        index = _read_index()
+        previous = index.get(catalog_key(json_file))
+        index[catalog_key(json_file)] = {
+            'etag': etag.strip('"'),
+            'sha256': digest,
+            'fetched_at': time.time()
+        }
+        _write_atomic(_index_path(), json.dumps(index, indent=2).encode('utf-8'))
+        # 回收不再被引用的旧内容
+        if previous and previous['sha256'] != digest:
+            if all(e['sha256'] != previous['sha256'] for e in index.values()):
+                try:
+                    os.remove(_blob_path(previous['sha256']))
+                except FileNotFoundError:
+                    pass
+
+
+class _CachingBody:
+    """包装S3响应流: 读取的同时写入临时文件并计算sha256，读完后落入内容寻址缓存"""
+
+    def __init__(self, json_file, body, etag):
+        self.json_file = json_file
+        self.body = body
+        self.etag = etag
+        self.sha256 = hashlib.sha256()
+        self.tmp_path = os.path.join(CACHE_DIR, 'objects', f".{os.getpid()}.{threading.get_ident()}.{id(self)}.tmp")
+        os.makedirs(os.path.dirname(self.tmp_path), exist_ok=True)
+        self.tmp = open(self.tmp_path, 'wb')
+
+    def read(self, size=-1):
+        data = self.body.read(size)
+        if data:
+            self.sha256.update(data)
+            self.tmp.write(data)
+        elif not self.tmp.closed:
+            self.tmp.close()
+            digest = self.sha256.hexdigest()
+            os.replace(self.tmp_path, _blob_path(digest))
+            _update_index(self.json_file, digest, self.etag)
+        return data
+
+    def close(self):
+        """未读完就关闭时丢弃临时文件"""
+        self.body.close()
+        if not self.tmp.closed:
+            self.tmp.close()
+            os.remove(self.tmp_path)
+
+
+def open_with_etag(json_file):
+    """条件获取目录文件，返回 (二进制流, ETag)；未变化时是本地缓存文件，否则是边读边缓存的S3响应流"""
+    key = catalog_key(json_file)
+    entry = cached_entry(json_file)
+    blob = _blob_path(entry['sha256']) if entry else None
+    params = {'Bucket': s3_client.BUCKET, 'Key': key}
+    if blob and os.path.exists(blob):
+        params['IfNoneMatch'] = f'"{entry["etag"]}"'
+
+    try:
+        response = s3_client.get_client().get_object(**params)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+            return open(blob, 'rb'), entry['etag']
+        raise
+
+    etag = response['ETag'].strip('"')
+    return _CachingBody(json_file, response['Body'], etag), etag
+
+
+def fetch_bytes(json_file):
+    """条件获取目录文件，返回 (原始字节, ETag)；未变化时直接读本地缓存"""
+    fp, etag = open_with_etag(json_file)
+    try:
+        return b''.join(iter(lambda: fp.read(catalog_stream.CHUNK_SIZE), b'')), etag
+    finally:
+        fp.close()
+
+
+def load_with_etag(json_file):
+    """返回 (已解析的目录对象, ETag)"""
+    body, etag = fetch_bytes(json_file)
+    return json.loads(body), etag
+
+
+def load(json_file):
+    """返回已解析的目录对象"""
+    return load_with_etag(json_file)[0]
+
+
+def stream_with_etag(json_file):
+    """返回 (逐个产出商户条目的 catalog_stream.RecordStream, ETag)；ETag在读取条目之前就已确定"""
+    fp, etag = open_with_etag(json_file)
+    return catalog_stream.RecordStream(fp), etag
+
+
+def stream(json_file):
+    """逐个产出目录文件中的商户条目"""
+    return stream_with_etag(json_file)[0]
+
+
+def save_local(json_file, local_path):
+    """把目录文件写到本地路径（给仍需要本地文件的脚本使用）"""
+    body, _ = fetch_bytes(json_file)
+    _write_atomic(os.path.abspath(local_path), body)
+    return local_path
+
+
+def main():
+    for json_file in CATALOG_FILES:
+        before = cached_entry(json_file)
+        start = time.time()
+        data, etag = load_with_etag(json_file)
+        status = '命中缓存' if before and before['etag'] == etag else '已下载'
+        print(f"{json_file}: {len(data)} 个商户, ETag {etag}, {status}, {(time.time() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+目录JSON的流式读写
+目录文件是商户条目组成的顶层数组，随 openingPeriods / photos 等字段线性增长，
+各脚本却都先 json.load 整个文件。这里按块读取任意二进制流（本地文件、S3 GetObject 的 Body），
+用 json.JSONDecoder.raw_decode 逐个解出数组元素，每解出一个商户就产出一个，
+内存只保留当前商户和一个读缓冲块；写出时同样逐条序列化，格式与 catalog_commit.serialize 一致。
+
+    python3 catalog_stream.py backup/cafes-dev.json      # 本地文件
+    python3 catalog_stream.py cafes-dev.json             # 目录文件名: 经 catalog_store 从S3/缓存流式读取
+    python3 catalog_stream.py --self-test                # 仓库内所有JSON数组文件在各种块大小下与 json.load 对比
+"""
+import codecs
+import io
+import json
+import os
+import sys
+import threading
+
+CHUNK_SIZE = 64 * 1024
+# 自测用的块大小: 1/2/3/7 让元素、数字、转义和多字节字符都落在块边界上
+SELF_TEST_CHUNK_SIZES = (1, 2, 3, 7, 64, 1000)
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """流上的文本缓冲: 按需读块、增量UTF-8解码，丢弃已消费的前缀"""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def more(self, size=None):
+        """再读一块，没有更多数据时返回False"""
+        if self.eof:
+            return False
+        data = self.fp.read(size or self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(data or b'', final=not data)
+        self.pos = 0
+        self.eof = not data
+        return True
+
+    def peek(self):
+        """跳过空白，返回下一个字符（流结束时返回空串）"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.more():
+                return self.buffer[self.pos:self.pos + 1]
+
+
+def _error(reader, message):
+    return ValueError(f"{message}: {reader.buffer[reader.pos:reader.pos + 40]!r}")
+
+
+def iter_records(fp, chunk_size=CHUNK_SIZE):
+    """从二进制流中逐个产出顶层数组的元素"""
+    reader = _Reader(fp, chunk_size)
+    if reader.peek() != '[':
+        raise _error(reader, "目录文件不是JSON数组")
+    reader.pos += 1
+    if reader.peek() == ']':
+        reader.pos += 1
+    else:
+        while True:
+            # 元素跨块时按倍增的块大小补读后重新解析，单个商户的重复解析次数为对数级
+            size = chunk_size
+            while True:
+                reader.peek()
+                try:
+                    record, end = _decoder.raw_decode(reader.buffer, reader.pos)
+                except json.JSONDecodeError:
+                    if not reader.more(size):
+                        raise _error(reader, "目录文件在元素中截断或格式错误")
+                    size *= 2
+                    continue
+                # 元素后必须看到 , 或 ]，否则块边界上的数字等可能只解析了一半
+                tail = reader.buffer[end:].lstrip(WHITESPACE)
+                if tail[:1] in (',', ']') or not reader.more(size):
+                    break
+            reader.pos = end
+            delimiter = reader.peek()
+            reader.pos += 1
+            yield record
+            if delimiter == ']':
+                break
+            if delimiter != ',':
+                reader.pos -= 1
+                raise _error(reader, "目录文件数组元素之间缺少逗号" if delimiter else "目录文件在数组结束前截断")
+    if reader.peek():
+        raise _error(reader, "目录文件数组之后还有多余内容")
+
+
+class RecordStream:
+    """iter_records 的迭代器包装: 读完、出错或 close() 时关闭底层流（尚未开始迭代时也会关闭）"""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self._records = iter_records(fp, chunk_size)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._records)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._records.close()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_records(path, chunk_size=CHUNK_SIZE):
+    """本地文件路径的逐条读取"""
+    return RecordStream(open(path, 'rb'), chunk_size)
+
+
+def write_records(records, fp):
+    """把条目逐条写成JSON数组到二进制流，返回条目数；输出与 json.dumps(list, ensure_ascii=False, indent=2) 相同"""
+    count = 0
+    for record in records:
+        body = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        fp.write((',\n  ' if count else '[\n  ').encode('utf-8') + body.encode('utf-8'))
+        count += 1
+    fp.write(b'\n]' if count else b'[]')
+    return count
+
+
+def save_records(records, path):
+    """逐条写到本地文件（先写临时文件再原子替换），返回条目数"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            count = write_records(records, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def _array_files(root):
+    """root 下所有顶层为数组的JSON文件 [(路径, 原始字节, json.loads结果)]"""
+    found = []
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in ('.git', 'node_modules', '__pycache__'))
+        for name in sorted(files):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            try:
+                expected = json.loads(data)
+            except ValueError:
+                continue
+            if isinstance(expected, list):
+                found.append((path, data, expected))
+    return found
+
+
+def self_test(root=None, chunk_sizes=SELF_TEST_CHUNK_SIZES):
+    """逐条读出的结果在任意块大小下都与 json.load 相同，write_records 与 json.dumps(indent=2) 逐字节相同，
+    截断、缺逗号、多余内容都报错"""
+    root = root or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cases = [(f"<{i}>", text.encode('utf-8'), json.loads(text)) for i, text in enumerate([
+        '[]', ' [ ] ', '[0]', '[-12.5e-3, 1E+2, 0.0, 7]', '[true,false,null]',
+        '["a\\"b", "\\u00e9\\ud83d\\ude00", "中文", "\\\\"]',
+        '[{"a": [1, {"b": []}], "c": "x,y]"}, [[]], {}]', '\n[\n  1 ,\n  2\n]\n'
+    ])]
+    cases.append(('<bom>', '\ufeff[1, "é"]'.encode('utf-8'), [1, 'é']))
+    files = _array_files(root)
+    for path, data, expected in cases + files:
+        for chunk_size in chunk_sizes:
+            with RecordStream(io.BytesIO(data), chunk_size) as records:
+                assert list(records) == expected, (path, chunk_size)
+        output = io.BytesIO()
+        assert write_records(expected, output) == len(expected)
+        assert output.getvalue() == json.dumps(expected, ensure_ascii=False, indent=2).encode('utf-8'), path
+
+    for text in ['', '{}', '[1', '[1,', '[1 2]', '[1]x', '[1,]', '["a]']:
+        for chunk_size in chunk_sizes:
+            try:
+                list(RecordStream(io.BytesIO(text.encode('utf-8')), chunk_size))
+            except ValueError:
+                continue
+            raise AssertionError(f"应当报错: {text!r} (块大小 {chunk_size})")
+
+    print(f"{len(files)} 个JSON数组文件 + {len(cases)} 个构造用例 × 块大小 {chunk_sizes}: 与 json.load 一致")
+
+
+def main():
+    import catalog_store
+
+    if '--self-test' in sys.argv[1:]:
+        self_test()
+        return
+    for path in sys.argv[1:] or catalog_store.CATALOG_FILES:
+        records = open_records(path) if os.path.exists(path) else catalog_store.stream(path)
+        count = 0
+        largest = 0
+        for record in records:
+            count += 1
+            largest = max(largest, len(json.dumps(record, ensure_ascii=False)))
+        print(f"{path}: {count} 个商户, 最大单条 {largest / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
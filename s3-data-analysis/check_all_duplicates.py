@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import subprocess
+import s3_client
 
 # 定义要处理的重复目录对
 duplicate_pairs = [
@@ -18,14 +18,8 @@ environments = ['dev', 'prod']
 
 def count_files_in_directory(s3_path):
     """统计S3目录中的文件数量"""
-    cmd = ['aws', 's3', 'ls', s3_path, '--recursive']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        lines = result.stdout.strip().split('\n')
-        # 过滤掉空行和目录本身
-        files = [line for line in lines if line.strip() and not line.endswith('/')]
-        return len(files)
-    return 0
+    # 过滤掉目录占位对象
+    return sum(1 for obj in s3_client.list_objects(s3_path) if not obj['Key'].endswith('/'))
 
 print("# CCt#24: 重复目录内容检查报告\n")
 
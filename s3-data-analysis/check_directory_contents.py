@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
-import subprocess
+import s3_client
 
 def list_directory_contents(s3_path):
     """列出S3目录的内容"""
-    cmd = ['aws', 's3', 'ls', s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        return result.stdout.strip()
-    else:
-        return f"Error: {result.stderr}"
+    try:
+        lines = [f"PRE {d}" for d in s3_client.list_directories(s3_path)]
+        for obj in s3_client.list_objects(s3_path):
+            name = obj['Key'][len(s3_client.parse_s3_path(s3_path)[1]):]
+            if '/' not in name:
+                lines.append(f"{obj['LastModified']:%Y-%m-%d %H:%M:%S} {obj['Size']:>10} {name}")
+        return '\n'.join(lines)
+    except Exception as e:
+        return f"Error: {e}"
 
 # 检查几个例子
 test_dirs = [
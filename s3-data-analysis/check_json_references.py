@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
+import s3_client
+
 # 定义要处理的重复目录对
 duplicate_pairs = [
     ('Honeycomb Hookah & Eatery/', 'honeycomb-hookah-eatery/'),
@@ -16,8 +17,8 @@ duplicate_pairs = [
 
 # 下载JSON文件
 print("下载JSON文件...")
-subprocess.run(['aws', 's3', 'cp', 's3://baliciaga-database/data/bars-dev.json', 'bars-dev.json'], check=True)
-subprocess.run(['aws', 's3', 'cp', 's3://baliciaga-database/data/bars.json', 'bars.json'], check=True)
+s3_client.download_file('s3://baliciaga-database/data/bars-dev.json', 'bars-dev.json')
+s3_client.download_file('s3://baliciaga-database/data/bars.json', 'bars.json')
 
 def check_json_references(json_file, duplicate_pairs):
     """检查JSON文件中的引用"""
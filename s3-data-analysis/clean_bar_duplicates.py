@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 import os
 
+import s3_client
+
 # 定义要处理的重复目录对
 duplicate_pairs = [
     ('Honeycomb Hookah & Eatery/', 'honeycomb-hookah-eatery/'),
@@ -31,8 +32,16 @@ environments = [
     }
 ]
 
+def list_relative_objects(s3_prefix):
+    """列出目录下的对象，返回 {相对路径: (大小, ETag)}"""
+    _, prefix = s3_client.parse_s3_path(s3_prefix)
+    return {
+        obj['Key'][len(prefix):]: (obj['Size'], obj['ETag'])
+        for obj in s3_client.list_objects(s3_prefix)
+    }
+
 def compare_directories(s3_base, dir1, dir2):
-    """使用aws s3 sync --dryrun比较两个目录"""
+    """比较两个目录的对象清单（相对路径、大小、ETag）"""
     source = s3_base + dir1
     dest = s3_base + dir2
     
@@ -40,15 +49,20 @@ def compare_directories(s3_base, dir1, dir2):
     print(f"  源: {source}")
     print(f"  目标: {dest}")
     
-    # 使用sync --dryrun检查差异
-    cmd = ['aws', 's3', 'sync', source, dest, '--dryrun']
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    source_objects = list_relative_objects(source)
+    dest_objects = list_relative_objects(dest)
     
-    # 如果没有输出，说明目录内容相同
-    if not result.stdout.strip():
+    # 源目录中所有对象在目标目录中都有相同内容，说明目录内容相同
+    differences = [
+        name for name, info in sorted(source_objects.items())
+        if dest_objects.get(name) != info
+    ]
+    if not differences:
         return 'Identical'
     else:
-        print(f"  差异输出:\n{result.stdout}")
+        print(f"  差异文件:")
+        for name in differences:
+            print(f"    {source}{name}")
         return 'Different'
 
 def update_json_file(json_file, old_dir, new_dir):
@@ -56,7 +70,7 @@ def update_json_file(json_file, old_dir, new_dir):
     # 下载JSON文件
     print(f"\n下载JSON文件: {json_file}")
     s3_path = f"s3://baliciaga-database/data/{json_file}"
-    subprocess.run(['aws', 's3', 'cp', s3_path, json_file], check=True)
+    s3_client.download_file(s3_path, json_file)
     
     # 读取并更新JSON
     with open(json_file, 'r', encoding='utf-8') as f:
@@ -90,25 +104,23 @@ def update_json_file(json_file, old_dir, new_dir):
 def delete_directory(s3_path):
     """删除S3目录"""
     print(f"\n删除S3目录: {s3_path}")
-    cmd = ['aws', 's3', 'rm', s3_path, '--recursive']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print("  删除成功")
+    try:
+        deleted = s3_client.delete_prefix(s3_path)
+        print(f"  删除成功 ({deleted} 个对象)")
         return True
-    else:
-        print(f"  删除失败: {result.stderr}")
+    except Exception as e:
+        print(f"  删除失败: {e}")
         return False
 
 def upload_json_file(local_file, s3_path):
     """上传JSON文件到S3"""
     print(f"\n上传更新后的JSON文件到: {s3_path}")
-    cmd = ['aws', 's3', 'cp', local_file, s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
+    try:
+        s3_client.upload_file(local_file, s3_path)
         print("  上传成功")
         return True
-    else:
-        print(f"  上传失败: {result.stderr}")
+    except Exception as e:
+        print(f"  上传失败: {e}")
         return False
 
 def process_duplicate_pair(env, old_dir, new_dir):
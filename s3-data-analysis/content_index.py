@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+按内容寻址的相册对象索引
+在 s3_inventory 快照上把8个相册的全部对象按内容分组，找出字节完全相同的副本（跨dev/prod相册、跨名称变体目录）。
+先按大小分组，大小唯一的对象不可能重复；同一大小组内都是单段上传时ETag就是MD5，直接用 md5:<ETag> 作为内容键，
+组内有分段上传的对象（ETag带"-"）时整组流式计算SHA-256，按 (key, ETag) 缓存在本地，对象不变就不再下载。
+
+可选把重复副本合并为一个规范对象: 目录文件中的引用（photos / staticMapS3Url / photoVariants）改指规范对象，
+通过 catalog_commit 一次提交，photo_variants 清单和 static_map_memo 索引中的key同样改指后，再批量删除多余副本。
+只合并同一商户的副本（platonic/ 与 platonic_ChIJ…/ 等名称变体目录算同一商户；占位地图等跨商户的相同内容不合并）；默认只在同一相册内合并，--cross-album 时跨相册合并。
+
+    python3 content_index.py                         # 报告重复
+    python3 content_index.py --collapse --dry-run    # 预览相册内合并
+    python3 content_index.py --collapse --cross-album
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import catalog_commit
+import catalog_index
+import catalog_store
+import photo_variants
+import s3_client
+import s3_inventory
+import static_map_memo
+
+INDEX_PATH = os.environ.get(
+    'CONTENT_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.content_index.json')
+)
+INDEX_VERSION = 1
+HASH_WORKERS = 16
+CHUNK_SIZE = 1024 * 1024
+
+
+def load_hash_cache(path=INDEX_PATH):
+    """本地SHA-256缓存 {key: {etag, sha256}}"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data['hashes'] if data.get('version') == INDEX_VERSION else {}
+
+
+def save_hash_cache(hashes, path=INDEX_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'hashes': hashes}, f)
+    os.replace(tmp_path, path)
+
+
+def sha256_object(key):
+    """流式计算对象的SHA-256，不把整个对象读入内存"""
+    body = s3_client.get_client().get_object(Bucket=s3_client.BUCKET, Key=key)['Body']
+    digest = hashlib.sha256()
+    for chunk in body.iter_chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_index(inventory, albums=None, hashes=None):
+    """返回 ({内容键: [key, ...]}, 统计)，只包含有多个副本的内容
+    hashes 为SHA-256缓存，会就地更新"""
+    hashes = {} if hashes is None else hashes
+    by_size = defaultdict(list)
+    for album in albums or s3_client.ALBUMS:
+        for key, entry in inventory.objects(f"{album}/"):
+            by_size[entry['size']].append((key, entry))
+
+    content = defaultdict(list)
+    to_hash = []
+    for size, objects in by_size.items():
+        if len(objects) < 2:
+            continue
+        if all('-' not in entry['etag'] for _, entry in objects):
+            for key, entry in objects:
+                content[f"md5:{entry['etag']}"].append(key)
+            continue
+        for key, entry in objects:
+            cached = hashes.get(key)
+            if cached and cached['etag'] == entry['etag']:
+                content[f"sha256:{cached['sha256']}"].append(key)
+            else:
+                to_hash.append((key, entry))
+
+    def run(item):
+        key, entry = item
+        try:
+            return key, entry, sha256_object(key), None
+        except Exception as e:
+            return key, entry, None, e
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+        for key, entry, digest, error in executor.map(run, to_hash):
+            if error:
+                errors.append((key, error))
+                continue
+            hashes[key] = {'etag': entry['etag'], 'sha256': digest}
+            content[f"sha256:{digest}"].append(key)
+
+    groups = {cid: sorted(keys) for cid, keys in content.items() if len(keys) > 1}
+    stats = {
+        'objects': sum(len(objects) for objects in by_size.values()),
+        'hashed': len(to_hash),
+        'hash_errors': errors,
+        'groups': len(groups),
+        'duplicates': sum(len(keys) - 1 for keys in groups.values()),
+        'wasted_bytes': sum(inventory.get(keys[0])['size'] * (len(keys) - 1) for keys in groups.values())
+    }
+    return groups, stats
+
+
+def album_of(key):
+    return key.split('/', 1)[0]
+
+
+def merchant_of(key):
+    """key所属商户: 相册下第一级目录去掉placeId后缀再标准化，
+    platonic/ 与 platonic_ChIJ…/ 这类名称变体目录归为同一商户；key直接在相册根下时为空串"""
+    parts = key.split('/')
+    directory = parts[1] if len(parts) > 2 else ''
+    return catalog_index.normalize_name(catalog_index.split_place_id(directory)[0])
+
+
+def relative_key(key):
+    return key.split('/', 1)[1] if '/' in key else key
+
+
+def classify(keys):
+    """重复组的类型:
+    env-mirror   仅是同一相对路径在dev/prod两个相册中各一份（发布流程的正常结果）
+    same-album   同一相册内不同key（名称变体目录、重复上传）
+    cross-album  跨相册的其他重复"""
+    albums = {album_of(key) for key in keys}
+    if len(albums) == 1:
+        return 'same-album'
+    if len({relative_key(key) for key in keys}) == 1 and len(albums) == len(keys):
+        return 'env-mirror'
+    return 'cross-album'
+
+
+def catalog_references(catalogs):
+    """统计目录文件对每个key的引用次数"""
+    references = defaultdict(int)
+    for data, _ in catalogs.values():
+        for item in data:
+            for url in iter_item_urls(item):
+                references[s3_client.parse_s3_path(url)[1]] += 1
+    return references
+
+
+def iter_item_urls(item):
+    for url in item.get('photos') or []:
+        if isinstance(url, str) and url:
+            yield url
+    if isinstance(item.get('staticMapS3Url'), str) and item['staticMapS3Url']:
+        yield item['staticMapS3Url']
+    for srcset in item.get('photoVariants') or []:
+        for widths in (srcset or {}).values():
+            yield from widths.values()
+
+
+def canonical_key(keys, references):
+    """规范对象: 被目录引用最多 > prod相册 > 目录名已是标准格式 > key最短 > 字典序"""
+    def rank(key):
+        directory = catalog_index.merchant_directory(key) or ''
+        name, _ = catalog_index.split_place_id(directory)
+        return (
+            -references.get(key, 0),
+            not album_of(key).endswith('-prod'),
+            catalog_index.normalize_name(name) != name,
+            len(key),
+            key
+        )
+    return min(keys, key=rank)
+
+
+def plan_collapse(groups, references, cross_album=False):
+    """返回 {多余key: 规范key}；只在同一商户（名称变体目录视为同一商户）内合并，默认还按相册分开"""
+    redirects = {}
+    for keys in groups.values():
+        partitions = defaultdict(list)
+        for key in keys:
+            partitions[merchant_of(key) if cross_album else (album_of(key), merchant_of(key))].append(key)
+        for partition in partitions.values():
+            if len(partition) < 2:
+                continue
+            canonical = canonical_key(partition, references)
+            for key in partition:
+                if key != canonical:
+                    redirects[key] = canonical
+    return redirects
+
+
+def rewrite_url(url, redirects):
+    """URL指向多余副本时改指规范对象（保留原域名），返回新URL或None"""
+    target = redirects.get(s3_client.parse_s3_path(url)[1])
+    if target is None:
+        return None
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}/{target}"
+
+
+def rewrite_catalog(data, redirects):
+    """就地改写目录条目中的引用，返回改写的URL数"""
+    count = 0
+
+    def swap(url):
+        nonlocal count
+        new_url = rewrite_url(url, redirects) if isinstance(url, str) and url else None
+        if new_url:
+            count += 1
+            return new_url
+        return url
+
+    for item in data:
+        if isinstance(item.get('photos'), list):
+            item['photos'] = [swap(url) for url in item['photos']]
+        if item.get('staticMapS3Url'):
+            item['staticMapS3Url'] = swap(item['staticMapS3Url'])
+        for srcset in item.get('photoVariants') or []:
+            for widths in (srcset or {}).values():
+                for width, url in widths.items():
+                    widths[width] = swap(url)
+    return count
+
+
+def redirect_variant_manifest(manifest, redirects):
+    """photo_variants 清单中的源图key和变体key改指规范对象，返回改动的条目数
+    规范源图已有条目时丢弃多余副本的条目"""
+    changed = 0
+    for source in list(manifest):
+        entry = manifest[source]
+        for variant in entry.get('variants', {}).values():
+            if variant.get('key') in redirects:
+                variant['key'] = redirects[variant['key']]
+                changed += 1
+        target = redirects.get(source)
+        if target is not None:
+            del manifest[source]
+            manifest.setdefault(target, entry)
+            changed += 1
+    return changed
+
+
+def redirect_map_memo(memo, redirects):
+    """static_map_memo 索引中的地图对象key改指规范对象，返回改动的对象数"""
+    changed = 0
+    for mk, objects in memo.maps.items():
+        for key in [k for k in objects if k in redirects]:
+            etag = objects.pop(key)
+            objects.setdefault(redirects[key], etag)
+            changed += 1
+    memo.by_object = {key: mk for mk, objects in memo.maps.items() for key in objects}
+    return changed
+
+
+def collapse(redirects, catalogs, dry_run=False):
+    """改写目录引用并提交，再改写变体清单和静态地图索引，成功后批量删除多余副本，返回删除失败列表"""
+    commit = catalog_commit.CatalogCommit('内容去重: 引用改指规范对象')
+    for json_file, (data, etag) in catalogs.items():
+        count = rewrite_catalog(data, redirects)
+        if count:
+            commit.stage(json_file, data, base_etag=etag)
+            print(f"  {json_file}: 改写 {count} 个引用")
+    catalog_commit.print_commit(commit.commit(dry_run))
+
+    # 两个索引里仍指向多余副本的key也要改指，否则下次运行会把引用改回已删除的对象
+    manifest = photo_variants.load_manifest()
+    manifest_changes = redirect_variant_manifest(manifest, redirects)
+    memo = static_map_memo.StaticMapMemo().load()
+    memo_changes = redirect_map_memo(memo, redirects)
+    print(f"  变体清单: 改写 {manifest_changes} 处, 静态地图索引: 改写 {memo_changes} 处")
+    if dry_run:
+        print(f"  [DRY RUN] Would delete {len(redirects)} 个重复对象")
+        return []
+    if manifest_changes:
+        photo_variants.save_manifest(manifest)
+    if memo_changes:
+        memo.save()
+    errors = s3_client.delete_keys(f"s3://{s3_client.BUCKET}/{key}" for key in sorted(redirects))
+    inventory = s3_inventory.Inventory()
+    for album in {album_of(key) for key in redirects}:
+        inventory.invalidate(album)
+    inventory.save()
+    return errors
+
+
+def print_report(groups, stats, inventory, limit=20):
+    print(f"对象 {stats['objects']} 个, 计算SHA-256 {stats['hashed']} 个")
+    print(f"重复内容 {stats['groups']} 组, 多余副本 {stats['duplicates']} 个, "
+          f"可回收 {stats['wasted_bytes'] / 1024 / 1024:.1f} MB")
+    by_kind = defaultdict(lambda: [0, 0])
+    for keys in groups.values():
+        kind = by_kind[classify(keys)]
+        kind[0] += 1
+        kind[1] += inventory.get(keys[0])['size'] * (len(keys) - 1)
+    for kind, (count, wasted) in sorted(by_kind.items()):
+        print(f"  {kind}: {count} 组, {wasted / 1024 / 1024:.1f} MB")
+    largest = sorted(groups.items(), key=lambda x: -inventory.get(x[1][0])['size'] * (len(x[1]) - 1))
+    for cid, keys in largest[:limit]:
+        print(f"\n  {cid[:20]}… {inventory.get(keys[0])['size'] / 1024:.1f} KB x {len(keys)} ({classify(keys)})")
+        for key in keys:
+            print(f"    {key}")
+    for key, error in stats['hash_errors']:
+        print(f"  ❌ {key}: {error}")
+
+
+def main():
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    start = time.time()
+    inventory = s3_inventory.load_inventory()
+    hashes = load_hash_cache()
+    groups, stats = build_index(inventory, hashes=hashes)
+    save_hash_cache(hashes)
+    print_report(groups, stats, inventory)
+    print(f"\n索引耗时 {time.time() - start:.2f} 秒")
+
+    if '--collapse' not in args:
+        return
+    catalogs = {json_file: catalog_store.load_with_etag(json_file) for json_file in catalog_store.CATALOG_FILES}
+    redirects = plan_collapse(groups, catalog_references(catalogs), cross_album='--cross-album' in args)
+    print(f"\n合并: {len(redirects)} 个重复对象改指规范对象")
+    for key, error in collapse(redirects, catalogs, dry_run):
+        print(f"  ❌ 删除失败 {key}: {error}")
+
+
+if __name__ == "__main__":
+    main()
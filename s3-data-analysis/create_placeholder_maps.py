@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
-import json
-import subprocess
-import os
-from PIL import Image, ImageDraw, ImageFont
+import io
 
-def create_placeholder_map(merchant_name, lat, lng, filename):
-    """创建一个占位静态地图"""
+from PIL import Image, ImageDraw
+
+import catalog_index
+import s3_client
+import static_map_memo
+import static_map_renderer
+
+ENVIRONMENTS = ['prod', 'dev']
+
+def create_placeholder_map(merchant_name, lat, lng):
+    """创建一个占位静态地图（找不到商户坐标时使用），返回WebP字节"""
     # 创建600x400的图像
     img = Image.new('RGB', (600, 400), color='#f0f0f0')
     draw = ImageDraw.Draw(img)
@@ -29,32 +35,18 @@ def create_placeholder_map(merchant_name, lat, lng, filename):
         draw.text((x, y_offset), line, fill='#333333')
         y_offset += 30
     
-    # 保存图像
-    img.save(filename, 'PNG')
-    print(f"创建占位地图: {filename}")
+    output = io.BytesIO()
+    img.save(output, 'WEBP', quality=90)
+    return output.getvalue()
 
-def find_merchant_in_data(merchant_name):
+def find_merchant_in_data(catalog, merchant_name):
     """在dining和bars数据中查找商户信息"""
-    # 先在dining.json中查找
-    if os.path.exists('dining.json'):
-        with open('dining.json', 'r', encoding='utf-8') as f:
-            dining_data = json.load(f)
-        for item in dining_data:
-            if item.get('name') == merchant_name:
-                return item, 'dining'
-    
-    # 再在bars.json中查找
-    if os.path.exists('bars.json'):
-        with open('bars.json', 'r', encoding='utf-8') as f:
-            bars_data = json.load(f)
-        for item in bars_data:
-            if item.get('name') == merchant_name:
-                return item, 'bar'
-    
+    for record in catalog.find_by_name(merchant_name):
+        return record['item'], record['category']
     return None, None
 
 def main():
-    print("# CCt#31: 创建缺失的静态地图占位图")
+    print("# CCt#31: 创建缺失的静态地图")
     print("="*60)
     
     # 要处理的两个商户
@@ -70,62 +62,49 @@ def main():
     ]
     
     created_maps = []
+    catalog = catalog_index.Catalog.load(['dining.json', 'bars.json'], include_migration=False)
+    # 同一坐标的地图只渲染一次，另一个环境和以后的重跑都只是复制或跳过
+    memo = static_map_memo.StaticMapMemo().load()
     
     for merchant in missing_merchants:
         print(f"\n处理商户: {merchant['name']}")
         
         # 查找商户信息
-        merchant_info, category = find_merchant_in_data(merchant['name'])
-        
-        if merchant_info:
-            lat = merchant_info.get('lat', -8.6500)  # 默认巴厘岛坐标
-            lng = merchant_info.get('lng', 115.2200)
-            print(f"  找到商户信息 (分类: {category})")
-            print(f"  坐标: {lat}, {lng}")
-        else:
-            # 使用默认巴厘岛坐标
-            lat = -8.6500
-            lng = 115.2200
-            print(f"  未找到商户信息，使用默认坐标")
-        
-        # 创建占位地图
-        filename = f"{merchant['directory']}_staticmap.png"
-        create_placeholder_map(merchant['name'], lat, lng, filename)
-        
-        created_maps.append({
-            'merchant': merchant['name'],
-            'directory': merchant['directory'],
-            'filename': filename
-        })
-    
-    # 创建上传脚本
-    print("\n创建上传脚本...")
-    
-    with open('upload_to_prod.sh', 'w') as f:
-        f.write("#!/bin/bash\n")
-        f.write("# CCt#31: 上传静态地图到PROD相册\n\n")
-        f.write("echo '步骤1: 上传新生成的静态地图到PROD相册'\n\n")
-        
-        for map_info in created_maps:
-            s3_path = f"s3://baliciaga-database/bar-image-prod/{map_info['directory']}/staticmap.png"
-            f.write(f"echo '上传 {map_info['merchant']}...'\n")
-            f.write(f"aws s3 cp {map_info['filename']} {s3_path}\n\n")
+        merchant_info, category = find_merchant_in_data(catalog, merchant['name'])
+        point = static_map_renderer.coordinates(merchant_info) if merchant_info else None
         
-        f.write("echo '\\n步骤2: 全量同步PROD到DEV相册'\n")
-        f.write("echo '开始同步...'\n")
-        f.write("aws s3 sync s3://baliciaga-database/bar-image-prod/ s3://baliciaga-database/bar-image-dev/\n")
-        f.write("echo '同步完成！'\n")
+        for env in ENVIRONMENTS:
+            s3_key = f"bar-image-{env}/{merchant['directory']}/staticmap.webp"
+            try:
+                if point:
+                    action = static_map_renderer.ensure_static_map(point[0], point[1], s3_key, memo, fetch=True)
+                else:
+                    # 没有坐标时仍然只能用占位图
+                    data = create_placeholder_map(merchant['name'], -8.6500, 115.2200)
+                    s3_client.upload_bytes(data, f"s3://{s3_client.BUCKET}/{s3_key}", 'image/webp')
+                    action = 'placeholder'
+            except Exception as e:
+                print(f"  ❌ {env}: {e}")
+                continue
+            print(f"  {env}: {action} -> s3://{s3_client.BUCKET}/{s3_key}")
+            created_maps.append({
+                'merchant': merchant['name'],
+                'category': category,
+                'env': env,
+                's3_key': s3_key,
+                'action': action
+            })
     
-    # 设置脚本可执行
-    subprocess.run(['chmod', '+x', 'upload_to_prod.sh'])
+    memo.save()
     
     print("\n" + "="*60)
     print("# 完成")
     print("="*60)
-    print(f"\n创建了 {len(created_maps)} 个占位静态地图")
-    print("\n下一步:")
-    print("1. 运行 ./upload_to_prod.sh 执行上传和同步")
-    print("2. 然后运行更新JSON的脚本")
+    counts = {}
+    for map_info in created_maps:
+        counts[map_info['action']] = counts.get(map_info['action'], 0) + 1
+    print(f"\n处理了 {len(created_maps)} 个静态地图: {counts}")
+    print("\n下一步: 运行更新JSON的脚本，把 staticMapS3Url 指向 staticmap.webp")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
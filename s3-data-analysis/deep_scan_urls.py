@@ -1,31 +1,22 @@
 #!/usr/bin/env python3
-import json
-import re
+from collections import Counter
 
-def deep_scan_for_urls(obj, path="", results=None):
-    """递归扫描JSON对象中的所有URL"""
-    if results is None:
-        results = []
-    
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            deep_scan_for_urls(value, f"{path}.{key}", results)
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            deep_scan_for_urls(item, f"{path}[{i}]", results)
-    elif isinstance(obj, str):
-        # 检查是否是URL
-        if 'cloudfront.net' in obj or 'http' in obj:
-            results.append((path, obj))
-    
-    return results
+import catalog_stream
+import url_extractor
+
+def scan_catalog_file(path):
+    """逐条读取本地目录文件并产出 (JSON Pointer, URL)，不载入整个文件"""
+    return url_extractor.extract_records(catalog_stream.open_records(path))
 
 def main():
     print("=== 深度扫描 cafes-dev.json ===")
-    with open('current-cafes-dev.json', 'r', encoding='utf-8') as f:
-        dev_data = json.load(f)
-    
-    dev_urls = deep_scan_for_urls(dev_data)
+    # 逐条读取: 同一遍里提取URL并检查mapUrl字段
+    dev_urls = []
+    map_url_cafes = []
+    for i, cafe in enumerate(catalog_stream.open_records('current-cafes-dev.json')):
+        dev_urls.extend(url_extractor.extract_urls(cafe, root=f"/{i}"))
+        if isinstance(cafe, dict) and 'mapUrl' in cafe:
+            map_url_cafes.append((cafe.get('name', 'Unknown'), cafe.get('mapUrl', '')))
     
     print(f"总共发现 {len(dev_urls)} 个URL")
     
@@ -36,11 +27,12 @@ def main():
     other_urls = []
     
     for path, url in dev_urls:
-        if '/image-v2/' in url:
+        album = url_extractor.parse_url(url).album
+        if album == 'image-v2':
             image_v2_urls.append((path, url))
-        elif '/cafe-image-dev/' in url:
+        elif album == 'cafe-image-dev':
             cafe_image_dev_urls.append((path, url))
-        elif '/cafe-image-prod/' in url:
+        elif album == 'cafe-image-prod':
             cafe_image_prod_urls.append((path, url))
         else:
             other_urls.append((path, url))
@@ -59,30 +51,24 @@ def main():
             print()
     
     # 检查是否有mapUrl字段
-    map_url_count = 0
-    for cafe in dev_data:
-        if 'mapUrl' in cafe:
-            map_url_count += 1
-            if map_url_count <= 3:
-                print(f"\n发现mapUrl字段：")
-                print(f"  Cafe: {cafe.get('name', 'Unknown')}")
-                print(f"  MapUrl: {cafe.get('mapUrl', '')}")
+    for name, map_url in map_url_cafes[:3]:
+        print(f"\n发现mapUrl字段：")
+        print(f"  Cafe: {name}")
+        print(f"  MapUrl: {map_url}")
     
-    print(f"\n总共有 {map_url_count} 个cafe包含mapUrl字段")
+    print(f"\n总共有 {len(map_url_cafes)} 个cafe包含mapUrl字段")
     
     # 同样检查prod文件
     print("\n\n=== 深度扫描 cafes.json ===")
-    with open('current-cafes.json', 'r', encoding='utf-8') as f:
-        prod_data = json.load(f)
-    
-    prod_urls = deep_scan_for_urls(prod_data)
+    # 只统计相册分布，不保留URL列表
+    prod_albums = Counter(url_extractor.parse_url(url).album for _, url in scan_catalog_file('current-cafes.json'))
     
-    print(f"总共发现 {len(prod_urls)} 个URL")
+    print(f"总共发现 {sum(prod_albums.values())} 个URL")
     
     # 分析prod文件的URL类型
-    prod_image_v2 = sum(1 for _, url in prod_urls if '/image-v2/' in url)
-    prod_cafe_dev = sum(1 for _, url in prod_urls if '/cafe-image-dev/' in url)
-    prod_cafe_prod = sum(1 for _, url in prod_urls if '/cafe-image-prod/' in url)
+    prod_image_v2 = prod_albums['image-v2']
+    prod_cafe_dev = prod_albums['cafe-image-dev']
+    prod_cafe_prod = prod_albums['cafe-image-prod']
     
     print(f"\nProd文件URL分布：")
     print(f"- image-v2路径: {prod_image_v2}")
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
-import subprocess
 import time
 
+import s3_client
+
 # 定义要删除的原始格式目录
 directories_to_delete = [
     'Honeycomb Hookah & Eatery/',
@@ -30,27 +31,12 @@ def delete_s3_directory(s3_path):
     """删除S3目录及其所有内容"""
     print(f"\n删除目录: {s3_path}")
     
-    # 首先列出目录内容以确认
-    list_cmd = ['aws', 's3', 'ls', s3_path, '--recursive']
-    list_result = subprocess.run(list_cmd, capture_output=True, text=True)
-    
-    if list_result.returncode == 0:
-        files = list_result.stdout.strip().split('\n')
-        file_count = len([f for f in files if f.strip()])
-        print(f"  将删除 {file_count} 个文件")
-        
-        # 执行删除
-        delete_cmd = ['aws', 's3', 'rm', s3_path, '--recursive']
-        delete_result = subprocess.run(delete_cmd, capture_output=True, text=True)
-        
-        if delete_result.returncode == 0:
-            print(f"  ✓ 成功删除")
-            return True, file_count
-        else:
-            print(f"  ✗ 删除失败: {delete_result.stderr}")
-            return False, 0
-    else:
-        print(f"  ✗ 无法访问目录: {list_result.stderr}")
+    try:
+        file_count = s3_client.delete_prefix(s3_path)
+        print(f"  ✓ 成功删除 {file_count} 个文件")
+        return True, file_count
+    except Exception as e:
+        print(f"  ✗ 删除失败: {e}")
         return False, 0
 
 def main():
@@ -2,116 +2,73 @@
 """
 最终的dev到prod环境同步脚本
 将dev环境的所有数据和资源作为事实源头，覆盖并更新prod环境
+按上一次发布的清单（promotion_manifest）增量同步: 只复制新增/变化的对象、只删除已移除的对象，
+目录文件只替换变化的条目。
+
+    python3 final_dev_to_prod_sync.py                         # 发布全部分类
+    python3 final_dev_to_prod_sync.py --merchant <商户目录>    # 只发布指定商户
+    python3 final_dev_to_prod_sync.py --dry-run               # 只打印差异
 """
-import subprocess
-import json
 import sys
+import time
 from datetime import datetime
 
-def run_command(cmd, description):
-    """执行命令并返回结果"""
-    print(f"\n执行: {description}")
-    print(f"命令: {' '.join(cmd)}")
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"❌ 失败: {result.stderr}")
-        return False
-    else:
-        print(f"✅ 成功")
-        if result.stdout:
-            print(f"输出: {result.stdout[:200]}...")  # 只显示前200字符
-        return True
+import catalog_commit
+import catalog_store
+import promotion_manifest
 
-def sync_s3_album(dev_album, prod_album):
-    """同步S3相册从dev到prod"""
+def sync_s3_album(category, state, merchants=None, dry_run=False):
+    """按清单差异把dev相册的变化同步到prod相册"""
     print(f"\n{'='*60}")
-    print(f"同步S3相册: {dev_album} -> {prod_album}")
+    print(f"同步S3相册: {category['dev_album']} -> {category['prod_album']}")
     print(f"{'='*60}")
     
-    cmd = [
-        'aws', 's3', 'sync',
-        f's3://baliciaga-database/{dev_album}/',
-        f's3://baliciaga-database/{prod_album}/',
-        '--delete'
-    ]
+    try:
+        changes, failed = promotion_manifest.promote_objects(category, state, merchants, dry_run)
+    except Exception as e:
+        print(f"❌ 失败: {e}")
+        return False
     
-    return run_command(cmd, f"同步 {dev_album} 到 {prod_album}")
+    promotion_manifest.print_changes('对象', changes, failed)
+    return not failed
 
-def sync_json_file(dev_json, prod_json, dev_album, prod_album):
-    """同步JSON文件从dev到prod，替换URL路径"""
+def sync_json_file(commit, category, state, merchants=None, dry_run=False):
+    """同步JSON文件从dev到prod，只替换变化的条目（暂存到批量提交中），返回发布后的条目哈希"""
     print(f"\n{'='*60}")
-    print(f"同步JSON文件: {dev_json} -> {prod_json}")
+    print(f"同步JSON文件: {category['dev_json']} -> {category['prod_json']}")
     print(f"{'='*60}")
     
-    # 下载dev JSON
-    local_dev_path = f"/tmp/{dev_json}"
-    cmd = ['aws', 's3', 'cp', f's3://baliciaga-database/data/{dev_json}', local_dev_path]
-    if not run_command(cmd, f"下载 {dev_json}"):
-        return False
-    
-    # 读取并修改内容
-    print(f"\n修改JSON内容...")
-    with open(local_dev_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # 统计URL替换
-    url_count = 0
-    for item in data:
-        # 替换photos数组中的URL
-        if 'photos' in item and isinstance(item['photos'], list):
-            for i, photo_url in enumerate(item['photos']):
-                if f'/{dev_album}/' in photo_url:
-                    item['photos'][i] = photo_url.replace(f'/{dev_album}/', f'/{prod_album}/')
-                    url_count += 1
-        
-        # 替换staticMapS3Url
-        if 'staticMapS3Url' in item and item['staticMapS3Url']:
-            if f'/{dev_album}/' in item['staticMapS3Url']:
-                item['staticMapS3Url'] = item['staticMapS3Url'].replace(f'/{dev_album}/', f'/{prod_album}/')
-                url_count += 1
-    
-    print(f"  ✅ 替换了 {url_count} 个URL路径")
-    
-    # 保存修改后的文件
-    local_prod_path = f"/tmp/{prod_json}"
-    with open(local_prod_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        stats, entries = promotion_manifest.promote_catalog(commit, category, state, merchants, dry_run)
+    except Exception as e:
+        print(f"❌ 读取失败: {e}")
+        return None
     
-    # 上传到S3
-    cmd = ['aws', 's3', 'cp', local_prod_path, f's3://baliciaga-database/data/{prod_json}']
-    if not run_command(cmd, f"上传 {prod_json}"):
-        return False
-    
-    # 清除CloudFront缓存
-    cmd = [
-        'aws', 'cloudfront', 'create-invalidation',
-        '--distribution-id', 'E2OWVXNIWJXMFR',
-        '--paths', f'/data/{prod_json}'
-    ]
-    run_command(cmd, f"清除 {prod_json} 的CloudFront缓存")
-    
-    return True
+    print(f"  条目: +{stats['added']} ~{stats['changed']} -{stats['removed']}, 替换了 {stats['urls']} 个URL路径")
+    return entries
 
-def sync_category(category_name, dev_album, prod_album, dev_json, prod_json):
-    """同步一个完整的分类"""
+def sync_category(commit, manifest, category, merchants=None, dry_run=False):
+    """同步一个完整的分类，返回发布后的条目哈希（失败时返回None）"""
     print(f"\n{'#'*70}")
-    print(f"# 同步 {category_name} 分类")
+    print(f"# 同步 {category['name']} 分类")
     print(f"{'#'*70}")
     
-    # A. 同步S3相册
-    if not sync_s3_album(dev_album, prod_album):
-        print(f"❌ {category_name} S3相册同步失败")
-        return False
-    
-    # B, C, D. 同步JSON文件
-    if not sync_json_file(dev_json, prod_json, dev_album, prod_album):
-        print(f"❌ {category_name} JSON文件同步失败")
-        return False
+    start = time.time()
+    state = manifest.category_state(category)
     
-    print(f"\n✅ {category_name} 分类同步完成")
-    return True
+    # A. 同步S3相册
+    if not sync_s3_album(category, state, merchants, dry_run):
+        print(f"❌ {category['name']} S3相册同步失败")
+        return None
+    
+    # B, C. 同步JSON文件（暂存）
+    entries = sync_json_file(commit, category, state, merchants, dry_run)
+    if entries is None:
+        print(f"❌ {category['name']} JSON文件同步失败")
+        return None
+    
+    print(f"\n✅ {category['name']} 分类同步完成 ({time.time() - start:.2f} 秒)")
+    return entries
 
 def main():
     """主函数"""
@@ -120,50 +77,41 @@ def main():
     print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*70)
     
-    # 定义所有分类的同步任务
-    sync_tasks = [
-        {
-            'name': 'cafe',
-            'dev_album': 'cafe-image-dev',
-            'prod_album': 'cafe-image-prod',
-            'dev_json': 'cafes-dev.json',
-            'prod_json': 'cafes.json'
-        },
-        {
-            'name': 'dining',
-            'dev_album': 'dining-image-dev',
-            'prod_album': 'dining-image-prod',
-            'dev_json': 'dining-dev.json',
-            'prod_json': 'dining.json'
-        },
-        {
-            'name': 'bar',
-            'dev_album': 'bar-image-dev',
-            'prod_album': 'bar-image-prod',
-            'dev_json': 'bars-dev.json',
-            'prod_json': 'bars.json'
-        },
-        {
-            'name': 'cowork',
-            'dev_album': 'cowork-image-dev',
-            'prod_album': 'cowork-image-prod',
-            'dev_json': 'cowork-dev.json',
-            'prod_json': 'cowork.json'
-        }
-    ]
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    merchants = [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == '--merchant'] or None
+    
+    # 所有分类的同步任务
+    sync_tasks = catalog_store.CATEGORIES
+    manifest = promotion_manifest.PromotionManifest().load()
     
     # 执行所有同步任务
+    commit = catalog_commit.CatalogCommit('dev -> prod 增量发布')
     success_count = 0
+    promoted_entries = {}
     for task in sync_tasks:
-        if sync_category(
-            task['name'],
-            task['dev_album'],
-            task['prod_album'],
-            task['dev_json'],
-            task['prod_json']
-        ):
+        entries = sync_category(commit, manifest, task, merchants, dry_run)
+        if entries is not None:
+            promoted_entries[task['name']] = entries
             success_count += 1
     
+    # D. 批量提交所有JSON文件，并只做一次CloudFront失效
+    try:
+        record = commit.commit(dry_run)
+        catalog_commit.print_commit(record)
+    except Exception as e:
+        print(f"❌ JSON文件提交失败: {e}")
+        success_count = 0
+        promoted_entries = {}
+    
+    # E. 记录本次发布状态，下次只处理之后的变化
+    if not dry_run:
+        for name, entries in promoted_entries.items():
+            manifest.categories[name]['entries'] = entries
+            manifest.categories[name]['promoted_at'] = datetime.now().isoformat()
+        manifest.save()
+        print(f"\n发布清单已更新: {manifest.path}")
+    
     # 最终报告
     print("\n" + "="*70)
     print("最终报告")
@@ -172,7 +120,7 @@ def main():
     
     if success_count == len(sync_tasks):
         print("\n✅ 所有分类同步成功！")
-        print("dev和prod环境的数据和S3资源已达到完全的镜像同步。")
+        print("dev环境的变化已同步到prod环境。")
     else:
         print("\n❌ 部分分类同步失败，请检查错误日志。")
         sys.exit(1)
@@ -4,36 +4,13 @@
 将bar和dining分类（包括dev和prod环境）中，所有独立存放的静态地图图片，
 移动到其对应的商户主相册中，并更新JSON文件中的URL。
 """
-import subprocess
-import json
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 
-def download_json_from_s3(json_file):
-    """从S3下载JSON文件"""
-    local_path = f"/tmp/{json_file}"
-    cmd = ['aws', 's3', 'cp', f's3://baliciaga-database/data/{json_file}', local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Failed to download {json_file}: {result.stderr}")
-        return None
-    return local_path
-
-def upload_json_to_s3(local_path, json_file):
-    """上传JSON文件到S3的正确路径"""
-    cmd = ['aws', 's3', 'cp', local_path, f's3://baliciaga-database/data/{json_file}']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Failed to upload {json_file}: {result.stderr}")
-        return False
-    
-    # 清除CloudFront缓存
-    cmd = ['aws', 'cloudfront', 'create-invalidation', 
-           '--distribution-id', 'E2OWVXNIWJXMFR', 
-           '--paths', f'/data/{json_file}']
-    subprocess.run(cmd, capture_output=True, text=True)
-    return True
+import catalog_commit
+import catalog_store
+import s3_client
+import s3_inventory
 
 def extract_merchant_and_placeid_from_path(path):
     """从路径中提取商户名和placeId"""
@@ -43,82 +20,62 @@ def extract_merchant_and_placeid_from_path(path):
         return match.group(1), match.group(2)
     return None, None
 
-def find_staticmaps_in_album(album):
+def find_staticmaps_in_album(inventory, album):
     """在指定相册中查找所有静态地图"""
     print(f"扫描 {album} 中的静态地图...")
     
-    cmd = ['aws', 's3', 'ls', f's3://baliciaga-database/{album}/', '--recursive']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"  ❌ 扫描失败: {result.stderr}")
-        return []
-    
     staticmaps = []
-    for line in result.stdout.splitlines():
-        if line.strip() and ('static' in line.lower() and ('.webp' in line or '.png' in line)):
-            parts = line.split()
-            if len(parts) >= 4:
-                file_path = parts[3]
-                merchant, placeid = extract_merchant_and_placeid_from_path(file_path)
-                if merchant and placeid:
-                    staticmaps.append({
-                        'path': file_path,
-                        'merchant': merchant,
-                        'placeid': placeid,
-                        'album': album
-                    })
+    for file_path in inventory.keys(f'{album}/'):
+        if 'static' in file_path.lower() and file_path.endswith(('.webp', '.png')):
+            merchant, placeid = extract_merchant_and_placeid_from_path(file_path)
+            if merchant and placeid:
+                staticmaps.append({
+                    'path': file_path,
+                    'merchant': merchant,
+                    'placeid': placeid,
+                    'album': album
+                })
     
     print(f"  找到 {len(staticmaps)} 个独立存放的静态地图")
     return staticmaps
 
-def move_staticmap(staticmap_info, dry_run=False):
-    """移动单个静态地图到商户主相册"""
+def staticmap_move(staticmap_info):
+    """计算单个静态地图移动到商户主相册的 (源S3路径, 目标S3路径)"""
     album = staticmap_info['album']
     merchant = staticmap_info['merchant']
     old_path = staticmap_info['path']
     
     # 构建新路径
     new_path = f"{album}/{merchant}/staticmap.webp"
-    old_s3_path = f"s3://baliciaga-database/{old_path}"
-    new_s3_path = f"s3://baliciaga-database/{new_path}"
-    
+    return f"s3://baliciaga-database/{old_path}", f"s3://baliciaga-database/{new_path}"
+
+def move_staticmaps(staticmaps, dry_run=False):
+    """批量移动静态地图: 并发服务端复制并校验，源文件按1000个一批删除，返回成功数"""
+    pairs = [staticmap_move(sm) for sm in staticmaps]
     if dry_run:
-        print(f"  [DRY RUN] Would move: {old_path} -> {new_path}")
-        return True
-    
-    # 复制文件到新位置
-    cmd = ['aws', 's3', 'cp', old_s3_path, new_s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"  ❌ 复制失败: {old_path} -> {new_path}")
-        print(f"     错误: {result.stderr}")
-        return False
-    
-    # 删除旧文件
-    cmd = ['aws', 's3', 'rm', old_s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"  ⚠️  删除旧文件失败: {old_path}")
-    
-    print(f"  ✅ 已移动: {merchant}_* -> {merchant}/staticmap.webp")
-    return True
+        for old_s3_path, new_s3_path in pairs:
+            print(f"  [DRY RUN] Would move: {old_s3_path} -> {new_s3_path}")
+        return len(pairs)
+    
+    result = s3_client.move_objects(pairs, max_workers=5)
+    for old_s3_path, new_s3_path, error in result['failed']:
+        print(f"  ❌ 移动失败: {old_s3_path} -> {new_s3_path}")
+        print(f"     错误: {error}")
+    for old_s3_path, new_s3_path in result['moved']:
+        print(f"  ✅ 已移动: {old_s3_path} -> {new_s3_path}")
+    return len(result['moved'])
 
-def update_json_urls(json_file, album, staticmaps, dry_run=False):
+def update_json_urls(commit, json_file, album, staticmaps, dry_run=False):
     """更新JSON文件中的静态地图URL"""
     print(f"\n更新 {json_file} 中的URL...")
     
-    # 下载JSON文件
-    local_path = download_json_from_s3(json_file)
-    if not local_path:
+    # 读取JSON（ETag未变时直接使用本地缓存）
+    try:
+        data, etag = catalog_store.load_with_etag(json_file)
+    except Exception as e:
+        print(f"Failed to load {json_file}: {e}")
         return False
     
-    # 读取JSON
-    with open(local_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
     # 创建商户名到新路径的映射
     merchant_to_new_path = {}
     for sm in staticmaps:
@@ -155,30 +112,22 @@ def update_json_urls(json_file, album, staticmaps, dry_run=False):
                     break
     
     if updates > 0 and not dry_run:
-        # 保存更新后的JSON
-        with open(local_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        # 上传回S3
-        if upload_json_to_s3(local_path, json_file):
-            print(f"  ✅ 成功更新 {json_file} 中的 {updates} 个URL")
-            return True
-        else:
-            print(f"  ❌ 上传 {json_file} 失败")
-            return False
+        # 暂存，所有相册处理完后统一提交
+        commit.stage(json_file, data, base_etag=etag)
+        print(f"  ✅ 已暂存 {json_file} 中的 {updates} 个URL更新")
     elif updates == 0:
         print(f"  ℹ️  {json_file} 中没有需要更新的URL")
     
     return True
 
-def process_album_and_json(json_file, album, dry_run=False):
+def process_album_and_json(commit, inventory, json_file, album, dry_run=False):
     """处理一个相册和对应的JSON文件"""
     print(f"\n{'='*60}")
     print(f"处理 {json_file} 和 {album}")
     print(f"{'='*60}")
     
     # 查找静态地图
-    staticmaps = find_staticmaps_in_album(album)
+    staticmaps = find_staticmaps_in_album(inventory, album)
     
     if not staticmaps:
         print(f"  ℹ️  {album} 中没有独立存放的静态地图")
@@ -186,22 +135,16 @@ def process_album_and_json(json_file, album, dry_run=False):
     
     # 移动静态地图
     print(f"\n移动 {len(staticmaps)} 个静态地图...")
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for sm in staticmaps:
-            future = executor.submit(move_staticmap, sm, dry_run)
-            futures.append(future)
-        
-        success_count = 0
-        for future in as_completed(futures):
-            if future.result():
-                success_count += 1
-        
-        print(f"  成功移动 {success_count}/{len(staticmaps)} 个文件")
+    success_count = move_staticmaps(staticmaps, dry_run)
+    print(f"  成功移动 {success_count}/{len(staticmaps)} 个文件")
+    
+    if not dry_run:
+        inventory.invalidate(album)
+        inventory.save()
     
     # 更新JSON文件
     if success_count > 0:
-        update_json_urls(json_file, album, staticmaps, dry_run)
+        update_json_urls(commit, json_file, album, staticmaps, dry_run)
     
     return True
 
@@ -224,11 +167,19 @@ def main():
         print("⚠️  DRY RUN模式 - 只显示将要执行的操作，不会实际修改文件\n")
     
     # 处理每个任务
+    inventory = s3_inventory.load_inventory([album for _, album in tasks])
+    commit = catalog_commit.CatalogCommit('静态地图迁移到商户主相册')
     for json_file, album in tasks:
-        success = process_album_and_json(json_file, album, dry_run)
+        success = process_album_and_json(commit, inventory, json_file, album, dry_run)
         if not success:
             print(f"\n❌ 处理 {json_file} 和 {album} 时出错")
     
+    # 一次性提交所有JSON文件，只做一次CloudFront失效
+    try:
+        catalog_commit.print_commit(commit.commit(dry_run))
+    except Exception as e:
+        print(f"\n❌ 提交JSON文件失败: {e}")
+    
     print(f"\n{'='*60}")
     print("✅ 所有任务完成！")
     print(f"{'='*60}")
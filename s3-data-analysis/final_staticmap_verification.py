@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
-import subprocess
 import random
 
+import s3_client
+import url_verifier
+
 # 测试样本
 test_samples = [
     # Bar
@@ -30,24 +32,20 @@ def verify_staticmap_access():
     success_count = 0
     fail_count = 0
     
-    for album, folder, filename in test_samples:
-        url = f"https://d2cmxnft4myi1k.cloudfront.net/{album}/{folder}/{filename}"
-        
-        # 测试HTTP响应
-        cmd = ['curl', '-I', '-s', url]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if 'HTTP/2 200' in result.stdout:
+    # 并发发送HEAD请求
+    urls = [f"https://d2cmxnft4myi1k.cloudfront.net/{album}/{folder}/{filename}"
+            for album, folder, filename in test_samples]
+    results = url_verifier.verify_urls(urls)
+    
+    for (album, folder, filename), url in zip(test_samples, urls):
+        result = results[url]
+        if result['ok']:
             print(f"✅ {album}/{folder}/{filename}")
             success_count += 1
         else:
             print(f"❌ {album}/{folder}/{filename}")
             print(f"   URL: {url}")
-            # 打印响应头的前3行
-            headers = result.stdout.split('\n')[:3]
-            for header in headers:
-                if header.strip():
-                    print(f"   {header}")
+            print(f"   {result['status'] or result['error']}")
             fail_count += 1
     
     print("\n" + "=" * 80)
@@ -68,13 +66,10 @@ def verify_staticmap_access():
     
     old_format_count = 0
     for album in albums:
-        cmd = ['aws', 's3', 'ls', f's3://baliciaga-database/{album}/', '--recursive']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        for line in result.stdout.splitlines():
-            if '/staticmap.webp' in line or '/staticmap.png' in line:
+        for obj in s3_client.list_objects(f's3://baliciaga-database/{album}/'):
+            if '/staticmap.webp' in obj['Key'] or '/staticmap.png' in obj['Key']:
                 old_format_count += 1
-                print(f"  旧格式: {line.split()[-1]}")
+                print(f"  旧格式: {obj['Key']}")
     
     if old_format_count == 0:
         print("  ✅ 没有发现旧格式的staticmap文件")
@@ -1,62 +1,51 @@
 #!/usr/bin/env python3
-import subprocess
-import json
+"""
+最终验证
+cafes-dev.json / cafes.json 的引用统计来自 catalog_reconcile 的一次对账，
+除了旧的 image-v2 / 相册引用计数，还报告引用的对象是否真的存在于相册中。
+"""
+from collections import Counter
 
-def download_and_verify(file_name):
-    """下载并验证文件"""
-    # 下载文件
-    cmd = ['aws', 's3', 'cp', f's3://baliciaga-database/data/{file_name}', f'verify-{file_name}']
-    subprocess.run(cmd, capture_output=True)
-    
-    # 读取并检查
-    with open(f'verify-{file_name}', 'r') as f:
-        content = f.read()
-        data = json.loads(content)
-    
-    # 统计URL
-    image_v2_count = content.count('/image-v2/')
-    cafe_image_dev_count = content.count('/cafe-image-dev/')
-    cafe_image_prod_count = content.count('/cafe-image-prod/')
-    
-    # 统计具体字段
-    photos_count = 0
-    static_map_count = 0
-    
-    for cafe in data:
-        if 'photos' in cafe and cafe['photos']:
-            photos_count += len(cafe['photos'])
-        if 'staticMapS3Url' in cafe and cafe['staticMapS3Url']:
-            static_map_count += 1
+import catalog_reconcile
+
+def verify(result, file_name):
+    """统计单个目录文件的引用"""
+    entries = result.select(catalog=file_name)
+    albums = Counter(entry['album'] for entry in entries)
+    classes = Counter(entry['class'] for entry in entries)
     
     return {
         'file': file_name,
-        'image_v2_refs': image_v2_count,
-        'cafe_image_dev_refs': cafe_image_dev_count,
-        'cafe_image_prod_refs': cafe_image_prod_count,
-        'total_photos': photos_count,
-        'total_static_maps': static_map_count
+        'image_v2_refs': albums['image-v2'],
+        'cafe_image_dev_refs': albums['cafe-image-dev'],
+        'cafe_image_prod_refs': albums['cafe-image-prod'],
+        'total_photos': sum(1 for entry in entries if entry['field'].startswith('photos')),
+        'total_static_maps': sum(1 for entry in entries if entry['field'] == 'staticMapS3Url'),
+        'classes': classes
     }
 
+def print_stats(stats):
+    print(f"{stats['file']}:")
+    print(f"  - image-v2引用: {stats['image_v2_refs']}")
+    print(f"  - cafe-image-dev引用: {stats['cafe_image_dev_refs']}")
+    print(f"  - cafe-image-prod引用: {stats['cafe_image_prod_refs']}")
+    print(f"  - 照片总数: {stats['total_photos']}")
+    print(f"  - 静态地图总数: {stats['total_static_maps']}")
+    print("  - 对账: " + ", ".join(f"{cls} {stats['classes'][cls]}" for cls in catalog_reconcile.CLASSES[:-1]))
+
 def main():
     print("=== 最终验证报告 ===\n")
     
-    # 验证两个文件
-    dev_stats = download_and_verify('cafes-dev.json')
-    prod_stats = download_and_verify('cafes.json')
+    # 两个文件一次对账
+    result = catalog_reconcile.run(['cafes-dev.json', 'cafes.json'])
+    dev_stats = verify(result, 'cafes-dev.json')
+    prod_stats = verify(result, 'cafes.json')
     
-    print(f"cafes-dev.json:")
-    print(f"  - image-v2引用: {dev_stats['image_v2_refs']}")
-    print(f"  - cafe-image-dev引用: {dev_stats['cafe_image_dev_refs']}")
-    print(f"  - cafe-image-prod引用: {dev_stats['cafe_image_prod_refs']}")
-    print(f"  - 照片总数: {dev_stats['total_photos']}")
-    print(f"  - 静态地图总数: {dev_stats['total_static_maps']}")
-    
-    print(f"\ncafes.json:")
-    print(f"  - image-v2引用: {prod_stats['image_v2_refs']}")
-    print(f"  - cafe-image-dev引用: {prod_stats['cafe_image_dev_refs']}")
-    print(f"  - cafe-image-prod引用: {prod_stats['cafe_image_prod_refs']}")
-    print(f"  - 照片总数: {prod_stats['total_photos']}")
-    print(f"  - 静态地图总数: {prod_stats['total_static_maps']}")
+    print_stats(dev_stats)
+    print()
+    print_stats(prod_stats)
+    print(f"\ncafe-image-dev / cafe-image-prod 中未被引用的图片: "
+          f"{len(result.orphaned('cafe-image-dev'))} / {len(result.orphaned('cafe-image-prod'))}")
     
     # 验证结果
     print("\n=== 验证结果 ===")
@@ -65,11 +54,12 @@ def main():
     else:
         print("❌ 失败！仍有image-v2引用存在")
     
-    if dev_stats['cafe_image_dev_refs'] == (dev_stats['total_photos'] + dev_stats['total_static_maps']):
-        print("✅ cafes-dev.json中所有URL都正确指向cafe-image-dev")
-    
-    if prod_stats['cafe_image_prod_refs'] == (prod_stats['total_photos'] + prod_stats['total_static_maps']):
-        print("✅ cafes.json中所有URL都正确指向cafe-image-prod")
+    for stats, album in ((dev_stats, 'cafe-image-dev'), (prod_stats, 'cafe-image-prod')):
+        total = stats['total_photos'] + stats['total_static_maps']
+        if stats['classes']['correct'] == total:
+            print(f"✅ {stats['file']}中所有URL都正确指向{album}且对象存在")
+        else:
+            print(f"❌ {stats['file']}中有 {total - stats['classes']['correct']} 个URL不正确（相册、格式或对象缺失）")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
+import s3_client
+
 def scan_for_png_staticmaps():
     """扫描所有S3相册中的staticmap.png文件"""
     
@@ -20,28 +21,25 @@ def scan_for_png_staticmaps():
     for album in albums:
         print(f"扫描 {album}...")
         
-        # 执行S3 ls命令
-        cmd = ['aws', 's3', 'ls', f's3://baliciaga-database/{album}/', '--recursive']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"  ❌ 扫描失败: {result.stderr}")
+        # 分页列出相册
+        try:
+            objects = list(s3_client.list_objects(f's3://baliciaga-database/{album}/'))
+        except s3_client.ClientError as e:
+            print(f"  ❌ 扫描失败: {e}")
             continue
         
         # 查找staticmap.png文件
         album_png_files = []
-        for line in result.stdout.splitlines():
-            if line.strip() and 'staticmap.png' in line:
-                parts = line.split()
-                if len(parts) >= 4:
-                    file_path = parts[3]
-                    s3_path = f"s3://baliciaga-database/{file_path}"
-                    album_png_files.append({
-                        'album': album,
-                        'path': file_path,
-                        's3_path': s3_path,
-                        'merchant_folder': file_path.split('/')[-2]
-                    })
+        for obj in objects:
+            file_path = obj['Key']
+            if 'staticmap.png' in file_path and '/' in file_path:
+                s3_path = f"s3://baliciaga-database/{file_path}"
+                album_png_files.append({
+                    'album': album,
+                    'path': file_path,
+                    's3_path': s3_path,
+                    'merchant_folder': file_path.split('/')[-2]
+                })
         
         if album_png_files:
             print(f"  找到 {len(album_png_files)} 个staticmap.png文件")
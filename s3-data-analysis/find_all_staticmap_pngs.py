@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
+import s3_client
+
 def find_staticmap_pngs():
     """查找所有标准相册中的staticmap.png文件"""
     
@@ -22,35 +23,24 @@ def find_staticmap_pngs():
     for album in albums:
         print(f"\n检查 {album}/ ...")
         
-        # 使用AWS CLI递归列出所有staticmap.png文件
-        cmd = [
-            'aws', 's3', 'ls', 
-            f's3://baliciaga-database/{album}/',
-            '--recursive'
-        ]
-        
+        # 分页递归列出相册，查找所有staticmap.png文件
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            # 解析输出并查找staticmap.png文件
             png_count = 0
-            for line in result.stdout.splitlines():
-                if line.strip() and 'staticmap.png' in line:
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        file_path = parts[3]
-                        full_path = f"s3://baliciaga-database/{file_path}"
-                        all_png_files.append({
-                            'album': album,
-                            'path': full_path,
-                            'key': file_path
-                        })
-                        png_count += 1
-                        print(f"  找到: {file_path}")
+            for obj in s3_client.list_objects(f's3://baliciaga-database/{album}/'):
+                file_path = obj['Key']
+                if 'staticmap.png' in file_path:
+                    full_path = f"s3://baliciaga-database/{file_path}"
+                    all_png_files.append({
+                        'album': album,
+                        'path': full_path,
+                        'key': file_path
+                    })
+                    png_count += 1
+                    print(f"  找到: {file_path}")
             
             print(f"  {album} 中找到 {png_count} 个 staticmap.png 文件")
             
-        except subprocess.CalledProcessError as e:
+        except s3_client.ClientError as e:
             print(f"  错误: 无法访问 {album}: {e}")
     
     # 保存结果到JSON文件
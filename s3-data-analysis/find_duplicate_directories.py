@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
-import subprocess
 import re
 from collections import defaultdict
 
+import s3_client
+import s3_inventory
+
 def normalize_name(name):
     """将目录名标准化为小写+短横线格式"""
     # 移除尾部的斜杠
@@ -15,25 +17,10 @@ def normalize_name(name):
     normalized = re.sub(r'-+', '-', normalized)
     return normalized
 
-def get_s3_directories(s3_path):
+def get_s3_directories(inventory, s3_path):
     """获取S3路径下的所有子目录"""
-    try:
-        cmd = ['aws', 's3', 'ls', s3_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            directories = []
-            for line in result.stdout.strip().split('\n'):
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 2 and parts[0] == 'PRE':
-                        directories.append(parts[1])
-            return directories
-        else:
-            print(f"Error accessing {s3_path}: {result.stderr}")
-            return []
-    except Exception as e:
-        print(f"Exception accessing {s3_path}: {str(e)}")
-        return []
+    _, prefix = s3_client.parse_s3_path(s3_path)
+    return inventory.directories(prefix)
 
 def find_duplicates_in_directory(s3_path, directories):
     """在一个目录中查找潜在的重复"""
@@ -66,10 +53,11 @@ def main():
     ]
     
     findings = []
+    inventory = s3_inventory.load_inventory()
     
     for s3_path in s3_paths:
         print(f"Checking {s3_path}...")
-        directories = get_s3_directories(s3_path)
+        directories = get_s3_directories(inventory, s3_path)
         
         if directories:
             # 分析目录名格式
@@ -121,7 +109,7 @@ def main():
     # 显示详细统计
     print("\n## 详细统计\n")
     for s3_path in s3_paths:
-        directories = get_s3_directories(s3_path)
+        directories = get_s3_directories(inventory, s3_path)
         if directories:
             mixed_dirs = [d for d in directories if ' ' in d or any(c.isupper() for c in re.sub(r'_ChIJ[a-zA-Z0-9_-]+/$', '', d))]
             if mixed_dirs:
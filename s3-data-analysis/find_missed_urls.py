@@ -1,40 +1,18 @@
 #!/usr/bin/env python3
-import json
-import re
+import catalog_stream
+import url_extractor
+import url_rules
 
 def find_image_v2_urls(json_file):
-    """查找所有仍然指向image-v2的URL"""
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    missed_urls = set()
-    
-    # 遍历所有cafe条目
-    for cafe in data:
-        # 检查所有可能包含图片URL的字段
-        # 1. photos数组
-        if 'photos' in cafe and cafe['photos']:
-            for photo_url in cafe['photos']:
-                if '/image-v2/' in photo_url:
-                    missed_urls.add(photo_url)
-        
-        # 2. mapUrl字段（静态地图）
-        if 'mapUrl' in cafe and cafe['mapUrl'] and '/image-v2/' in cafe['mapUrl']:
-            missed_urls.add(cafe['mapUrl'])
-        
-        # 3. 其他可能的图片字段
-        for key in ['coverImage', 'thumbnailUrl', 'logoUrl', 'bannerUrl']:
-            if key in cafe and cafe[key] and '/image-v2/' in str(cafe[key]):
-                missed_urls.add(cafe[key])
-    
-    return list(missed_urls)
+    """查找所有仍然指向image-v2的URL（photos、静态地图及其他图片字段，见 url_rules.IMAGE_FIELDS）"""
+    rules = url_rules.RuleSet([url_rules.rule('no-image-v2')])
+    violations, _, _ = url_rules.check_items(catalog_stream.open_records(json_file), rules=rules)
+    return list({v['url'] for v in violations})
 
 def extract_s3_path(url):
     """从URL中提取S3路径"""
-    match = re.search(r'cloudfront\.net/(.+?)$', url)
-    if match:
-        return match.group(1)
-    return None
+    parts = url_extractor.parse_url(url)
+    return parts.key if 'cloudfront.net' in parts.host and parts.key else None
 
 def main():
     print("=== 分析 cafes-dev.json ===")
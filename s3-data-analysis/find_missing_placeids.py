@@ -1,53 +1,23 @@
 #!/usr/bin/env python3
-import json
-import os
+import catalog_index
 
-def find_merchant_in_json(merchant_name, json_files_dir):
-    """在所有JSON文件中查找商户"""
+def find_merchant_in_json(merchant_name, catalog):
+    """在所有目录文件中查找商户（按目录名/slug/标准化名称的哈希索引，精确查找不到时按名称前缀/子串）"""
     results = []
+    seen = set()
     
-    # 列出所有JSON文件
-    json_files = [f for f in os.listdir(json_files_dir) if f.endswith('.json')]
-    
-    for json_file in json_files:
-        filepath = os.path.join(json_files_dir, json_file)
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                for item in data:
-                    if 'name' in item:
-                        # 检查多种可能的匹配方式
-                        item_name_lower = item['name'].lower()
-                        merchant_lower = merchant_name.lower().replace('-', ' ')
-                        
-                        # 尝试不同的匹配策略
-                        matches = [
-                            merchant_lower in item_name_lower,
-                            merchant_lower.replace(' and ', ' & ') in item_name_lower,
-                            merchant_lower.replace(' ', '') in item_name_lower.replace(' ', ''),
-                            # 特殊情况
-                            ('longtime' in merchant_lower and 'longtime' in item_name_lower),
-                            ('honeycomb' in merchant_lower and 'honeycomb' in item_name_lower),
-                            ('m mason' in merchant_lower and 'mason' in item_name_lower),
-                            ('luigi' in merchant_lower and 'luigi' in item_name_lower),
-                            ('teamo' in merchant_lower and 'teamo' in item_name_lower),
-                            ('la baracca' in merchant_lower and 'baracca' in item_name_lower),
-                            ('karya' in merchant_lower and 'karya' in item_name_lower),
-                            ('puco' in merchant_lower and 'puco' in item_name_lower),
-                            ('setter' in merchant_lower and 'setter' in item_name_lower),
-                        ]
-                        
-                        if any(matches):
-                            results.append({
-                                'json_file': json_file,
-                                'name': item['name'],
-                                'placeId': item.get('placeId', 'NO_PLACEID'),
-                                'staticMapUrl': item.get('staticMapS3Url', '')
-                            })
-        except Exception as e:
-            pass
+    for record in catalog.find(merchant_name) or catalog.search(merchant_name):
+        item = record['item']
+        key = (record['source'], item.get('placeId'), item.get('name'))
+        if key in seen:
+            continue
+        seen.add(key)
+        results.append({
+            'json_file': record['source'],
+            'name': item['name'],
+            'placeId': item.get('placeId', 'NO_PLACEID'),
+            'staticMapUrl': item.get('staticMapS3Url', '')
+        })
     
     return results
 
@@ -64,7 +34,7 @@ failed_merchants = [
     ('honeycomb-hookah-eatery', ['bar-image-dev', 'bar-image-prod']),
 ]
 
-json_dir = '/Users/troy/开发文档/Baliciaga/backend/scripts'
+catalog = catalog_index.Catalog.load()
 
 print("查找失败商户的PlaceId...")
 print("=" * 80)
@@ -74,7 +44,7 @@ for merchant, albums in failed_merchants:
     print(f"需要处理的相册: {', '.join(albums)}")
     
     # 在JSON中查找
-    results = find_merchant_in_json(merchant, json_dir)
+    results = find_merchant_in_json(merchant, catalog)
     
     if results:
         print("找到的匹配:")
@@ -1,25 +1,15 @@
 #!/usr/bin/env python3
-import subprocess
 import re
 
+import s3_client
+
 def get_s3_directories_raw(s3_path):
     """获取S3路径下的所有子目录（保留原始格式）"""
     try:
-        cmd = ['aws', 's3', 'ls', s3_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            directories = []
-            for line in result.stdout.strip().split('\n'):
-                if line.strip() and 'PRE' in line:
-                    # 提取PRE之后的所有内容作为目录名
-                    parts = line.split('PRE', 1)
-                    if len(parts) == 2:
-                        dir_name = parts[1].strip()
-                        directories.append(dir_name)
-            return directories
-        else:
-            print(f"Error accessing {s3_path}: {result.stderr}")
-            return []
+        return s3_client.list_directories(s3_path)
+    except s3_client.ClientError as e:
+        print(f"Error accessing {s3_path}: {e}")
+        return []
     except Exception as e:
         print(f"Exception accessing {s3_path}: {str(e)}")
         return []
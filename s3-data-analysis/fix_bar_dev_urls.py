@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 import json
-import subprocess
 import re
 
+import s3_client
+
 def extract_merchant_directory_from_photo(photo_url):
     """从photo URL提取商户目录名"""
     # 匹配模式: bar-image/xxx/photo_y.webp
@@ -49,15 +50,13 @@ def main():
     
     # 上传到S3
     print("\n上传到S3...")
-    cmd = ['aws', 's3', 'cp', 'bars-dev-fixed.json', 's3://baliciaga-database/data/bars-dev.json']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        print("✅ 上传成功！")
-        return True
-    else:
-        print(f"❌ 上传失败: {result.stderr}")
+    try:
+        s3_client.upload_file('bars-dev-fixed.json', 's3://baliciaga-database/data/bars-dev.json')
+    except Exception as e:
+        print(f"❌ 上传失败: {e}")
         return False
+    print("✅ 上传成功！")
+    return True
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
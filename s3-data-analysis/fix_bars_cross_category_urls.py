@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
-import subprocess
+
+import s3_client
 
 def fix_bars_dev_urls():
     """修复bars-dev.json中Hippie Fish和Miss Fish的图片路径"""
@@ -59,16 +60,15 @@ def fix_bars_dev_urls():
         
         # 上传到S3
         s3_path = 's3://baliciaga-database/data/bars-dev.json'
-        upload_cmd = ['aws', 's3', 'cp', output_path, s3_path]
-        result = subprocess.run(upload_cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
+        try:
+            s3_client.upload_file(output_path, s3_path)
+        except Exception as e:
+            print(f"❌ 上传失败: {e}")
+        else:
             print(f"✅ 成功上传到S3: {s3_path}")
             
             # 验证修复
             verify_fixes(output_path)
-        else:
-            print(f"❌ 上传失败: {result.stderr}")
     else:
         print("\n未找到需要修复的商户")
 
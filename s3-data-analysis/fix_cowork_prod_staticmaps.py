@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
-import subprocess
+
+import s3_client
 
 def fix_cowork_prod():
     """修复cowork prod环境的静态地图URL"""
@@ -42,13 +43,12 @@ def fix_cowork_prod():
         print(f"文件已保存: {output_file}")
         
         # 上传到S3
-        upload_cmd = ['aws', 's3', 'cp', output_file, 's3://baliciaga-database/data/cowork.json']
-        result = subprocess.run(upload_cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("✅ 成功上传到S3")
+        try:
+            s3_client.upload_file(output_file, 's3://baliciaga-database/data/cowork.json')
+        except Exception as e:
+            print(f"❌ 上传失败: {e}")
         else:
-            print(f"❌ 上传失败: {result.stderr}")
+            print("✅ 成功上传到S3")
     else:
         print("\n无需更新")
 
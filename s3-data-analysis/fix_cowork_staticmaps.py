@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 import json
-import subprocess
 import os
 
+import s3_client
+
 def process_cowork_environment(json_file_path, s3_json_path, album_prefix):
     """处理cowork环境的静态地图迁移和JSON更新"""
     
@@ -16,6 +17,7 @@ def process_cowork_environment(json_file_path, s3_json_path, album_prefix):
     
     updated_count = 0
     migration_logs = []
+    moves = []
     
     for idx, merchant in enumerate(data):
         merchant_name = merchant.get('name', 'Unknown')
@@ -45,56 +47,54 @@ def process_cowork_environment(json_file_path, s3_json_path, album_prefix):
                 print(f"\n处理商户 {idx+1}: {merchant_name}")
                 print(f"  当前URL: {current_static_url}")
                 
-                # 执行S3移动操作
-                mv_cmd = ['aws', 's3', 'mv', old_s3_path, new_s3_path]
-                result = subprocess.run(mv_cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    # 更新JSON中的URL
-                    new_url = f"https://d2cmxnft4myi1k.cloudfront.net/{album_prefix}/{merchant_folder}/staticmap.webp"
-                    merchant['staticMapS3Url'] = new_url
-                    updated_count += 1
-                    
-                    migration_logs.append({
-                        'merchant': merchant_name,
-                        'old_url': current_static_url,
-                        'new_url': new_url,
-                        'status': 'success'
-                    })
-                    
-                    print(f"  ✅ 成功移动到: {new_url}")
-                else:
-                    # 检查文件是否已经在目标位置
-                    check_cmd = ['aws', 's3', 'ls', new_s3_path]
-                    check_result = subprocess.run(check_cmd, capture_output=True, text=True)
-                    
-                    if check_result.returncode == 0:
-                        # 文件已经在正确位置，只更新URL
-                        new_url = f"https://d2cmxnft4myi1k.cloudfront.net/{album_prefix}/{merchant_folder}/staticmap.webp"
-                        merchant['staticMapS3Url'] = new_url
-                        updated_count += 1
-                        
-                        migration_logs.append({
-                            'merchant': merchant_name,
-                            'old_url': current_static_url,
-                            'new_url': new_url,
-                            'status': 'already_exists'
-                        })
-                        
-                        print(f"  ✅ 文件已存在，更新URL: {new_url}")
-                    else:
-                        migration_logs.append({
-                            'merchant': merchant_name,
-                            'old_url': current_static_url,
-                            'error': result.stderr,
-                            'status': 'failed'
-                        })
-                        print(f"  ❌ 移动失败: {result.stderr}")
+                # 先收集，循环结束后批量移动
+                moves.append((merchant, current_static_url, old_s3_path, new_s3_path, merchant_folder))
             else:
                 # 已经是正确格式
                 print(f"\n商户 {idx+1}: {merchant_name}")
                 print(f"  ✅ URL已经是正确格式: {current_static_url}")
     
+    # 并发复制校验后批量删除源文件，再按结果更新JSON中的URL
+    result = s3_client.move_objects([(move[2], move[3]) for move in moves])
+    moved = {source for source, _ in result['moved']}
+    errors = {source: error for source, _, error in result['failed']}
+    for merchant, current_static_url, old_s3_path, new_s3_path, merchant_folder in moves:
+        merchant_name = merchant.get('name', 'Unknown')
+        new_url = f"https://d2cmxnft4myi1k.cloudfront.net/{album_prefix}/{merchant_folder}/staticmap.webp"
+        if old_s3_path in moved:
+            merchant['staticMapS3Url'] = new_url
+            updated_count += 1
+            
+            migration_logs.append({
+                'merchant': merchant_name,
+                'old_url': current_static_url,
+                'new_url': new_url,
+                'status': 'success'
+            })
+            
+            print(f"  ✅ {merchant_name} 成功移动到: {new_url}")
+        elif s3_client.object_exists(new_s3_path):
+            # 文件已经在正确位置，只更新URL
+            merchant['staticMapS3Url'] = new_url
+            updated_count += 1
+            
+            migration_logs.append({
+                'merchant': merchant_name,
+                'old_url': current_static_url,
+                'new_url': new_url,
+                'status': 'already_exists'
+            })
+            
+            print(f"  ✅ {merchant_name} 文件已存在，更新URL: {new_url}")
+        else:
+            migration_logs.append({
+                'merchant': merchant_name,
+                'old_url': current_static_url,
+                'error': str(errors[old_s3_path]),
+                'status': 'failed'
+            })
+            print(f"  ❌ {merchant_name} 移动失败: {errors[old_s3_path]}")
+    
     # 保存更新后的JSON
     if updated_count > 0:
         # 保存到本地
@@ -106,13 +106,12 @@ def process_cowork_environment(json_file_path, s3_json_path, album_prefix):
         print(f"本地文件已保存: {local_output}")
         
         # 上传到S3
-        upload_cmd = ['aws', 's3', 'cp', local_output, s3_json_path]
-        result = subprocess.run(upload_cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"✅ 成功上传到S3: {s3_json_path}")
+        try:
+            s3_client.upload_file(local_output, s3_json_path)
+        except Exception as e:
+            print(f"❌ 上传失败: {e}")
         else:
-            print(f"❌ 上传失败: {result.stderr}")
+            print(f"✅ 成功上传到S3: {s3_json_path}")
     else:
         print("\n无需更新任何URL")
     
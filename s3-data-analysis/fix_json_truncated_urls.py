@@ -2,33 +2,35 @@
 """
 修复JSON文件中截断的placeId URL
 """
-import subprocess
 import json
 import re
 
+import catalog_commit
+import s3_client
+
 def download_json_from_s3(json_file):
     """从S3下载JSON文件"""
     local_path = f"/tmp/{json_file}"
-    cmd = ['aws', 's3', 'cp', f's3://baliciaga-database/data/{json_file}', local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Failed to download {json_file}: {result.stderr}")
+    try:
+        s3_client.download_file(f's3://baliciaga-database/data/{json_file}', local_path)
+    except Exception as e:
+        print(f"Failed to download {json_file}: {e}")
         return None
     return local_path
 
 def upload_json_to_s3(local_path, json_file):
     """上传JSON文件到S3的正确路径"""
-    cmd = ['aws', 's3', 'cp', local_path, f's3://baliciaga-database/data/{json_file}']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Failed to upload {json_file}: {result.stderr}")
+    try:
+        s3_client.upload_file(local_path, f's3://baliciaga-database/data/{json_file}')
+    except Exception as e:
+        print(f"Failed to upload {json_file}: {e}")
         return False
     
     # 清除CloudFront缓存
-    cmd = ['aws', 'cloudfront', 'create-invalidation', 
-           '--distribution-id', 'E2OWVXNIWJXMFR', 
-           '--paths', f'/data/{json_file}']
-    subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        catalog_commit.create_invalidation([f'/data/{json_file}'])
+    except Exception as e:
+        print(f"CloudFront invalidation failed for {json_file}: {e}")
     return True
 
 def fix_truncated_urls_in_json(json_file, album):
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
+import s3_client
+
 # 手动映射剩余的文件
 remaining_mappings = [
     # Bar相关 - 这些实际上已经在正确位置了
@@ -114,6 +115,7 @@ def process_remaining_files():
     print("处理剩余的静态地图文件...")
     print("=" * 80)
     
+    pairs = []
     for mapping in remaining_mappings:
         if mapping.get('skip'):
             print(f"⏭️  跳过: {mapping['source']} - {mapping['reason']}")
@@ -124,16 +126,10 @@ def process_remaining_files():
         target_path = f"s3://baliciaga-database/{mapping['target']}"
         
         # 检查源文件是否存在
-        check_cmd = ['aws', 's3', 'ls', source_path]
-        result = subprocess.run(check_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
+        if not s3_client.object_exists(source_path):
             # 源文件不存在，可能已经被处理了
             # 检查目标是否存在
-            check_target_cmd = ['aws', 's3', 'ls', target_path]
-            target_result = subprocess.run(check_target_cmd, capture_output=True, text=True)
-            
-            if target_result.returncode == 0:
+            if s3_client.object_exists(target_path):
                 print(f"✅ 已存在: {mapping['target']}")
                 successful += 1
             else:
@@ -141,26 +137,21 @@ def process_remaining_files():
                 failed += 1
             continue
         
-        # 复制文件到新位置
-        copy_cmd = ['aws', 's3', 'cp', source_path, target_path]
-        result = subprocess.run(copy_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"❌ 复制失败: {mapping['source']} -> {mapping['target']}")
-            print(f"   错误: {result.stderr}")
-            failed += 1
-            continue
-        
-        # 删除源文件
-        delete_cmd = ['aws', 's3', 'rm', source_path]
-        result = subprocess.run(delete_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"⚠️  复制成功但删除失败: {mapping['source']}")
+        pairs.append((source_path, target_path))
+    
+    # 并发复制校验，再批量删除源文件
+    result = s3_client.move_objects(pairs)
+    for source_path, target_path in result['moved']:
+        print(f"✅ 成功迁移: {s3_client.parse_s3_path(source_path)[1]} -> {s3_client.parse_s3_path(target_path)[1]}")
+        successful += 1
+    for source_path, target_path, error in result['failed']:
+        if str(error).startswith("已复制但删除源文件失败"):
+            print(f"⚠️  复制成功但删除失败: {s3_client.parse_s3_path(source_path)[1]}")
             successful += 1
         else:
-            print(f"✅ 成功迁移: {mapping['source']} -> {mapping['target']}")
-            successful += 1
+            print(f"❌ 复制失败: {s3_client.parse_s3_path(source_path)[1]} -> {s3_client.parse_s3_path(target_path)[1]}")
+            print(f"   错误: {error}")
+            failed += 1
     
     print("\n" + "=" * 80)
     print(f"处理完成！")
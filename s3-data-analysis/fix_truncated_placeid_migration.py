@@ -2,9 +2,15 @@
 """
 修复截断placeId的静态地图迁移问题
 """
-import subprocess
-import json
-import re
+import sys
+
+import migration_engine
+
+import catalog_commit
+import catalog_store
+
+PLAN_FILE = migration_engine.plan_path('truncated_placeid_plan.json')
+DRY_RUN = '--dry-run' in sys.argv
 
 def fix_truncated_placeid_files():
     """修复截断placeId的文件"""
@@ -119,24 +125,23 @@ def fix_truncated_placeid_files():
     
     print("修复截断placeId的静态地图文件...\n")
     
-    for case in special_cases:
-        old_s3_path = f"s3://baliciaga-database/{case['old']}"
-        new_s3_path = f"s3://baliciaga-database/{case['new']}"
-        
-        # 复制文件到新位置
-        cmd = ['aws', 's3', 'cp', old_s3_path, new_s3_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"✅ 已移动: {case['old']} -> {case['new']}")
-            
-            # 删除旧文件
-            cmd = ['aws', 's3', 'rm', old_s3_path]
-            subprocess.run(cmd, capture_output=True, text=True)
-        else:
-            print(f"❌ 移动失败: {case['old']}")
+    # 生成迁移计划，交给迁移引擎并发执行（带日志，可续跑）
+    operations = [
+        migration_engine.move_op(
+            f"s3://baliciaga-database/{case['old']}",
+            f"s3://baliciaga-database/{case['new']}"
+        )
+        for case in special_cases
+    ]
+    migration_engine.write_plan(PLAN_FILE, operations, '修复截断placeId的静态地图')
+    result = migration_engine.run_plan_file(PLAN_FILE, dry_run=DRY_RUN)
+    
+    if not DRY_RUN:
+        print(f"✅ 已移动 {result['done']} 个文件 (之前已完成 {result['skipped']} 个)")
+        for operation in result['failed']:
+            print(f"❌ 移动失败: {operation['src']}")
 
-def fix_cafe_files_in_dining():
+def fix_cafe_files_in_dining(commit):
     """修复dining JSON中的cafe文件引用"""
     json_files = ['dining-dev.json', 'dining.json']
     
@@ -149,18 +154,12 @@ def fix_cafe_files_in_dining():
     for json_file in json_files:
         print(f"\n修复 {json_file} 中的cafe文件引用...")
         
-        # 下载JSON文件
-        local_path = f"/tmp/{json_file}"
-        cmd = ['aws', 's3', 'cp', f's3://baliciaga-database/data/{json_file}', local_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"❌ 下载失败: {json_file}")
-            continue
-        
         # 读取并修复
-        with open(local_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        try:
+            data, etag = catalog_store.load_with_etag(json_file)
+        except Exception as e:
+            print(f"❌ 下载失败: {json_file}: {e}")
+            continue
         
         updates = 0
         for item in data:
@@ -170,58 +169,33 @@ def fix_cafe_files_in_dining():
                     # 这些是cafe商户，应该从cafe相册引用
                     continue
                 
-        # 上传回S3
-        with open(local_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        cmd = ['aws', 's3', 'cp', local_path, f's3://baliciaga-database/data/{json_file}']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"✅ 已更新 {json_file}")
-            
-            # 清除CloudFront缓存
-            cmd = ['aws', 'cloudfront', 'create-invalidation', 
-                   '--distribution-id', 'E2OWVXNIWJXMFR', 
-                   '--paths', f'/data/{json_file}']
-            subprocess.run(cmd, capture_output=True, text=True)
+        # 暂存，由main统一提交
+        if commit.stage(json_file, data, base_etag=etag):
+            print(f"✅ 已暂存 {json_file}")
 
-def fix_barn_gastropub():
+def fix_barn_gastropub(commit):
     """修复bars.json中的The Barn Gastropub URL"""
     print("\n修复bars.json中的The Barn Gastropub URL...")
     
-    # 下载JSON文件
-    local_path = "/tmp/bars.json"
-    cmd = ['aws', 's3', 'cp', 's3://baliciaga-database/data/bars.json', local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        data, etag = catalog_store.load_with_etag('bars.json')
+    except Exception as e:
+        print(f"❌ 下载失败: bars.json: {e}")
+        return
     
-    if result.returncode == 0:
-        with open(local_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        for item in data:
-            if 'Barn' in item['name'] and 'Gastropub' in item['name']:
-                old_url = item.get('staticMapS3Url', '')
-                if 'the-barn-gastropub_ChIJe7KSn4dH0i0RsfzzpwFhwpQ' in old_url:
-                    # 修复URL
-                    item['staticMapS3Url'] = old_url.replace(
-                        'the-barn-gastropub_ChIJe7KSn4dH0i0RsfzzpwFhwpQ/the-barn-gastropub_static.webp',
-                        'barn-gastropub/staticmap.webp'
-                    )
-                    print(f"✅ 已修复 {item['name']} 的URL")
-        
-        # 保存并上传
-        with open(local_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        cmd = ['aws', 's3', 'cp', local_path, 's3://baliciaga-database/data/bars.json']
-        subprocess.run(cmd, capture_output=True, text=True)
-        
-        # 清除CloudFront缓存
-        cmd = ['aws', 'cloudfront', 'create-invalidation', 
-               '--distribution-id', 'E2OWVXNIWJXMFR', 
-               '--paths', '/data/bars.json']
-        subprocess.run(cmd, capture_output=True, text=True)
+    for item in data:
+        if 'Barn' in item['name'] and 'Gastropub' in item['name']:
+            old_url = item.get('staticMapS3Url', '')
+            if 'the-barn-gastropub_ChIJe7KSn4dH0i0RsfzzpwFhwpQ' in old_url:
+                # 修复URL
+                item['staticMapS3Url'] = old_url.replace(
+                    'the-barn-gastropub_ChIJe7KSn4dH0i0RsfzzpwFhwpQ/the-barn-gastropub_static.webp',
+                    'barn-gastropub/staticmap.webp'
+                )
+                print(f"✅ 已修复 {item['name']} 的URL")
+    
+    # 暂存，由main统一提交
+    commit.stage('bars.json', data, base_etag=etag)
 
 def main():
     """主函数"""
@@ -229,12 +203,18 @@ def main():
     
     # 1. 修复截断的placeId文件
     fix_truncated_placeid_files()
+    if DRY_RUN:
+        return
     
     # 2. 修复cafe文件引用
-    fix_cafe_files_in_dining()
+    commit = catalog_commit.CatalogCommit('修复截断placeId的静态地图引用')
+    fix_cafe_files_in_dining(commit)
     
     # 3. 修复barn gastropub
-    fix_barn_gastropub()
+    fix_barn_gastropub(commit)
+    
+    # 4. 一次性提交所有JSON文件，只做一次CloudFront失效
+    catalog_commit.print_commit(commit.commit())
     
     print("\n✅ 修复完成！")
 
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 import json
-import subprocess
 from urllib.parse import urlparse
 
+import s3_client
+
 def extract_merchant_directory(photo_url):
     """从photos URL中提取商户目录"""
     if not photo_url:
@@ -51,13 +52,12 @@ def force_update_all_urls():
     
     # 上传到S3
     print("\n上传更新后的文件到S3...")
-    cmd = ['aws', 's3', 'cp', 'bars-dev-fixed.json', 's3://baliciaga-database/data/bars-dev.json']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        print("✅ 上传成功！")
+    try:
+        s3_client.upload_file('bars-dev-fixed.json', 's3://baliciaga-database/data/bars-dev.json')
+    except Exception as e:
+        print(f"❌ 上传失败: {e}")
     else:
-        print(f"❌ 上传失败: {result.stderr}")
+        print("✅ 上传成功！")
 
 # 执行更新
 force_update_all_urls()
\ No newline at end of file
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+相册图片元数据索引
+审计脚本不下载整张图就不知道图片的尺寸和实际格式。这里用Range GET只读每个对象开头的几十KB，
+直接解析 WebP (VP8 / VP8L / VP8X)、PNG (IHDR)、JPEG (SOF / DQT)、AVIF (ispe) 文件头，不解码像素:
+    format, width, height, bytes          全部格式
+    lossless / alpha / animated           WebP
+    bit_depth / color_type / interlaced   PNG
+    progressive / components / quality    JPEG（quality由亮度量化表按libjpeg标准表估算）
+结果按ETag保存在本地索引，同一内容的多个key共享一条记录，对象不变就不再请求。
+
+在索引上对全桶做审计: 超过字节或边长上限的图片、扩展名与实际格式不符的图片、不是WebP的原图。
+
+    python3 image_metadata.py                                  # 全部相册
+    python3 image_metadata.py bar-image-dev --max-bytes 500000 --max-side 1600
+    python3 image_metadata.py --self-test                      # 用Pillow现场编码的各格式样本自测文件头解析
+"""
+import io
+import json
+import os
+import struct
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import photo_variants
+import s3_client
+import s3_inventory
+
+INDEX_PATH = os.environ.get(
+    'IMAGE_METADATA_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.image_metadata.json')
+)
+INDEX_VERSION = 1
+# 第一次读取的字节数，大多数文件头都在这里；JPEG的EXIF/ICC很大时再读到 MAX_HEADER_BYTES
+HEADER_BYTES = 32 * 1024
+MAX_HEADER_BYTES = 512 * 1024
+IO_WORKERS = 16
+IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.avif')
+EXTENSION_FORMATS = {'.webp': 'webp', '.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.avif': 'avif'}
+EXPECTED_FORMAT = 'webp'
+MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(1024 * 1024)))
+MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', '2048'))
+
+# libjpeg 标准亮度量化表（quality 50）
+_STD_LUMINANCE = (
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99
+)
+# SOFn 中不是帧头的标记: DHT、JPG扩展、DAC
+_NOT_SOF = {0xC4, 0xC8, 0xCC}
+
+
+class Truncated(Exception):
+    """读取的字节不足以解析到尺寸"""
+
+
+def _webp(data):
+    if len(data) < 30:
+        raise Truncated()
+    info = {'format': 'webp', 'lossless': False, 'alpha': False, 'animated': False}
+    chunk = data[12:16]
+    if chunk == b'VP8X':
+        flags = data[20]
+        info['alpha'] = bool(flags & 0x10)
+        info['animated'] = bool(flags & 0x02)
+        info['width'] = int.from_bytes(data[24:27], 'little') + 1
+        info['height'] = int.from_bytes(data[27:30], 'little') + 1
+        # 编码方式在后面的 VP8 / VP8L 块里（前面可能有ICCP、ALPH块）；动画取第一帧，
+        # ANMF块的16字节帧头之后就是该帧的 ALPH / VP8 / VP8L 子块。没读到编码块就不能断定有损
+        offset = 12
+        while True:
+            if offset + 8 > len(data):
+                raise Truncated()
+            name = data[offset:offset + 4]
+            size = struct.unpack('<I', data[offset + 4:offset + 8])[0]
+            if name in (b'VP8 ', b'VP8L'):
+                info['lossless'] = name == b'VP8L'
+                return info
+            offset += 8 + 16 if name == b'ANMF' else 8 + size + (size & 1)
+    if chunk == b'VP8 ':
+        if data[23:26] != b'\x9d\x01\x2a':
+            return {'format': 'webp', 'error': 'VP8起始码无效'}
+        width, height = struct.unpack('<HH', data[26:30])
+        info['width'], info['height'] = width & 0x3FFF, height & 0x3FFF
+        return info
+    if chunk == b'VP8L':
+        if data[20] != 0x2F:
+            return {'format': 'webp', 'error': 'VP8L签名无效'}
+        bits = struct.unpack('<I', data[21:25])[0]
+        info['lossless'] = True
+        info['width'] = (bits & 0x3FFF) + 1
+        info['height'] = ((bits >> 14) & 0x3FFF) + 1
+        info['alpha'] = bool(bits >> 28 & 1)
+        return info
+    return {'format': 'webp', 'error': f"未知的WebP块 {chunk!r}"}
+
+
+def _png(data):
+    if len(data) < 29:
+        raise Truncated()
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data[16:29])
+    return {
+        'format': 'png', 'width': width, 'height': height, 'bit_depth': bit_depth,
+        'color_type': color_type, 'alpha': color_type in (4, 6), 'interlaced': bool(interlace)
+    }
+
+
+def _jpeg_quality(table):
+    """按与标准亮度表的平均缩放比例反推libjpeg的quality"""
+    scale = sum(table) * 100 / sum(_STD_LUMINANCE)
+    quality = 5000 / scale if scale > 100 else (200 - scale) / 2
+    return max(1, min(100, round(quality)))
+
+
+def _jpeg(data):
+    info = {'format': 'jpeg'}
+    offset = 2
+    while True:
+        # 标记前可能有填充的0xFF
+        while offset < len(data) and data[offset] == 0xFF:
+            offset += 1
+        if offset + 3 > len(data):
+            raise Truncated()
+        marker = data[offset]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 1
+            continue
+        length = struct.unpack('>H', data[offset + 1:offset + 3])[0]
+        segment = data[offset + 3:offset + 1 + length]
+        if marker == 0xDB:
+            if len(segment) < length - 2:
+                raise Truncated()
+            position = 0
+            while position < len(segment):
+                precision, table_id = segment[position] >> 4, segment[position] & 0x0F
+                size = 128 if precision else 64
+                values = segment[position + 1:position + 1 + size]
+                if table_id == 0:
+                    table = struct.unpack(f'>{64}H', values) if precision else tuple(values)
+                    info['quality'] = _jpeg_quality(table)
+                position += 1 + size
+        elif 0xC0 <= marker <= 0xCF and marker not in _NOT_SOF:
+            if len(segment) < 6:
+                raise Truncated()
+            bits, height, width, components = struct.unpack('>BHHB', segment[:6])
+            info.update({
+                'width': width, 'height': height, 'bit_depth': bits,
+                'components': components, 'progressive': marker in (0xC2, 0xC6, 0xCA, 0xCE)
+            })
+            return info
+        elif marker in (0xD9, 0xDA):
+            return dict(info, error='SOF之前遇到扫描数据')
+        offset += 1 + length
+
+
+def _avif(data):
+    position = data.find(b'ispe')
+    if position < 0 or position + 16 > len(data):
+        raise Truncated()
+    width, height = struct.unpack('>II', data[position + 8:position + 16])
+    return {'format': 'avif', 'width': width, 'height': height}
+
+
+def parse_header(data):
+    """从文件开头的字节解析格式和尺寸；字节不够时抛出 Truncated"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return _webp(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return _png(data)
+    if data[:2] == b'\xff\xd8':
+        return _jpeg(data)
+    if data[4:8] == b'ftyp' and data[8:12] in (b'avif', b'avis'):
+        return _avif(data)
+    if len(data) < 12:
+        raise Truncated()
+    return {'format': 'unknown'}
+
+
+def read_metadata(key, size=None):
+    """Range GET读文件头并解析，必要时扩大读取范围一次"""
+    s3_path = f"s3://{s3_client.BUCKET}/{key}"
+    data = s3_client.download_range(s3_path, 0, HEADER_BYTES)
+    try:
+        info = parse_header(data)
+    except Truncated:
+        if len(data) < HEADER_BYTES:
+            info = {'format': 'unknown', 'error': '文件头不完整'}
+        else:
+            data = s3_client.download_range(s3_path, 0, MAX_HEADER_BYTES)
+            try:
+                info = parse_header(data)
+            except Truncated:
+                info = {'format': 'unknown', 'error': f"前 {len(data)} 字节内没有找到尺寸"}
+    info['bytes'] = size
+    info['header_bytes'] = len(data)
+    return info
+
+
+class MetadataIndex:
+    """本地元数据索引 {ETag: 元数据}"""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.images = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.images = data['images']
+        return self
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'images': self.images}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, etag):
+        return self.images.get(etag)
+
+    def update(self, objects, workers=IO_WORKERS):
+        """为 [(key, entry)] 中ETag不在索引里的对象读取文件头，返回 (读取数, 失败列表)"""
+        pending = {}
+        for key, entry in objects:
+            if entry['etag'] not in self.images:
+                pending.setdefault(entry['etag'], (key, entry['size']))
+        errors = []
+
+        def read(job):
+            etag, (key, size) = job
+            try:
+                return etag, key, read_metadata(key, size), None
+            except Exception as e:
+                return etag, key, None, e
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for etag, key, info, error in executor.map(read, pending.items()):
+                if error:
+                    errors.append((key, error))
+                else:
+                    self.images[etag] = info
+        return len(pending), errors
+
+    def lookup(self, inventory, keys):
+        """{key: 元数据}，不存在的对象为None；缺失的先读取"""
+        objects = [(key, inventory.get(key)) for key in keys]
+        self.update([(key, entry) for key, entry in objects if entry])
+        return {key: self.images.get(entry['etag']) if entry else None for key, entry in objects}
+
+
+def image_objects(inventory, albums=None):
+    """相册中的图片对象 [(key, entry)]"""
+    return [
+        (key, entry)
+        for album in albums or s3_client.ALBUMS
+        for key, entry in inventory.objects(f"{album}/")
+        if key.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def check(key, info, max_bytes=MAX_BYTES, max_side=MAX_SIDE):
+    """单个对象的问题列表 [(类型, 说明)]"""
+    issues = []
+    if info.get('error'):
+        issues.append(('unreadable', info['error']))
+    if info.get('bytes') and info['bytes'] > max_bytes:
+        issues.append(('oversized-bytes', f"{info['bytes'] / 1024:.0f} KB > {max_bytes / 1024:.0f} KB"))
+    if max(info.get('width') or 0, info.get('height') or 0) > max_side:
+        issues.append(('oversized-dimensions', f"{info['width']}x{info['height']} > {max_side}"))
+    extension = os.path.splitext(key.lower())[1]
+    if info['format'] != 'unknown' and EXTENSION_FORMATS.get(extension) != info['format']:
+        issues.append(('extension-mismatch', f"扩展名 {extension} 实际是 {info['format']}"))
+    # 尺寸变体本来就有AVIF/JPEG回退格式
+    elif info['format'] != EXPECTED_FORMAT and not photo_variants.is_variant(key):
+        issues.append(('wrong-format', f"{info['format']} (应为 {EXPECTED_FORMAT})"))
+    return issues
+
+
+def audit(objects, index, max_bytes=MAX_BYTES, max_side=MAX_SIDE):
+    """[(key, entry)] -> [(key, 类型, 说明)]，对象须已在索引中"""
+    problems = []
+    for key, entry in objects:
+        info = index.get(entry['etag'])
+        if info is None:
+            continue
+        info = dict(info, bytes=entry['size'])
+        problems.extend((key, kind, detail) for kind, detail in check(key, info, max_bytes, max_side))
+    return problems
+
+
+def _self_test_fixtures():
+    """Pillow编码的样本 [(名称, 字节, 应解析出的字段)]；尺寸取奇数，避免宽高写反或差一时碰巧相等"""
+    from PIL import Image, ImageCms, ImageDraw, features
+
+    rgb = Image.new('RGB', (123, 45), (236, 232, 224))
+    ImageDraw.Draw(rgb).line((0, 0, 123, 45), fill=(234, 67, 53), width=3)
+    rgba = rgb.convert('RGBA')
+    rgba.putpixel((0, 0), (0, 0, 0, 0))
+    frames = {'save_all': True, 'append_images': [rgb.rotate(180)]}
+    icc = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    size = {'width': 123, 'height': 45}
+
+    def encode(image, format, **options):
+        output = io.BytesIO()
+        image.save(output, format, **options)
+        return output.getvalue()
+
+    webp = dict(size, format='webp')
+    fixtures = [
+        ('WebP VP8', encode(rgb, 'WEBP', quality=80), dict(webp, lossless=False, alpha=False, animated=False)),
+        ('WebP VP8 3000x17', encode(Image.new('RGB', (3000, 17)), 'WEBP'),
+         {'format': 'webp', 'width': 3000, 'height': 17, 'lossless': False}),
+        ('WebP VP8L', encode(rgb, 'WEBP', lossless=True), dict(webp, lossless=True, alpha=False, animated=False)),
+        ('WebP VP8L alpha', encode(rgba, 'WEBP', lossless=True), dict(webp, lossless=True, alpha=True)),
+        ('WebP VP8X alpha', encode(rgba, 'WEBP', quality=80), dict(webp, lossless=False, alpha=True, animated=False)),
+        ('WebP VP8X ICC+VP8L', encode(rgb, 'WEBP', lossless=True, icc_profile=icc),
+         dict(webp, lossless=True, animated=False)),
+        ('WebP VP8X 动画', encode(rgb, 'WEBP', quality=80, **frames), dict(webp, lossless=False, animated=True)),
+        ('WebP VP8X 无损动画', encode(rgb, 'WEBP', lossless=True, **frames), dict(webp, lossless=True, animated=True)),
+        ('PNG RGBA', encode(rgba, 'PNG'), dict(size, format='png', bit_depth=8, color_type=6, alpha=True)),
+        ('PNG P', encode(rgb.convert('P'), 'PNG'), dict(size, format='png', color_type=3, alpha=False)),
+        ('PNG 16位灰度', encode(Image.new('I;16', (5, 7)), 'PNG'),
+         {'format': 'png', 'width': 5, 'height': 7, 'bit_depth': 16, 'color_type': 0}),
+        ('JPEG q75', encode(rgb, 'JPEG', quality=75),
+         dict(size, format='jpeg', quality=75, components=3, progressive=False)),
+        ('JPEG 渐进 q30', encode(rgb, 'JPEG', quality=30, progressive=True),
+         dict(size, format='jpeg', quality=30, progressive=True)),
+        ('JPEG 灰度 q95', encode(rgb.convert('L'), 'JPEG', quality=95), dict(size, format='jpeg', quality=95, components=1)),
+        # 40KB的EXIF把SOF推到第一次读取的 HEADER_BYTES 之外
+        ('JPEG 大EXIF', encode(rgb, 'JPEG', quality=60, exif=b'Exif\x00\x00' + bytes(40000)),
+         dict(size, format='jpeg', quality=60)),
+    ]
+    if features.check('avif'):
+        fixtures.append(('AVIF', encode(rgb, 'AVIF', quality=60), dict(size, format='avif')))
+    return fixtures
+
+
+def self_test():
+    """每个样本的解析结果包含应有的字段；文件头的任意前缀要么抛出 Truncated，要么与完整解析结果相同"""
+    from PIL import features
+
+    fixtures = _self_test_fixtures()
+    for name, data, expected in fixtures:
+        info = parse_header(data)
+        wrong = {field: info.get(field) for field, value in expected.items() if info.get(field) != value}
+        assert not wrong, f"{name}: {wrong} != {expected}"
+        for length in range(len(data)):
+            try:
+                partial = parse_header(data[:length])
+            except Truncated:
+                continue
+            assert partial == info, f"{name}: 前 {length} 字节解析为 {partial}"
+        print(f"  ✅ {name}: {info['width']}x{info['height']}, {len(data)} 字节")
+    assert parse_header(b'GIF89a' + bytes(20)) == {'format': 'unknown'}
+    if not features.check('avif'):
+        print("  ⚠️  Pillow没有AVIF编码支持，跳过AVIF样本")
+    print(f"{len(fixtures)} 个样本的文件头解析与所有前缀截断检查通过")
+
+
+def main():
+    args = sys.argv[1:]
+    if '--self-test' in args:
+        self_test()
+        return
+    max_bytes, max_side = MAX_BYTES, MAX_SIDE
+    if '--max-bytes' in args:
+        i = args.index('--max-bytes')
+        max_bytes = int(args[i + 1])
+        del args[i:i + 2]
+    if '--max-side' in args:
+        i = args.index('--max-side')
+        max_side = int(args[i + 1])
+        del args[i:i + 2]
+    albums = [a for a in args if not a.startswith('--')] or s3_client.ALBUMS
+
+    start = time.time()
+    inventory = s3_inventory.load_inventory(albums)
+    objects = image_objects(inventory, albums)
+    index = MetadataIndex().load()
+    read, errors = index.update(objects)
+    index.save()
+    etags = {entry['etag'] for _, entry in objects if index.get(entry['etag'])}
+    header_bytes = sum(index.get(etag).get('header_bytes', 0) for etag in etags)
+    total_bytes = sum(entry['size'] for _, entry in objects)
+    print(f"图片 {len(objects)} 张 ({total_bytes / 1024 / 1024:.1f} MB), 新读取文件头 {read} 个, "
+          f"{time.time() - start:.2f} 秒 (文件头共 {header_bytes / 1024 / 1024:.1f} MB)")
+    for key, error in errors:
+        print(f"  ❌ {key}: {error}")
+
+    formats = Counter(index.get(entry['etag'])['format'] for _, entry in objects if index.get(entry['etag']))
+    print("格式: " + ", ".join(f"{fmt} {count}" for fmt, count in formats.most_common()))
+
+    problems = audit(objects, index, max_bytes, max_side)
+    by_kind = Counter(kind for _, kind, _ in problems)
+    print(f"\n问题 {len(problems)} 个: " + (", ".join(f"{kind} {count}" for kind, count in by_kind.most_common()) or '无'))
+    for key, kind, detail in sorted(problems, key=lambda p: (p[1], p[0])):
+        print(f"  [{kind}] {key}: {detail}")
+
+
+if __name__ == "__main__":
+    main()
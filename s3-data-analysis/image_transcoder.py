@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+进程内图片转码引擎
+用 Pillow 在进程内解码/编码，编码分布到按CPU核数创建的 ProcessPoolExecutor 上，
+S3对象以字节形式在内存中下载/上传，不写临时文件，也不再 fork cwebp / ImageMagick。
+每张图片返回编码耗时和压缩比。
+
+    python3 image_transcoder.py staticmap_pngs_to_convert.json --dry-run   # 只转码不上传，打印统计
+"""
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image
+
+import s3_client
+
+DEFAULT_QUALITY = 90
+DEFAULT_METHOD = 4  # libwebp 的速度/压缩率权衡，0最快 6最慢
+IO_WORKERS = 16
+
+CONTENT_TYPES = {'WEBP': 'image/webp', 'AVIF': 'image/avif', 'PNG': 'image/png', 'JPEG': 'image/jpeg'}
+
+
+def _open(data):
+    """解码并把调色板/灰度等模式统一成RGB或RGBA"""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        with image:
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def _encode(image, source_bytes, format='WEBP', quality=DEFAULT_QUALITY, lossless=False,
+            method=DEFAULT_METHOD, max_width=None):
+    """把已解码的图片编码为目标格式，返回 (字节, 统计)"""
+    start = time.perf_counter()
+    source_size = image.size
+    if max_width and image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.LANCZOS)
+    output = io.BytesIO()
+    options = {'quality': quality}
+    if format == 'WEBP':
+        options.update(lossless=lossless, method=method)
+    elif format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+    image.save(output, format=format, **options)
+    encoded = output.getvalue()
+    return encoded, {
+        'format': format,
+        'width': image.width,
+        'height': image.height,
+        'source_width': source_size[0],
+        'source_height': source_size[1],
+        'src_bytes': source_bytes,
+        'dst_bytes': len(encoded),
+        'ratio': round(len(encoded) / source_bytes, 4) if source_bytes else None,
+        'encode_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
+
+
+def transcode(data, format='WEBP', quality=DEFAULT_QUALITY, lossless=False, method=DEFAULT_METHOD,
+              max_width=None):
+    """把图片字节转码为目标格式，返回 (字节, 统计)；max_width 时等比缩小到该宽度（不放大）
+    在工作进程中执行，参数和返回值都必须可pickle"""
+    start = time.perf_counter()
+    with _open(data) as image:
+        encoded, stats = _encode(image, len(data), format, quality, lossless, method, max_width)
+    stats['encode_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return encoded, stats
+
+
+def transcode_variants(data, specs):
+    """只解码一次，按多个规格（transcode 的关键字参数字典）编码，返回 [(字节, 统计)]"""
+    with _open(data) as image:
+        return [_encode(image, len(data), **spec) for spec in specs]
+
+
+def webp_key_for(s3_path):
+    """staticmap.png -> staticmap.webp（同目录同名）"""
+    return os.path.splitext(s3_path)[0] + '.webp'
+
+
+def format_stats(stats):
+    return (f"{stats['src_bytes'] / 1024:.1f} KB -> {stats['dst_bytes'] / 1024:.1f} KB "
+            f"(压缩比 {stats['ratio']:.2f}), 编码 {stats['encode_ms']:.0f} ms")
+
+
+class TranscodeEngine:
+    """进程池转码引擎: I/O在线程里做，解码/编码在按核数创建的进程池里做"""
+
+    def __init__(self, processes=None, io_workers=IO_WORKERS):
+        self.processes = processes or os.cpu_count() or 1
+        self.io_workers = io_workers
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        return self
+
+    def __exit__(self, *exc):
+        self._pool.shutdown()
+        self._pool = None
+
+    def submit(self, data, **options):
+        """提交一次转码，返回 Future[(字节, 统计)]"""
+        return self._pool.submit(transcode, data, **options)
+
+    def submit_variants(self, data, specs):
+        """提交一次多规格转码，返回 Future[[(字节, 统计)]]"""
+        return self._pool.submit(transcode_variants, data, specs)
+
+    def convert_object(self, source, destination, dry_run=False, **options):
+        """下载S3对象 -> 进程池转码 -> 上传，全程在内存中完成，返回统计"""
+        data = s3_client.download_bytes(source)
+        encoded, stats = self.submit(data, **options).result()
+        if not dry_run:
+            content_type = CONTENT_TYPES.get(options.get('format', 'WEBP'))
+            stats['etag'] = s3_client.upload_bytes(encoded, destination, content_type).strip('"')
+        return stats
+
+    def convert_objects(self, pairs, dry_run=False, **options):
+        """并发转换一组 (源, 目标)，逐个yield (源, 目标, 统计或None, 错误或None)"""
+        def run(pair):
+            try:
+                return pair[0], pair[1], self.convert_object(pair[0], pair[1], dry_run, **options), None
+            except Exception as e:
+                return pair[0], pair[1], None, e
+
+        with ThreadPoolExecutor(max_workers=self.io_workers) as executor:
+            yield from executor.map(run, pairs)
+
+
+def summarize(all_stats):
+    """汇总多张图片的统计"""
+    all_stats = list(all_stats)
+    src = sum(s['src_bytes'] for s in all_stats)
+    dst = sum(s['dst_bytes'] for s in all_stats)
+    return {
+        'images': len(all_stats),
+        'src_bytes': src,
+        'dst_bytes': dst,
+        'ratio': round(dst / src, 4) if src else None,
+        'encode_ms': round(sum(s['encode_ms'] for s in all_stats), 1)
+    }
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("用法: python3 image_transcoder.py <文件列表.json> [--dry-run]")
+        sys.exit(1)
+    dry_run = '--dry-run' in args
+    with open(args[0], 'r', encoding='utf-8') as f:
+        files = json.load(f)
+
+    start = time.time()
+    results = []
+    with TranscodeEngine() as engine:
+        print(f"进程数: {engine.processes}, I/O线程: {engine.io_workers}")
+        pairs = [(f['path'], webp_key_for(f['path'])) for f in files]
+        for source, _, stats, error in engine.convert_objects(pairs, dry_run=dry_run):
+            if error:
+                print(f"❌ {source}: {error}")
+            else:
+                results.append(stats)
+                print(f"✅ {source}: {format_stats(stats)}")
+
+    elapsed = time.time() - start
+    summary = summarize(results)
+    print(f"\n{summary['images']}/{len(files)} 张, {elapsed:.2f} 秒, {summary['images'] / elapsed:.1f} 张/秒, "
+          f"总压缩比 {summary['ratio']}, 编码总耗时 {summary['encode_ms'] / 1000:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,19 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 import os
 from urllib.parse import urlparse
 import time
 
-def download_json(s3_path, local_path):
-    """从S3下载JSON文件"""
-    print(f"下载 {s3_path} 到 {local_path}")
-    cmd = ['aws', 's3', 'cp', s3_path, local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"下载失败: {result.stderr}")
+import catalog_store
+import s3_client
 
 def upload_json(local_path, s3_path):
     """上传JSON文件到S3"""
     print(f"上传 {local_path} 到 {s3_path}")
-    cmd = ['aws', 's3', 'cp', local_path, s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"上传失败: {result.stderr}")
+    try:
+        s3_client.upload_file(local_path, s3_path)
+    except Exception as e:
+        raise Exception(f"上传失败: {e}")
 
 def extract_merchant_directory(photo_url):
     """从photos URL中提取商户目录"""
@@ -34,8 +28,8 @@ def extract_merchant_directory(photo_url):
                 return path_parts[i+1]
     return None
 
-def move_static_map(source_url, target_directory, env):
-    """移动静态地图到商户目录"""
+def static_map_move(source_url, target_directory, env):
+    """计算静态地图移动到商户目录的 (源S3路径, 目标S3路径, 新CDN URL)"""
     # 构造源S3路径
     if source_url.startswith('https://'):
         # 转换CDN URL为S3路径
@@ -46,20 +40,8 @@ def move_static_map(source_url, target_directory, env):
     
     # 构造目标S3路径
     target_s3 = f"s3://baliciaga-database/dining-image-{env}/{target_directory}/staticmap.png"
-    
-    # 执行移动
-    print(f"  移动: {source_s3}")
-    print(f"    到: {target_s3}")
-    
-    cmd = ['aws', 's3', 'mv', source_s3, target_s3]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        # 返回新的CDN URL
-        return f"https://dyyme2yybmi4j.cloudfront.net/dining-image-{env}/{target_directory}/staticmap.png"
-    else:
-        print(f"    错误: {result.stderr}")
-        return None
+    new_url = f"https://dyyme2yybmi4j.cloudfront.net/dining-image-{env}/{target_directory}/staticmap.png"
+    return source_s3, target_s3, new_url
 
 def process_environment(env_name, json_filename, s3_json_path):
     """处理一个环境的所有静态地图"""
@@ -67,12 +49,8 @@ def process_environment(env_name, json_filename, s3_json_path):
     print(f"处理 {env_name.upper()} 环境")
     print(f"{'='*60}\n")
     
-    # 下载JSON文件
-    download_json(s3_json_path, json_filename)
-    
-    # 读取JSON数据
-    with open(json_filename, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # 读取JSON数据（ETag未变时直接使用本地缓存）
+    data = catalog_store.load(json_filename)
     
     # 统计
     total_items = len(data)
@@ -80,6 +58,8 @@ def process_environment(env_name, json_filename, s3_json_path):
     skipped = 0
     errors = 0
     
+    moves = []
+    
     # 处理每个商户
     for idx, item in enumerate(data):
         print(f"\n[{idx+1}/{total_items}] 处理商户: {item.get('name', 'Unknown')}")
@@ -105,17 +85,26 @@ def process_environment(env_name, json_filename, s3_json_path):
         
         print(f"  商户目录: {merchant_dir}")
         
-        # 移动静态地图
-        old_url = item['staticMapS3Url']
-        new_url = move_static_map(old_url, merchant_dir, env_name)
-        
-        if new_url:
+        # 记录待移动的静态地图，循环结束后批量移动
+        source_s3, target_s3, new_url = static_map_move(item['staticMapS3Url'], merchant_dir, env_name)
+        print(f"  移动: {source_s3}")
+        print(f"    到: {target_s3}")
+        moves.append((item, source_s3, target_s3, new_url))
+    
+    # 批量移动: 并发服务端复制并校验，源文件按1000个一批删除
+    result = s3_client.move_objects([(source_s3, target_s3) for _, source_s3, target_s3, _ in moves])
+    moved = set(result['moved'])
+    for source_s3, _, error in result['failed']:
+        print(f"  错误: {source_s3}: {error}")
+    
+    for item, source_s3, target_s3, new_url in moves:
+        if (source_s3, target_s3) in moved:
             item['staticMapS3Url'] = new_url
             processed += 1
-            print(f"  成功: 更新URL")
+            print(f"  成功: 更新 {item.get('name', 'Unknown')} 的URL")
         else:
             errors += 1
-            print(f"  失败: 保持原URL")
+            print(f"  失败: {item.get('name', 'Unknown')} 保持原URL")
     
     # 保存更新后的JSON
     with open(json_filename, 'w', encoding='utf-8') as f:
@@ -159,23 +148,20 @@ def main():
     
     # 获取一个示例
     print("\n获取示例...")
-    subprocess.run(['aws', 's3', 'cp', 's3://baliciaga-database/data/dining-dev.json', 'temp.json'], capture_output=True)
-    with open('temp.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        for item in data:
-            if 'staticMapS3Url' in item and item['staticMapS3Url'] and 'staticmap.png' in item['staticMapS3Url']:
-                example_after = {
-                    'name': item.get('name', 'Unknown'),
-                    'url': item['staticMapS3Url']
-                }
-                # 构造修改前的URL（基于模式）
-                merchant_dir = extract_merchant_directory(item['photos'][0]) if item.get('photos') else 'unknown'
-                example_before = {
-                    'name': example_after['name'],
-                    'url': f"https://dyyme2yybmi4j.cloudfront.net/dining-image-dev/static-maps/{merchant_dir}.png"
-                }
-                break
-    os.remove('temp.json')
+    data = catalog_store.load('dining-dev.json')
+    for item in data:
+        if 'staticMapS3Url' in item and item['staticMapS3Url'] and 'staticmap.png' in item['staticMapS3Url']:
+            example_after = {
+                'name': item.get('name', 'Unknown'),
+                'url': item['staticMapS3Url']
+            }
+            # 构造修改前的URL（基于模式）
+            merchant_dir = extract_merchant_directory(item['photos'][0]) if item.get('photos') else 'unknown'
+            example_before = {
+                'name': example_after['name'],
+                'url': f"https://dyyme2yybmi4j.cloudfront.net/dining-image-dev/static-maps/{merchant_dir}.png"
+            }
+            break
     
     # 生成最终报告
     print("\n" + "="*60)
@@ -1,133 +1,88 @@
 #!/usr/bin/env python3
-import subprocess
 import json
-import os
-from urllib.parse import urlparse
+import sys
 import time
 
-def download_json(s3_path, local_path):
-    """从S3下载JSON文件"""
-    print(f"下载 {s3_path}")
-    cmd = ['aws', 's3', 'cp', s3_path, local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"下载失败: {result.stderr}")
+import catalog_commit
+import catalog_store
+import migration_engine
 
-def upload_json(local_path, s3_path):
-    """上传JSON文件到S3"""
-    print(f"上传 {local_path} 到 {s3_path}")
-    cmd = ['aws', 's3', 'cp', local_path, s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"上传失败: {result.stderr}")
+PLAN_FILE = migration_engine.plan_path('bar_staticmap_migration_plan.json')
 
-def move_static_map(source_s3, target_directory, env):
-    """移动静态地图到商户目录"""
-    # 构造目标S3路径
-    target_s3 = f"s3://baliciaga-database/bar-image-{env}/{target_directory}/staticmap.png"
-    
-    # 执行移动
-    print(f"  移动: {source_s3}")
-    print(f"    到: {target_s3}")
-    
-    cmd = ['aws', 's3', 'mv', source_s3, target_s3]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        # 返回新的CDN URL
-        return f"https://dyyme2yybmi4j.cloudfront.net/bar-image-{env}/{target_directory}/staticmap.png"
-    else:
-        print(f"    错误: {result.stderr}")
-        return None
+def target_s3_path(target_directory, env):
+    """商户目录下的静态地图S3路径"""
+    return f"s3://baliciaga-database/bar-image-{env}/{target_directory}/staticmap.png"
+
+def target_url(target_directory, env):
+    """商户目录下的静态地图CDN URL"""
+    return f"https://dyyme2yybmi4j.cloudfront.net/bar-image-{env}/{target_directory}/staticmap.png"
+
+def build_plan(analysis):
+    """根据分析结果生成迁移计划，返回 (操作清单, {(env, 商户名): 操作})"""
+    operations = []
+    by_merchant = {}
+    for env in ('dev', 'prod'):
+        for item in analysis[env]['exists']:
+            if not item['directory']:
+                print(f"\n跳过 {item['name']}: 无法确定目标目录")
+                continue
+            operation = migration_engine.move_op(item['s3_path'], target_s3_path(item['directory'], env))
+            operation['id'] = migration_engine.operation_id(operation)
+            operations.append(operation)
+            by_merchant[(env, item['name'])] = operation
+    return operations, by_merchant
+
+def update_urls(data, analysis, env, by_merchant, journal):
+    """把已成功移动的商户的URL写回JSON数据"""
+    processed = 0
+    moved = {
+        item['name']: target_url(item['directory'], env)
+        for item in analysis[env]['exists']
+        if (env, item['name']) in by_merchant
+        and journal.is_done(by_merchant[(env, item['name'])]['id'])
+    }
+    for bar_item in data:
+        new_url = moved.get(bar_item.get('name'))
+        if new_url:
+            bar_item['staticMapS3Url'] = new_url
+            processed += 1
+            print(f"  成功: 更新 {bar_item['name']} 的URL")
+    return processed
 
 def process_migrations():
     """执行静态地图迁移"""
     print("# CCt#28: 执行Bar分类静态地图迁移")
     print(f"开始时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    dry_run = '--dry-run' in sys.argv
     
     # 加载分析结果
     with open('bar_staticmap_analysis.json', 'r', encoding='utf-8') as f:
         analysis = json.load(f)
     
-    # 下载JSON文件
-    download_json('s3://baliciaga-database/data/bars-dev.json', 'bars-dev.json')
-    download_json('s3://baliciaga-database/data/bars.json', 'bars.json')
-    
-    # 读取JSON数据
-    with open('bars-dev.json', 'r', encoding='utf-8') as f:
-        bars_dev_data = json.load(f)
-    with open('bars.json', 'r', encoding='utf-8') as f:
-        bars_prod_data = json.load(f)
-    
-    # 统计
-    dev_processed = 0
-    prod_processed = 0
+    # 生成并执行迁移计划（中断后重新运行会从日志处继续）
+    operations, by_merchant = build_plan(analysis)
+    migration_engine.write_plan(PLAN_FILE, operations, 'Bar分类静态地图迁移')
+    result = migration_engine.run_plan_file(PLAN_FILE, dry_run=dry_run)
+    if dry_run:
+        return
+    print(f"移动完成: {result['done']}, 失败: {len(result['failed'])}, 跳过: {result['skipped']}")
+    journal = migration_engine.Journal(migration_engine.journal_path_for(PLAN_FILE))
     
-    # 处理DEV环境
+    # 更新JSON中的URL
     print("\n" + "="*60)
-    print("处理 DEV 环境")
+    print("更新 JSON 中的URL")
     print("="*60)
     
-    for item in analysis['dev']['exists']:
-        merchant_name = item['name']
-        merchant_dir = item['directory']
-        s3_path = item['s3_path']
-        
-        if not merchant_dir:
-            print(f"\n跳过 {merchant_name}: 无法确定目标目录")
-            continue
-        
-        print(f"\n处理商户: {merchant_name}")
-        
-        # 移动静态地图
-        new_url = move_static_map(s3_path, merchant_dir, 'dev')
-        
-        if new_url:
-            # 更新JSON中的URL
-            for bar_item in bars_dev_data:
-                if bar_item.get('name') == merchant_name:
-                    bar_item['staticMapS3Url'] = new_url
-                    dev_processed += 1
-                    print(f"  成功: 更新URL")
-                    break
-    
-    # 处理PROD环境
-    print("\n" + "="*60)
-    print("处理 PROD 环境")
-    print("="*60)
+    bars_dev_data, dev_etag = catalog_store.load_with_etag('bars-dev.json')
+    bars_prod_data, prod_etag = catalog_store.load_with_etag('bars.json')
+    dev_processed = update_urls(bars_dev_data, analysis, 'dev', by_merchant, journal)
+    prod_processed = update_urls(bars_prod_data, analysis, 'prod', by_merchant, journal)
     
-    for item in analysis['prod']['exists']:
-        merchant_name = item['name']
-        merchant_dir = item['directory']
-        s3_path = item['s3_path']
-        
-        if not merchant_dir:
-            print(f"\n跳过 {merchant_name}: 无法确定目标目录")
-            continue
-        
-        print(f"\n处理商户: {merchant_name}")
-        
-        # 移动静态地图
-        new_url = move_static_map(s3_path, merchant_dir, 'prod')
-        
-        if new_url:
-            # 更新JSON中的URL
-            for bar_item in bars_prod_data:
-                if bar_item.get('name') == merchant_name:
-                    bar_item['staticMapS3Url'] = new_url
-                    prod_processed += 1
-                    print(f"  成功: 更新URL")
-                    break
-    
-    # 保存更新后的JSON
-    with open('bars-dev.json', 'w', encoding='utf-8') as f:
-        json.dump(bars_dev_data, f, ensure_ascii=False, indent=2)
-    with open('bars.json', 'w', encoding='utf-8') as f:
-        json.dump(bars_prod_data, f, ensure_ascii=False, indent=2)
-    
-    # 上传回S3
-    upload_json('bars-dev.json', 's3://baliciaga-database/data/bars-dev.json')
-    upload_json('bars.json', 's3://baliciaga-database/data/bars.json')
+    # 一次性提交两个JSON文件
+    commit = catalog_commit.CatalogCommit('Bar分类静态地图迁移')
+    commit.stage('bars-dev.json', bars_dev_data, base_etag=dev_etag)
+    commit.stage('bars.json', bars_prod_data, base_etag=prod_etag)
+    catalog_commit.print_commit(commit.commit())
     
     # 生成最终报告
     print("\n" + "="*60)
@@ -168,10 +123,6 @@ def process_migrations():
     
     print(f"\n\n缺失清单已保存到 bar_missing_staticmaps.json")
     print(f"完成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    # 清理临时文件
-    os.remove('bars-dev.json')
-    os.remove('bars.json')
 
 if __name__ == "__main__":
     process_migrations()
\ No newline at end of file
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import s3_client
 
 def load_json_data():
     """加载所有JSON文件以获取placeId映射"""
@@ -41,8 +41,8 @@ def load_json_data():
     
     return merchant_place_id_map
 
-def migrate_single_file(file_info, merchant_map):
-    """迁移单个静态地图文件到正确路径"""
+def plan_single_file(file_info, merchant_map):
+    """确定单个静态地图文件的迁移目标，返回 (源路径, 目标路径, 商户目录, 新相对路径)，无法迁移时返回结果信息"""
     try:
         album = file_info['album']
         key = file_info['key']
@@ -85,26 +85,27 @@ def migrate_single_file(file_info, merchant_map):
         # S3路径
         source_path = f"s3://baliciaga-database/{key}"
         dest_path = f"s3://baliciaga-database/{new_key}"
-        
-        # 复制文件到新路径
-        copy_cmd = ['aws', 's3', 'cp', source_path, dest_path]
-        result = subprocess.run(copy_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            return f"❌ 复制失败 {merchant_folder}: {result.stderr}"
-        
-        # 删除旧文件
-        delete_cmd = ['aws', 's3', 'rm', source_path]
-        result = subprocess.run(delete_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            return f"⚠️  复制成功但删除失败 {merchant_folder}: {result.stderr}"
-        
-        return f"✅ 成功迁移 {merchant_folder} -> {new_folder}/{new_filename}"
+        return source_path, dest_path, merchant_folder, f"{new_folder}/{new_filename}"
         
     except Exception as e:
         return f"❌ 错误 {file_info['key']}: {str(e)}"
 
+def migrate_files(plans):
+    """批量移动: 并发复制校验后每1000个key一批删除源文件，返回结果信息列表"""
+    by_source = {plan[0]: plan for plan in plans}
+    moved = s3_client.move_objects([(plan[0], plan[1]) for plan in plans], max_workers=10)
+    results = []
+    for source_path, _ in moved['moved']:
+        _, _, merchant_folder, new_path = by_source[source_path]
+        results.append(f"✅ 成功迁移 {merchant_folder} -> {new_path}")
+    for source_path, _, error in moved['failed']:
+        merchant_folder = by_source[source_path][2]
+        if str(error).startswith("已复制但删除源文件失败"):
+            results.append(f"⚠️  复制成功但删除失败 {merchant_folder}: {error}")
+        else:
+            results.append(f"❌ 复制失败 {merchant_folder}: {error}")
+    return results
+
 def main():
     """主函数"""
     print("加载商户PlaceId映射...")
@@ -124,31 +125,30 @@ def main():
         print("没有需要迁移的文件")
         return
     
-    # 使用线程池并行处理
+    # 先确定目标路径，再批量迁移
     successful = 0
     failed = 0
     results = []
+    plans = []
+    for file_info in files_to_migrate:
+        plan = plan_single_file(file_info, merchant_map)
+        if isinstance(plan, str):
+            results.append(plan)
+        else:
+            plans.append(plan)
     
     print("开始迁移...")
     print("=" * 80)
     
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_file = {
-            executor.submit(migrate_single_file, file_info, merchant_map): file_info 
-            for file_info in files_to_migrate
-        }
+    results.extend(migrate_files(plans))
+    for result in results:
+        if result.startswith("✅"):
+            successful += 1
+        else:
+            failed += 1
         
-        for future in as_completed(future_to_file):
-            result = future.result()
-            results.append(result)
-            
-            if result.startswith("✅"):
-                successful += 1
-            else:
-                failed += 1
-            
-            total_processed = successful + failed
-            print(f"[{total_processed}/{len(files_to_migrate)}] {result}")
+        total_processed = successful + failed
+        print(f"[{total_processed}/{len(files_to_migrate)}] {result}")
     
     # 最终报告
     print("\n" + "=" * 80)
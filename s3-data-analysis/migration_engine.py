@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+声明式迁移计划引擎
+从文件读取 copy / move / delete 操作清单，按计划顺序分成依赖层执行: 写同一对象、或一个写一个读同一对象的
+操作按先后落在不同的层（copy只读源，多个copy共用一个源时互不排序），每层内并发执行、整层（含删除）完成后才进入下一层。
+每完成一个操作就追加写一行日志（move复制校验后先记 copied，删除源后记 done），
+中断后重新运行会跳过日志里已完成的操作，从中断处继续。--dry-run 按同样的分层顺序模拟执行，
+每个操作都与前序操作执行后的桶状态对比（只读，不改动桶）。
+
+计划文件格式（JSON）:
+    {"name": "...", "operations": [
+        {"op": "copy",   "src": "s3://baliciaga-database/a", "dst": "s3://baliciaga-database/b"},
+        {"op": "move",   "src": "...", "dst": "..."},
+        {"op": "delete", "src": "..."}
+    ]}
+也可以直接读取旧的生成脚本（每行一个 aws s3 cp/mv/rm），例如 migrate_s3_images.sh。
+
+    python3 migration_engine.py migrate_s3_images.sh --dry-run
+    python3 migration_engine.py migrate_s3_images.sh --workers 32
+"""
+import hashlib
+import json
+import os
+import shlex
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import s3_client
+
+DEFAULT_WORKERS = 16
+# 各脚本生成的计划文件和旁边的日志放在本地缓存目录，不写进当前目录
+PLAN_DIR = os.environ.get(
+    'MIGRATION_PLAN_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.migration_plans')
+)
+OPERATIONS = ('copy', 'move', 'delete')
+# 只影响输出的参数，可以忽略；其他参数（--recursive、--exclude 等）引擎无法照做，直接报错
+IGNORED_FLAGS = ('--quiet', '--only-show-errors', '--no-progress')
+
+
+def copy_op(src, dst):
+    return {'op': 'copy', 'src': src, 'dst': dst}
+
+
+def move_op(src, dst):
+    return {'op': 'move', 'src': src, 'dst': dst}
+
+
+def delete_op(src):
+    return {'op': 'delete', 'src': src}
+
+
+def operation_id(operation):
+    """由操作内容生成稳定ID，计划顺序变化不影响续跑"""
+    raw = f"{operation['op']}|{operation['src']}|{operation.get('dst', '')}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_shell_plan(path):
+    """把 aws s3 cp/mv/rm 逐行脚本解析成操作清单"""
+    operations = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith('aws s3 '):
+                continue
+            args = shlex.split(line)[2:]
+            unsupported = [a for a in args if a.startswith('--') and a not in IGNORED_FLAGS]
+            if unsupported:
+                raise Exception(f"不支持的参数 {' '.join(unsupported)}: {line}")
+            args = [a for a in args if not a.startswith('--')]
+            if args[0] == 'cp' and len(args) >= 3:
+                operations.append(copy_op(args[1], args[2]))
+            elif args[0] == 'mv' and len(args) >= 3:
+                operations.append(move_op(args[1], args[2]))
+            elif args[0] == 'rm' and len(args) >= 2:
+                operations.append(delete_op(args[1]))
+    return {'name': os.path.basename(path), 'operations': operations}
+
+
+def load_plan(path):
+    """读取计划文件（JSON或旧的shell脚本）"""
+    if path.endswith('.sh'):
+        plan = parse_shell_plan(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+        if isinstance(plan, list):
+            plan = {'name': os.path.basename(path), 'operations': plan}
+    for operation in plan['operations']:
+        if operation.get('op') not in OPERATIONS:
+            raise Exception(f"未知操作: {operation}")
+        operation['id'] = operation_id(operation)
+    return plan
+
+
+def plan_path(filename):
+    """计划文件在 PLAN_DIR 下的路径"""
+    return os.path.join(PLAN_DIR, filename)
+
+
+def write_plan(path, operations, name=''):
+    """把操作清单写成计划文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'name': name, 'operations': operations}, f, ensure_ascii=False, indent=2)
+    return path
+
+
+class Journal:
+    """追加写的操作日志（JSON Lines），每条记录写完立即落盘"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 中断时可能留下半行
+                    self.entries[entry['id']] = entry
+
+    def is_done(self, op_id):
+        entry = self.entries.get(op_id)
+        return entry is not None and entry['status'] == 'done'
+
+    def get(self, op_id):
+        return self.entries.get(op_id)
+
+    def record(self, operation, status, **extra):
+        entry = {
+            'id': operation['id'],
+            'op': operation['op'],
+            'src': operation['src'],
+            'dst': operation.get('dst'),
+            'status': status,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        entry.update(extra)
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[entry['id']] = entry
+        return entry
+
+
+def journal_path_for(plan_path):
+    return plan_path + '.journal.jsonl'
+
+
+def execute_operation(operation, entry=None):
+    """执行操作中的复制部分，返回写入日志的附加信息；move/delete的删除部分由run_plan按层批量完成
+    entry 为该操作上次的日志记录: move已记 copied 且目标ETag未变时不再复制（源文件可能已被删除）"""
+    if operation['op'] == 'delete':
+        return {}
+    if operation['op'] == 'move' and entry and entry['status'] == 'copied':
+        dst = s3_client.head_object(operation['dst'])
+        if dst is not None and dst['ETag'].strip('"') == entry.get('etag'):
+            return {'etag': entry['etag']}
+    return {'etag': s3_client.verified_copy(operation['src'], operation['dst']).strip('"')}
+
+
+def operation_access(operation):
+    """操作读和写的对象 ({(bucket, key)}, {(bucket, key)})；move/delete 会删除源，源算写"""
+    src = s3_client.parse_s3_path(operation['src'])
+    if operation['op'] == 'delete':
+        return set(), {src}
+    dst = s3_client.parse_s3_path(operation['dst'])
+    if operation['op'] == 'copy':
+        return {src}, {dst}
+    return {src}, {src, dst}
+
+
+def operation_objects(operation):
+    """操作读写的对象 {(bucket, key)}"""
+    reads, writes = operation_access(operation)
+    return reads | writes
+
+
+def conflicts(reads, writes, operation):
+    """operation 与读 reads、写 writes 的操作是否有写/写或读/写重叠（读/读不算）"""
+    other_reads, other_writes = operation_access(operation)
+    return bool(other_writes & (reads | writes) or other_reads & writes)
+
+
+def plan_levels(operations):
+    """按计划顺序分层: 操作排在所有与它有写/写或读/写重叠的前序操作之后一层，同层操作互不相干
+    返回 (层列表, {对象: 最后读写它的层号})"""
+    levels = []
+    last_read = {}
+    last_write = {}
+    for operation in operations:
+        reads, writes = operation_access(operation)
+        level = max(
+            [last_write[o] + 1 for o in reads | writes if o in last_write]
+            + [last_read[o] + 1 for o in writes if o in last_read],
+            default=0
+        )
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(operation)
+        for o in reads:
+            last_read[o] = max(last_read.get(o, level), level)
+        for o in writes:
+            last_write[o] = level
+    last_level = {o: max(last_read.get(o, -1), last_write.get(o, -1)) for o in last_read.keys() | last_write.keys()}
+    return levels, last_level
+
+
+def diff_operation(operation, state):
+    """对比单个操作与模拟的桶状态 {(bucket, key): ETag或None}，返回 (标记, 说明)"""
+    src = state[s3_client.parse_s3_path(operation['src'])]
+    if operation['op'] == 'delete':
+        return ('-', '删除') if src else ('=', '已不存在')
+    dst = state[s3_client.parse_s3_path(operation['dst'])]
+    if src is None:
+        if operation['op'] == 'move' and dst is not None:
+            return '=', '已移动'
+        return '!', '源文件不存在'
+    if dst is None:
+        return '+', '新建'
+    if dst == src:
+        return ('=', '内容相同') if operation['op'] == 'copy' else ('-', '目标已一致，仅删除源')
+    return '~', '覆盖'
+
+
+def simulate_operation(operation, state):
+    """把操作的效果应用到模拟的桶状态上；源不存在时操作会失败，状态不变"""
+    src = s3_client.parse_s3_path(operation['src'])
+    dst = s3_client.parse_s3_path(operation['dst']) if operation.get('dst') else None
+    if state[src] is None:
+        return
+    if dst is not None:
+        state[dst] = state[src]
+    if operation['op'] != 'copy' and dst != src:
+        state[src] = None
+
+
+def dry_run_plan(plan, journal, workers=DEFAULT_WORKERS):
+    """只读地按 plan_levels 顺序模拟执行计划: 先并发读取涉及对象的当前ETag，
+    再逐个操作与前序操作执行后的状态对比并应用其效果"""
+    pending = [op for op in plan['operations'] if not journal.is_done(op['id'])]
+    print(f"计划 {plan['name']}: {len(plan['operations'])} 个操作, 日志中已完成 {len(plan['operations']) - len(pending)} 个")
+
+    objects = sorted({o for operation in pending for o in operation_objects(operation)})
+
+    def etag(obj):
+        head = s3_client.head_object(f"s3://{obj[0]}/{obj[1]}")
+        return head['ETag'] if head else None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        state = dict(zip(objects, executor.map(etag, objects)))
+
+    summary = {}
+    levels, _ = plan_levels(pending)
+    for operation in (operation for level in levels for operation in level):
+        mark, reason = diff_operation(operation, state)
+        simulate_operation(operation, state)
+        summary[reason] = summary.get(reason, 0) + 1
+        if mark != '=':
+            target = f" -> {operation['dst']}" if operation.get('dst') else ''
+            print(f"  {mark} [{operation['op']}] {operation['src']}{target} ({reason})")
+
+    print("\n汇总:")
+    for reason, count in sorted(summary.items(), key=lambda x: -x[1]):
+        print(f"  {reason}: {count}")
+    return summary
+
+
+def run_plan(plan, journal, workers=DEFAULT_WORKERS):
+    """执行计划中未完成的操作，返回 {'done': n, 'failed': [...], 'skipped': n}
+    按 plan_levels 逐层执行: 层内复制并发执行并校验，move复制后先记 copied；
+    之后还会被读写的对象在本层结束前批量删除，其余删除留到最后按每批1000个key一起删除。"""
+    pending = [op for op in plan['operations'] if not journal.is_done(op['id'])]
+    skipped = len(plan['operations']) - len(pending)
+    levels, last_level = plan_levels(pending)
+    print(f"计划 {plan['name']}: {len(plan['operations'])} 个操作, 跳过已完成 {skipped} 个, "
+          f"待执行 {len(pending)} 个, 分 {len(levels)} 层")
+
+    def run(operation):
+        try:
+            return operation, execute_operation(operation, journal.get(operation['id'])), None
+        except Exception as e:
+            return operation, None, e
+
+    done = 0
+    failed = []
+    deferred = []
+    # 失败操作读、写的对象；后面的层里与它们有写/写或读/写重叠的操作不再执行
+    blocked_reads = set()
+    blocked_writes = set()
+    completed = 0
+    start = time.time()
+
+    def fail(operation, error):
+        journal.record(operation, 'failed', error=str(error))
+        failed.append(operation)
+        reads, writes = operation_access(operation)
+        blocked_reads.update(reads)
+        blocked_writes.update(writes)
+        print(f"  ❌ [{operation['op']}] {operation['src']}: {error}")
+
+    def delete(batch):
+        nonlocal done
+        for i in range(0, len(batch), s3_client.DELETE_BATCH_SIZE):
+            chunk = batch[i:i + s3_client.DELETE_BATCH_SIZE]
+            try:
+                errors = dict(s3_client.delete_keys([op['src'] for op, _ in chunk]))
+            except Exception as e:
+                errors = {op['src']: str(e) for op, _ in chunk}
+            for operation, extra in chunk:
+                bucket, key = s3_client.parse_s3_path(operation['src'])
+                error = errors.get(operation['src']) or errors.get(f"s3://{bucket}/{key}")
+                if error:
+                    fail(operation, f"删除失败: {error}")
+                else:
+                    journal.record(operation, 'done', **extra)
+                    done += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, level in enumerate(levels):
+            now = []
+            runnable = []
+            for operation in level:
+                if conflicts(blocked_reads, blocked_writes, operation):
+                    completed += 1
+                    fail(operation, "前序操作失败，跳过")
+                else:
+                    runnable.append(operation)
+            for operation, extra, error in executor.map(run, runnable):
+                completed += 1
+                if error:
+                    fail(operation, error)
+                elif operation['op'] == 'copy':
+                    journal.record(operation, 'done', **extra)
+                    done += 1
+                else:
+                    if operation['op'] == 'move':
+                        journal.record(operation, 'copied', **extra)
+                    # 后面的层还会读写这个对象时必须在进入下一层前删除
+                    later = last_level[s3_client.parse_s3_path(operation['src'])] > index
+                    (now if later else deferred).append((operation, extra))
+                if completed % 50 == 0 or completed == len(pending):
+                    elapsed = time.time() - start
+                    print(f"  进度: {completed}/{len(pending)} - {completed / elapsed:.1f} ops/sec")
+            delete(now)
+
+    delete(deferred)
+    if deferred:
+        print(f"  批量删除: {len(deferred)} 个对象, {-(-len(deferred) // s3_client.DELETE_BATCH_SIZE)} 个请求")
+
+    return {'done': done, 'failed': failed, 'skipped': skipped}
+
+
+def run_plan_file(plan_path, dry_run=False, workers=DEFAULT_WORKERS):
+    """读取计划文件并执行（或dry run），日志写在计划文件旁边"""
+    plan = load_plan(plan_path)
+    journal = Journal(journal_path_for(plan_path))
+    if dry_run:
+        return dry_run_plan(plan, journal, workers)
+    return run_plan(plan, journal, workers)
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("用法: python3 migration_engine.py <计划文件> [--dry-run] [--workers N]")
+        sys.exit(1)
+    dry_run = '--dry-run' in args
+    workers = DEFAULT_WORKERS
+    if '--workers' in args:
+        workers = int(args[args.index('--workers') + 1])
+
+    result = run_plan_file(args[0], dry_run=dry_run, workers=workers)
+    if not dry_run:
+        print(f"\n完成: {result['done']}, 失败: {len(result['failed'])}, 跳过: {result['skipped']}")
+        if result['failed']:
+            print("重新运行同一命令即可重试失败的操作")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import subprocess
+import s3_client
 
 # 定义需要移动的文件映射
 moves = [
@@ -47,26 +47,23 @@ moves = [
 
 print("=== 移动cowork-prod静态地图到商户主相册 ===")
 
+# 并发复制校验后批量删除源文件
+result = s3_client.move_objects([(move['source'], move['target']) for move in moves])
+moved = {source for source, _ in result['moved']}
+errors = {source: error for source, _, error in result['failed']}
+
 success_count = 0
 for move in moves:
     print(f"\n处理: {move['merchant']}")
     
-    # 执行移动操作
-    cmd = ['aws', 's3', 'mv', move['source'], move['target']]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
+    if move['source'] in moved:
         print(f"  ✅ 成功移动到商户主相册")
         success_count += 1
+    elif s3_client.object_exists(move['target']):
+        # 目标文件已存在
+        print(f"  ✅ 文件已在正确位置")
+        success_count += 1
     else:
-        # 检查目标文件是否已存在
-        check_cmd = ['aws', 's3', 'ls', move['target']]
-        check_result = subprocess.run(check_cmd, capture_output=True, text=True)
-        
-        if check_result.returncode == 0:
-            print(f"  ✅ 文件已在正确位置")
-            success_count += 1
-        else:
-            print(f"  ❌ 移动失败: {result.stderr}")
+        print(f"  ❌ 移动失败: {errors[move['source']]}")
 
 print(f"\n总结: 成功处理 {success_count}/{len(moves)} 个文件")
\ No newline at end of file
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+相册图片感知哈希近似重复检测
+字节比较（clean_bar_duplicates.compare_directories、content_index）找不到重新编码过的副本:
+PNG -> WebP 转换、quality 90 与无损两种输出、缩小后重新上传的图片。这里为每张图片计算两种64位感知哈希:
+    dHash  9x8灰度图相邻像素比较
+    pHash  32x32灰度图的二维DCT，取左上8x8低频系数与中位数比较
+解码和缩小在进程池里做，哈希计算对整批缩略图用NumPy矩阵运算一次完成。
+哈希按 (key, ETag) 缓存在本地，对象不变就不再下载。近似查询用BK树按汉明距离剪枝，整体是亚二次的。
+
+    python3 perceptual_hash.py                          # 全部相册，pHash距离 <= 8
+    python3 perceptual_hash.py bar-image-dev bar-image-prod --threshold 6
+"""
+import io
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import catalog_index
+import photo_variants
+import s3_client
+import s3_inventory
+
+CACHE_PATH = os.environ.get(
+    'PHASH_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.phash_cache.json')
+)
+CACHE_VERSION = 1
+IMAGE_EXTENSIONS = ('.webp', '.png', '.jpg', '.jpeg', '.avif')
+DEFAULT_THRESHOLD = 8
+IO_WORKERS = 16
+BATCH_SIZE = 256
+
+DCT_SIZE = 32
+HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    """正交DCT-II矩阵，X的二维DCT为 D @ X @ D.T"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+_BIT_WEIGHTS = (1 << np.arange(63, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def thumbnails(data):
+    """解码并缩小为两张灰度缩略图 (32x32, 9x8)，在工作进程中执行"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('L', (DCT_SIZE * 4, DCT_SIZE * 4))
+        gray = image.convert('L')
+        dct_input = np.asarray(gray.resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS), dtype=np.float32)
+        diff_input = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    return dct_input, diff_input
+
+
+def _pack(bits):
+    """(N, 64) 布尔矩阵 -> N 个64位整数"""
+    return [int(v) for v in (bits.astype(np.uint64) * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)]
+
+
+def dhash_batch(diff_inputs):
+    """(N, 8, 9) -> N 个dHash"""
+    diff_inputs = np.asarray(diff_inputs)
+    bits = diff_inputs[:, :, 1:] > diff_inputs[:, :, :-1]
+    return _pack(bits.reshape(len(diff_inputs), -1))
+
+
+def phash_batch(dct_inputs):
+    """(N, 32, 32) -> N 个pHash"""
+    dct_inputs = np.asarray(dct_inputs, dtype=np.float64)
+    coefficients = np.einsum('ij,njk,lk->nil', _DCT, dct_inputs, _DCT)[:, :HASH_SIZE, :HASH_SIZE]
+    flat = coefficients.reshape(len(dct_inputs), -1)
+    # 中位数不含直流分量，避免整体亮度主导
+    medians = np.median(flat[:, 1:], axis=1, keepdims=True)
+    return _pack(flat > medians)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """按汉明距离组织的BK树，查询时用三角不等式剪掉 |d - r| 之外的子树"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        node = [value, [item], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            if distance == 0:
+                current[1].append(item)
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def query(self, value, radius):
+        """返回距离 <= radius 的 [(距离, item)]"""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                results.extend((distance, item) for item in items)
+            for d, child in children.items():
+                if distance - radius <= d <= distance + radius:
+                    stack.append(child)
+        return results
+
+
+def load_cache(path=CACHE_PATH):
+    """本地哈希缓存 {key: {etag, dhash, phash}}，哈希存为16位十六进制"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data['hashes'] if data.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(hashes, path=CACHE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'hashes': hashes}, f)
+    os.replace(tmp_path, path)
+
+
+def image_objects(inventory, albums=None):
+    """相册中的图片对象 [(key, ETag)]，不含 photo_variants 生成的变体"""
+    return [
+        (key, entry['etag'])
+        for album in albums or s3_client.ALBUMS
+        for key, entry in inventory.objects(f"{album}/")
+        if key.lower().endswith(IMAGE_EXTENSIONS) and not photo_variants.is_variant(key)
+    ]
+
+
+def compute_hashes(objects, cache, processes=None):
+    """为缓存中没有或ETag已变的对象计算哈希，就地更新缓存，返回失败列表"""
+    pending = [(key, etag) for key, etag in objects if cache.get(key, {}).get('etag') != etag]
+    errors = []
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count() or 1) as pool:
+        def run(job):
+            key, etag = job
+            try:
+                data = s3_client.download_bytes(f"s3://{s3_client.BUCKET}/{key}")
+                return key, etag, pool.submit(thumbnails, data).result(), None
+            except Exception as e:
+                return key, etag, None, e
+
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+            for start in range(0, len(pending), BATCH_SIZE):
+                batch = []
+                for key, etag, thumbs, error in executor.map(run, pending[start:start + BATCH_SIZE]):
+                    if error:
+                        errors.append((key, error))
+                    else:
+                        batch.append((key, etag, thumbs))
+                if not batch:
+                    continue
+                phashes = phash_batch([thumbs[0] for _, _, thumbs in batch])
+                dhashes = dhash_batch([thumbs[1] for _, _, thumbs in batch])
+                for (key, etag, _), p, d in zip(batch, phashes, dhashes):
+                    cache[key] = {'etag': etag, 'phash': f"{p:016x}", 'dhash': f"{d:016x}"}
+    return len(pending), errors
+
+
+def find_near_duplicates(entries, threshold=DEFAULT_THRESHOLD):
+    """entries 为 [(key, pHash, dHash)]；pHash距离 <= threshold 且 dHash距离 <= 2*threshold 视为近似重复
+    返回按连通分量合并的组 [[key, ...]]"""
+    tree = BKTree()
+    dhashes = {}
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for key, phash, dhash in entries:
+        parent[key] = key
+        dhashes[key] = dhash
+        for _, other in tree.query(phash, threshold):
+            if hamming(dhash, dhashes[other]) <= 2 * threshold:
+                parent[find(key)] = find(other)
+        tree.add(phash, key)
+
+    groups = defaultdict(list)
+    for key in parent:
+        groups[find(key)].append(key)
+    return [sorted(keys) for keys in groups.values() if len(keys) > 1]
+
+
+def describe(keys):
+    """组的范围: 同一商户目录 / 跨商户 / 跨相册"""
+    albums = {key.split('/', 1)[0] for key in keys}
+    merchants = {
+        catalog_index.normalize_name(catalog_index.merchant_directory(key) or '') for key in keys
+    }
+    scope = 'same-merchant' if len(merchants) == 1 else 'cross-merchant'
+    return f"{scope}, {'cross-album' if len(albums) > 1 else 'same-album'}"
+
+
+def main():
+    args = sys.argv[1:]
+    threshold = DEFAULT_THRESHOLD
+    if '--threshold' in args:
+        i = args.index('--threshold')
+        threshold = int(args[i + 1])
+        del args[i:i + 2]
+    albums = [a for a in args if not a.startswith('--')] or s3_client.ALBUMS
+
+    start = time.time()
+    inventory = s3_inventory.load_inventory(albums)
+    objects = image_objects(inventory, albums)
+    cache = load_cache()
+    computed, errors = compute_hashes(objects, cache)
+    save_cache(cache)
+    print(f"图片 {len(objects)} 张, 新计算 {computed} 张, 缓存命中 {len(objects) - computed} 张, "
+          f"{time.time() - start:.2f} 秒")
+    for key, error in errors:
+        print(f"  ❌ {key}: {error}")
+
+    start = time.time()
+    entries = [
+        (key, int(cache[key]['phash'], 16), int(cache[key]['dhash'], 16))
+        for key, _ in objects if key in cache
+    ]
+    groups = find_near_duplicates(entries, threshold)
+    print(f"近似重复 {len(groups)} 组, 涉及 {sum(len(g) for g in groups)} 张 "
+          f"(pHash距离 <= {threshold}, 查询 {time.time() - start:.2f} 秒)")
+    for keys in sorted(groups, key=len, reverse=True):
+        print(f"\n  {len(keys)} 张 ({describe(keys)})")
+        for key in keys:
+            print(f"    {key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+商户照片响应式变体生成器
+为目录中每个 photos[] 条目按宽度档位（默认 320/640/1280）生成WebP变体，可选同时生成AVIF，
+存放在固定的key规则下:
+    <相册>/<商户目录>/variants/<原文件名>-<档位>w.<webp|avif>
+例如 cafe-image-dev/desa-kitsune_ChIJxxx/variants/photo_a-640w.webp。
+原图比档位窄时不放大，该档位按原图宽度编码。
+
+每张源图上一次生成时的ETag记录在 s3://baliciaga-database/data/.variants/manifest.json，
+源图ETag（来自 s3_inventory 快照）没变且所需变体都已生成时跳过。
+目录条目里写入与 photos 一一对应的 photoVariants: [{"webp": {"320w": url, ...}, "avif": {...}}, ...]，
+所有目录文件一次性通过 catalog_commit 提交。
+
+    python3 photo_variants.py cafes-dev.json --avif
+    python3 photo_variants.py --widths 320,640 --dry-run
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import catalog_commit
+import catalog_store
+import image_transcoder
+import s3_client
+import s3_inventory
+
+MANIFEST_PATH = f"s3://{s3_client.BUCKET}/data/.variants/manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_WIDTHS = (320, 640, 1280)
+VARIANT_DIR = 'variants'
+QUALITY = {'WEBP': 80, 'AVIF': 60}
+EXTENSIONS = {'WEBP': 'webp', 'AVIF': 'avif'}
+
+
+def variant_key(source_key, width, format='WEBP'):
+    """源图key -> 变体key"""
+    directory, filename = source_key.rsplit('/', 1)
+    stem = os.path.splitext(filename)[0]
+    return f"{directory}/{VARIANT_DIR}/{stem}-{width}w.{EXTENSIONS[format]}"
+
+
+def variant_url(photo_url, key):
+    """用源图URL的域名拼出变体URL"""
+    parsed = urlparse(photo_url)
+    return f"{parsed.scheme}://{parsed.netloc}/{key}"
+
+
+def is_variant(key):
+    return f'/{VARIANT_DIR}/' in key
+
+
+def load_manifest():
+    try:
+        data = json.loads(s3_client.download_bytes(MANIFEST_PATH))
+    except s3_client.ClientError as e:
+        if s3_client.is_not_found(e):
+            return {}
+        raise
+    return data['sources'] if data.get('version') == MANIFEST_VERSION else {}
+
+
+def save_manifest(sources):
+    body = json.dumps({'version': MANIFEST_VERSION, 'sources': sources}, ensure_ascii=False).encode('utf-8')
+    s3_client.upload_bytes(body, MANIFEST_PATH, 'application/json')
+
+
+def variant_specs(widths, formats):
+    """[(档位, 格式)] 及对应的 transcode 参数"""
+    specs = [(width, fmt) for fmt in formats for width in widths]
+    options = [{'format': fmt, 'quality': QUALITY[fmt], 'max_width': width} for width, fmt in specs]
+    return specs, options
+
+
+def needs_update(entry, etag, specs):
+    """源图ETag变化或缺少所需变体时需要重新生成"""
+    if not entry or entry.get('etag') != etag:
+        return True
+    return any(f"{fmt}:{width}" not in entry['variants'] for width, fmt in specs)
+
+
+def source_etags(keys):
+    """从桶清单快照取源图ETag，快照里没有的逐个HEAD"""
+    albums = sorted({key.split('/', 1)[0] for key in keys} & set(s3_client.ALBUMS))
+    inventory = s3_inventory.load_inventory(albums)
+    etags = {}
+    missing = []
+    for key in keys:
+        entry = inventory.get(key)
+        if entry:
+            etags[key] = entry['etag']
+        else:
+            missing.append(key)
+    for key in missing:
+        head = s3_client.head_object(f"s3://{s3_client.BUCKET}/{key}")
+        etags[key] = head['ETag'].strip('"') if head else None
+    return etags
+
+
+def generate(jobs, specs, options, dry_run=False):
+    """为 [(源key, ETag)] 生成变体，逐个yield (源key, 清单条目或None, 错误或None)"""
+    with image_transcoder.TranscodeEngine() as engine:
+        def run(job):
+            key, etag = job
+            try:
+                data = s3_client.download_bytes(f"s3://{s3_client.BUCKET}/{key}")
+                outputs = engine.submit_variants(data, options).result()
+                entry = {'etag': etag, 'variants': {}}
+                produced = {}
+                for (width, fmt), (encoded, stats) in zip(specs, outputs):
+                    # 原图比多个档位都窄时这些档位结果相同，只上传第一个
+                    if (fmt, stats['width']) in produced:
+                        entry['variants'][f"{fmt}:{width}"] = produced[(fmt, stats['width'])]
+                        continue
+                    destination = variant_key(key, width, fmt)
+                    if not dry_run:
+                        s3_client.upload_bytes(
+                            encoded, f"s3://{s3_client.BUCKET}/{destination}", image_transcoder.CONTENT_TYPES[fmt]
+                        )
+                    entry['variants'][f"{fmt}:{width}"] = produced[(fmt, stats['width'])] = {
+                        'key': destination, 'width': stats['width'], 'bytes': stats['dst_bytes']
+                    }
+                return key, entry, None
+            except Exception as e:
+                return key, None, e
+
+        with ThreadPoolExecutor(max_workers=engine.io_workers) as executor:
+            yield from executor.map(run, jobs)
+
+
+def srcset_for(photo_url, entry, formats):
+    """由清单条目生成单张照片的 {格式: {"<宽>w": url}}"""
+    srcset = {}
+    for fmt in formats:
+        widths = {}
+        for name, variant in sorted(entry['variants'].items(), key=lambda x: x[1]['width']):
+            if name.startswith(f"{fmt}:"):
+                widths[f"{variant['width']}w"] = variant_url(photo_url, variant['key'])
+        if widths:
+            srcset[EXTENSIONS[fmt]] = widths
+    return srcset
+
+
+def update_catalog(data, manifest, formats):
+    """把 photoVariants 写进目录条目，返回更新的商户数"""
+    updated = 0
+    for item in data:
+        photos = item.get('photos') or []
+        variants = []
+        for url in photos:
+            key = s3_client.parse_s3_path(url)[1] if url else None
+            entry = manifest.get(key)
+            variants.append(srcset_for(url, entry, formats) if entry else None)
+        if not any(variants):
+            continue
+        if item.get('photoVariants') != variants:
+            item['photoVariants'] = variants
+            updated += 1
+    return updated
+
+
+def main():
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    formats = ['WEBP', 'AVIF'] if '--avif' in args else ['WEBP']
+    widths = DEFAULT_WIDTHS
+    if '--widths' in args:
+        i = args.index('--widths')
+        widths = tuple(int(w) for w in args[i + 1].split(','))
+        del args[i:i + 2]
+    json_files = [a for a in args if not a.startswith('--')] or catalog_store.CATALOG_FILES
+    specs, options = variant_specs(widths, formats)
+
+    print(f"档位: {', '.join(f'{w}w' for w in widths)}  格式: {', '.join(formats)}")
+    catalogs = {}
+    photo_keys = set()
+    for json_file in json_files:
+        data, etag = catalog_store.load_with_etag(json_file)
+        catalogs[json_file] = (data, etag)
+        for item in data:
+            for url in item.get('photos') or []:
+                if url:
+                    key = s3_client.parse_s3_path(url)[1]
+                    if not is_variant(key):
+                        photo_keys.add(key)
+
+    manifest = load_manifest()
+    etags = source_etags(sorted(photo_keys))
+    jobs = [
+        (key, etag) for key, etag in etags.items()
+        if etag is not None and needs_update(manifest.get(key), etag, specs)
+    ]
+    missing = sum(1 for etag in etags.values() if etag is None)
+    print(f"照片 {len(photo_keys)} 张: 需生成 {len(jobs)}, 未变化跳过 {len(photo_keys) - len(jobs) - missing}, "
+          f"源文件不存在 {missing}")
+
+    start = time.time()
+    generated = 0
+    for key, entry, error in generate(jobs, specs, options, dry_run):
+        if error:
+            print(f"  ❌ {key}: {error}")
+            continue
+        manifest[key] = entry
+        generated += 1
+        if generated % 50 == 0:
+            print(f"  进度: {generated}/{len(jobs)} - {generated / (time.time() - start):.1f} 张/秒")
+    if jobs:
+        print(f"生成完成: {generated}/{len(jobs)} 张, {len(specs) * generated} 个变体, {time.time() - start:.1f} 秒")
+
+    commit = catalog_commit.CatalogCommit('照片响应式变体 photoVariants')
+    for json_file, (data, etag) in catalogs.items():
+        updated = update_catalog(data, manifest, formats)
+        if updated:
+            commit.stage(json_file, data, base_etag=etag)
+            print(f"  {json_file}: 更新 {updated} 个商户的 photoVariants")
+    catalog_commit.print_commit(commit.commit(dry_run))
+
+    if not dry_run:
+        save_manifest(manifest)
+
+
+if __name__ == "__main__":
+    main()
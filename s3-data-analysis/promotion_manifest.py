@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+dev -> prod 增量发布清单
+在 s3://baliciaga-database/data/.promotion/manifest.json 中保存上一次发布时每个分类的状态:
+dev相册里每个对象（相对key -> ETag/大小）和每个目录条目（placeId或名称 -> 内容哈希）。
+下次发布只列举dev相册（可限定到指定商户目录），和清单做差集:
+新增/变化的对象服务端复制到prod相册，已删除的对象批量删除，目录文件只替换变化的条目。
+没有清单时以prod相册和prod目录文件的当前状态为基线。
+
+    python3 promotion_manifest.py                          # 查看各分类相对上次发布的差异
+    python3 promotion_manifest.py cafe --merchant some-cafe_ChIJxxx
+"""
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import catalog_index
+import catalog_store
+import s3_client
+import s3_lister
+
+MANIFEST_PATH = f"s3://{s3_client.BUCKET}/data/.promotion/manifest.json"
+MANIFEST_VERSION = 1
+
+
+def entry_key(item):
+    """目录条目的稳定标识"""
+    return item.get('placeId') or item.get('name') or json.dumps(item, sort_keys=True)
+
+
+def entry_hash(item):
+    return hashlib.sha256(json.dumps(item, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def rewrite_entry(item, dev_album, prod_album):
+    """把条目中的dev相册URL替换为prod相册，返回 (新条目, 替换数)"""
+    item = json.loads(json.dumps(item))
+    count = 0
+    if isinstance(item.get('photos'), list):
+        for i, photo_url in enumerate(item['photos']):
+            if isinstance(photo_url, str) and f'/{dev_album}/' in photo_url:
+                item['photos'][i] = photo_url.replace(f'/{dev_album}/', f'/{prod_album}/')
+                count += 1
+    if item.get('staticMapS3Url') and f'/{dev_album}/' in item['staticMapS3Url']:
+        item['staticMapS3Url'] = item['staticMapS3Url'].replace(f'/{dev_album}/', f'/{prod_album}/')
+        count += 1
+    # photo_variants 生成的 [{格式: {"<宽>w": url}}]
+    for srcset in item.get('photoVariants') or []:
+        for widths in (srcset or {}).values():
+            for width, url in widths.items():
+                if f'/{dev_album}/' in url:
+                    widths[width] = url.replace(f'/{dev_album}/', f'/{prod_album}/')
+                    count += 1
+    return item, count
+
+
+def list_album(album, merchants=None):
+    """列举相册（或其中几个商户目录），返回 {相对key: {etag, size}}"""
+    prefix = f"{album}/"
+    prefixes = [f"{prefix}{m.strip('/')}/" for m in merchants] if merchants else [prefix]
+    return {
+        obj['Key'][len(prefix):]: {'etag': obj['ETag'].strip('"'), 'size': obj['Size']}
+        for obj in s3_lister.iter_objects(prefixes)
+    }
+
+
+def in_scope(relative_key, merchants):
+    return not merchants or relative_key.split('/', 1)[0] in {m.strip('/') for m in merchants}
+
+
+def diff_objects(previous, current, merchants=None):
+    """对比上次发布的对象清单与当前dev清单，返回 {added, changed, removed}"""
+    changes = {'added': [], 'changed': [], 'removed': []}
+    for key, entry in current.items():
+        old = previous.get(key)
+        if old is None:
+            changes['added'].append(key)
+        elif old['etag'] != entry['etag'] or old['size'] != entry['size']:
+            changes['changed'].append(key)
+    for key in previous:
+        if key not in current and in_scope(key, merchants):
+            changes['removed'].append(key)
+    return changes
+
+
+class PromotionManifest:
+    """上一次发布状态的清单，按分类保存"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.categories = {}
+        self.exists = False
+
+    def load(self):
+        try:
+            data = json.loads(s3_client.download_bytes(self.path))
+        except s3_client.ClientError as e:
+            if s3_client.is_not_found(e):
+                return self
+            raise
+        if data.get('version') == MANIFEST_VERSION:
+            self.categories = data['categories']
+            self.exists = True
+        return self
+
+    def save(self):
+        body = json.dumps(
+            {'version': MANIFEST_VERSION, 'categories': self.categories}, ensure_ascii=False
+        ).encode('utf-8')
+        s3_client.upload_bytes(body, self.path, 'application/json')
+        self.exists = True
+
+    def category_state(self, category):
+        """返回分类的基线状态；清单里没有时以prod当前状态为基线"""
+        state = self.categories.get(category['name'])
+        if state is None:
+            prod_items = catalog_store.load(category['prod_json'])
+            state = {
+                'objects': list_album(category['prod_album']),
+                'entries': {entry_key(item): entry_hash(item) for item in prod_items},
+                'promoted_at': None
+            }
+            self.categories[category['name']] = state
+        return state
+
+
+def promote_objects(category, state, merchants=None, dry_run=False, max_workers=16):
+    """把dev相册相对清单的变化同步到prod相册，返回变更集和失败列表"""
+    dev_album, prod_album = category['dev_album'], category['prod_album']
+    current = list_album(dev_album, merchants)
+    changes = diff_objects(state['objects'], current, merchants)
+    failed = []
+    if dry_run:
+        return changes, failed
+
+    def copy(key):
+        try:
+            s3_client.copy_object(
+                f"s3://{s3_client.BUCKET}/{dev_album}/{key}",
+                f"s3://{s3_client.BUCKET}/{prod_album}/{key}"
+            )
+            return key, None
+        except Exception as e:
+            return key, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, error in executor.map(copy, changes['added'] + changes['changed']):
+            if error is None:
+                state['objects'][key] = current[key]
+            else:
+                failed.append((key, error))
+
+    removed = [f"s3://{s3_client.BUCKET}/{prod_album}/{key}" for key in changes['removed']]
+    delete_errors = dict(s3_client.delete_keys(removed))
+    for key, path in zip(changes['removed'], removed):
+        if path in delete_errors:
+            failed.append((key, delete_errors[path]))
+        else:
+            state['objects'].pop(key, None)
+    return changes, failed
+
+
+def entry_in_scope(item, merchants):
+    """条目是否属于限定的商户目录（未限定时总是属于）"""
+    if not merchants:
+        return True
+    urls = (item.get('photos') or [])[:1] + [item.get('staticMapS3Url')]
+    directories = {catalog_index.merchant_directory(url) for url in urls if isinstance(url, str)}
+    return bool(directories & {m.strip('/') for m in merchants})
+
+
+def promote_catalog(commit, category, state, merchants=None, dry_run=False):
+    """只替换变化的目录条目并暂存prod目录文件
+    返回 (统计 {added, changed, removed, urls}, 发布后的条目哈希)，条目哈希应在提交成功后写回清单"""
+    dev_album, prod_album = category['dev_album'], category['prod_album']
+    dev_items = catalog_store.load(category['dev_json'])
+    prod_items, prod_etag = catalog_store.load_with_etag(category['prod_json'])
+    prod_by_key = {entry_key(item): item for item in prod_items}
+
+    stats = {'added': 0, 'changed': 0, 'removed': 0, 'urls': 0}
+    entries = {}
+    promoted = []
+    for dev_item in dev_items:
+        item, urls = rewrite_entry(dev_item, dev_album, prod_album)
+        key = entry_key(item)
+        digest = entry_hash(item)
+        previous = state['entries'].get(key)
+        if previous == digest and key in prod_by_key:
+            entries[key] = digest
+            promoted.append(prod_by_key[key])
+            continue
+        if not entry_in_scope(item, merchants):
+            # 范围外的变化留到下次发布
+            if key in prod_by_key:
+                entries[key] = previous
+                promoted.append(prod_by_key[key])
+            continue
+        stats['added' if previous is None else 'changed'] += 1
+        stats['urls'] += urls
+        entries[key] = digest
+        promoted.append(item)
+
+    for key, previous in state['entries'].items():
+        if key in entries:
+            continue
+        if key in prod_by_key and not entry_in_scope(prod_by_key[key], merchants):
+            entries[key] = previous
+            promoted.append(prod_by_key[key])
+        else:
+            stats['removed'] += 1
+
+    if not dry_run:
+        commit.stage(category['prod_json'], promoted, base_etag=prod_etag)
+    return stats, entries
+
+
+def print_changes(name, changes, failed=None):
+    print(f"  {name}: +{len(changes['added'])} ~{len(changes['changed'])} -{len(changes['removed'])}")
+    for key, error in failed or []:
+        print(f"    ❌ {key}: {error}")
+
+
+def main():
+    args = sys.argv[1:]
+    merchants = []
+    while '--merchant' in args:
+        i = args.index('--merchant')
+        merchants.append(args[i + 1])
+        del args[i:i + 2]
+    names = set(args)
+
+    manifest = PromotionManifest().load()
+    print(f"发布清单: {manifest.path} ({'已存在' if manifest.exists else '不存在，以prod当前状态为基线'})")
+    for category in catalog_store.CATEGORIES:
+        if names and category['name'] not in names:
+            continue
+        start = time.time()
+        state = manifest.category_state(category)
+        changes, _ = promote_objects(category, state, merchants or None, dry_run=True)
+        print_changes(f"{category['dev_album']} -> {category['prod_album']}", changes)
+        stats, _ = promote_catalog(None, category, state, merchants or None, dry_run=True)
+        print(f"  {category['prod_json']}: +{stats['added']} ~{stats['changed']} -{stats['removed']} 个条目"
+              f" ({time.time() - start:.2f} 秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+共享S3访问模块
+进程内复用同一个线程安全的boto3客户端及其连接池，替代逐对象 fork `aws s3` 子进程。
+所有路径参数既接受 s3://bucket/key，也接受 CloudFront URL（映射到 baliciaga-database）。
+
+设置 S3_ENDPOINT_URL 即可指向本地S3替身（MinIO / moto_server）做离线吞吐压测:
+    S3_ENDPOINT_URL=http://127.0.0.1:5000 python3 s3_client.py --bench 462
+"""
+import mimetypes
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+BUCKET = 'baliciaga-database'
+REGION = os.environ.get('AWS_REGION', 'ap-southeast-1')
+ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', '50'))
+# DeleteObjects 单次请求最多1000个key
+DELETE_BATCH_SIZE = 1000
+
+# 8个标准相册
+ALBUMS = [
+    'cafe-image-dev', 'cafe-image-prod',
+    'dining-image-dev', 'dining-image-prod',
+    'bar-image-dev', 'bar-image-prod',
+    'cowork-image-dev', 'cowork-image-prod'
+]
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """返回进程内共享的S3客户端（首次调用时创建）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                config = Config(
+                    region_name=REGION,
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                    retries={'max_attempts': 5, 'mode': 'adaptive'},
+                    tcp_keepalive=True
+                )
+                _client = boto3.session.Session().client(
+                    's3', endpoint_url=ENDPOINT_URL, config=config
+                )
+    return _client
+
+
+def parse_s3_path(path):
+    """把 s3://bucket/key 或 CloudFront URL 解析为 (bucket, key)"""
+    parsed = urlparse(path)
+    if parsed.scheme == 's3':
+        return parsed.netloc, parsed.path.lstrip('/')
+    if parsed.scheme in ('http', 'https'):
+        return BUCKET, parsed.path.lstrip('/')
+    return BUCKET, path.lstrip('/')
+
+
+def is_not_found(error):
+    """判断ClientError是否表示对象不存在"""
+    code = error.response.get('Error', {}).get('Code', '')
+    return code in ('404', 'NoSuchKey', 'NotFound')
+
+
+def head_object(s3_path):
+    """返回对象的元数据，不存在时返回None"""
+    bucket, key = parse_s3_path(s3_path)
+    try:
+        return get_client().head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if is_not_found(e):
+            return None
+        raise
+
+
+def object_exists(s3_path):
+    """检查S3对象是否存在"""
+    return head_object(s3_path) is not None
+
+
+def copy_object(source, destination):
+    """服务端复制单个对象，返回目标ETag"""
+    src_bucket, src_key = parse_s3_path(source)
+    dst_bucket, dst_key = parse_s3_path(destination)
+    result = get_client().copy_object(
+        Bucket=dst_bucket, Key=dst_key,
+        CopySource={'Bucket': src_bucket, 'Key': src_key}
+    )
+    return result['CopyObjectResult']['ETag']
+
+
+def verified_copy(source, destination):
+    """服务端复制后核对目标的大小和ETag与源一致，返回目标ETag；不一致时抛出异常"""
+    src = head_object(source)
+    if src is None:
+        raise Exception(f"源文件不存在: {source}")
+    copy_object(source, destination)
+    dst = head_object(destination)
+    if dst is None or dst['ContentLength'] != src['ContentLength']:
+        raise Exception(f"复制校验失败（大小不一致）: {source} -> {destination}")
+    # 分段上传的对象复制后ETag会变，只能比较大小
+    if '-' not in src['ETag'] and dst['ETag'] != src['ETag']:
+        raise Exception(f"复制校验失败（ETag不一致）: {source} -> {destination}")
+    return dst['ETag']
+
+
+def download_bytes(s3_path):
+    """把对象读入内存"""
+    bucket, key = parse_s3_path(s3_path)
+    return get_client().get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+def download_range(s3_path, start, length):
+    """读取对象 [start, start+length) 的字节（Range GET），超出对象末尾时返回较短的数据"""
+    bucket, key = parse_s3_path(s3_path)
+    return get_client().get_object(
+        Bucket=bucket, Key=key, Range=f"bytes={start}-{start + length - 1}"
+    )['Body'].read()
+
+
+def download_file(s3_path, local_path):
+    """下载对象到本地文件"""
+    bucket, key = parse_s3_path(s3_path)
+    get_client().download_file(bucket, key, local_path)
+    return local_path
+
+
+def guess_content_type(key):
+    """根据扩展名推断Content-Type"""
+    if key.endswith('.webp'):
+        return 'image/webp'
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+def upload_bytes(data, s3_path, content_type=None):
+    """上传内存中的数据，返回ETag"""
+    bucket, key = parse_s3_path(s3_path)
+    result = get_client().put_object(
+        Bucket=bucket, Key=key, Body=data,
+        ContentType=content_type or guess_content_type(key)
+    )
+    return result['ETag']
+
+
+def upload_file(local_path, s3_path, content_type=None):
+    """上传本地文件"""
+    bucket, key = parse_s3_path(s3_path)
+    get_client().upload_file(
+        local_path, bucket, key,
+        ExtraArgs={'ContentType': content_type or guess_content_type(key)}
+    )
+    return True
+
+
+def list_objects(s3_prefix):
+    """分页列出前缀下的所有对象（相当于 aws s3 ls --recursive）"""
+    bucket, prefix = parse_s3_path(s3_prefix)
+    paginator = get_client().get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj
+
+
+def list_directories(s3_prefix):
+    """列出前缀下一级子目录名（相当于 aws s3 ls 中的 PRE 行）"""
+    bucket, prefix = parse_s3_path(s3_prefix)
+    if prefix and not prefix.endswith('/'):
+        prefix += '/'
+    paginator = get_client().get_paginator('list_objects_v2')
+    directories = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        for common in page.get('CommonPrefixes', []):
+            directories.append(common['Prefix'][len(prefix):])
+    return directories
+
+
+def delete_object(s3_path):
+    """删除单个对象"""
+    bucket, key = parse_s3_path(s3_path)
+    get_client().delete_object(Bucket=bucket, Key=key)
+    return True
+
+
+def _delete_batch(bucket, keys):
+    """一次DeleteObjects请求删除最多1000个key，返回 [(key, 错误信息)]"""
+    result = get_client().delete_objects(
+        Bucket=bucket, Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+    )
+    return [(e.get('Key'), e.get('Message')) for e in result.get('Errors', [])]
+
+
+def delete_keys(s3_paths):
+    """按桶分组、每1000个key一个请求批量删除，返回删除失败的 [(s3路径, 错误信息)]"""
+    by_bucket = {}
+    for path in s3_paths:
+        bucket, key = parse_s3_path(path)
+        by_bucket.setdefault(bucket, []).append(key)
+    errors = []
+    for bucket, keys in by_bucket.items():
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            errors.extend(
+                (f"s3://{bucket}/{key}", message)
+                for key, message in _delete_batch(bucket, keys[i:i + DELETE_BATCH_SIZE])
+            )
+    return errors
+
+
+def move_objects(pairs, max_workers=16):
+    """批量移动: 并发服务端复制并校验，再把校验通过的源文件批量删除
+    返回 {'moved': [(源, 目标)], 'failed': [(源, 目标, 错误)]}"""
+    pairs = list(pairs)
+    verified = []
+    failed = []
+
+    def copy(pair):
+        try:
+            verified_copy(*pair)
+            return pair, None
+        except Exception as e:
+            return pair, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for pair, error in executor.map(copy, pairs):
+            if error is None:
+                verified.append(pair)
+            else:
+                failed.append((pair[0], pair[1], error))
+
+    # 源与目标相同的"移动"不能删除源
+    sources = [src for src, dst in verified if parse_s3_path(src) != parse_s3_path(dst)]
+    delete_errors = dict(delete_keys(sources))
+    moved = []
+    for src, dst in verified:
+        bucket, key = parse_s3_path(src)
+        error = delete_errors.get(f"s3://{bucket}/{key}")
+        if error:
+            failed.append((src, dst, Exception(f"已复制但删除源文件失败: {error}")))
+        else:
+            moved.append((src, dst))
+    return {'moved': moved, 'failed': failed}
+
+
+def move_object(source, destination):
+    """移动单个对象（复制+校验+删除）"""
+    result = move_objects([(source, destination)], max_workers=1)
+    if result['failed']:
+        raise result['failed'][0][2]
+    return True
+
+
+def delete_prefix(s3_prefix):
+    """删除前缀下的所有对象（相当于 aws s3 rm --recursive），返回删除数量"""
+    bucket, prefix = parse_s3_path(s3_prefix)
+    paginator = get_client().get_paginator('list_objects_v2')
+    deleted = 0
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys = [obj['Key'] for obj in page.get('Contents', [])]
+        if not keys:
+            continue
+        errors = _delete_batch(bucket, keys)
+        if errors:
+            raise Exception(f"删除失败: {errors[0][0]}: {errors[0][1]}")
+        deleted += len(keys)
+    return deleted
+
+
+def run_benchmark(count, workers=10):
+    """在本地S3替身上压测上传/复制/删除吞吐"""
+    if not ENDPOINT_URL:
+        print("❌ 压测只允许在本地S3替身上运行，请设置 S3_ENDPOINT_URL")
+        sys.exit(1)
+
+    client = get_client()
+    try:
+        client.head_bucket(Bucket=BUCKET)
+    except ClientError:
+        client.create_bucket(
+            Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': REGION}
+        )
+
+    payload = os.urandom(32 * 1024)
+    sources = [f"s3://{BUCKET}/bench/src/{i:05d}.webp" for i in range(count)]
+    pairs = [(src, src.replace('/bench/src/', '/bench/dst/')) for src in sources]
+
+    def timed(label, fn, items):
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(fn, *item) for item in items]
+            for future in as_completed(futures):
+                future.result()
+        elapsed = time.time() - start
+        print(f"{label}: {len(items)} 个对象, {elapsed:.2f} 秒, {len(items) / elapsed:.1f} objects/sec")
+
+    print(f"端点: {ENDPOINT_URL}  并发: {workers}")
+    timed("上传", upload_bytes, [(payload, src) for src in sources])
+    timed("复制", copy_object, pairs)
+    start = time.time()
+    result = move_objects(
+        [(dst, dst.replace('/bench/dst/', '/bench/moved/')) for _, dst in pairs], max_workers=workers
+    )
+    print(f"移动: {len(result['moved'])} 个对象（{len(result['failed'])} 个失败）, {time.time() - start:.2f} 秒, "
+          f"删除请求 {-(-len(result['moved']) // DELETE_BATCH_SIZE)} 个")
+    start = time.time()
+    deleted = delete_prefix(f"s3://{BUCKET}/bench/")
+    print(f"删除: {deleted} 个对象, {time.time() - start:.2f} 秒")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == '--bench':
+        run_benchmark(int(sys.argv[2]))
+    else:
+        print("用法: S3_ENDPOINT_URL=http://127.0.0.1:5000 python3 s3_client.py --bench <对象数>")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+S3桶清单缓存
+把8个相册的对象清单（key、大小、ETag、修改时间）保存为本地快照，并建立按路径分段的前缀树索引。
+审计脚本直接在内存里查询，只有超过 max_age 的相册才会重新列举，并把差异增量合并进快照。
+
+    python3 s3_inventory.py              # 刷新过期相册并打印统计
+    python3 s3_inventory.py --force      # 强制重新列举全部相册
+"""
+import json
+import os
+import sys
+import time
+
+import s3_client
+import s3_lister
+
+INVENTORY_PATH = os.environ.get(
+    'S3_INVENTORY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.s3_inventory.json')
+)
+DEFAULT_MAX_AGE = 15 * 60  # 秒
+SNAPSHOT_VERSION = 1
+
+
+class _Node:
+    """前缀树节点：children按路径分段索引，entry为叶子对象的元数据"""
+    __slots__ = ('children', 'entry')
+
+    def __init__(self):
+        self.children = {}
+        self.entry = None
+
+
+class PrefixIndex:
+    """以 '/' 分段的前缀树，支持按任意前缀枚举对象和子目录"""
+
+    def __init__(self):
+        self.root = _Node()
+        self.count = 0
+
+    def add(self, key, entry):
+        node = self.root
+        for segment in key.split('/'):
+            node = node.children.setdefault(segment, _Node())
+        if node.entry is None:
+            self.count += 1
+        node.entry = entry
+
+    def remove(self, key):
+        path = [self.root]
+        for segment in key.split('/'):
+            node = path[-1].children.get(segment)
+            if node is None:
+                return
+            path.append(node)
+        if path[-1].entry is None:
+            return
+        path[-1].entry = None
+        self.count -= 1
+        # 回收空节点
+        segments = key.split('/')
+        for depth in range(len(segments), 0, -1):
+            node = path[depth]
+            if node.children or node.entry is not None:
+                break
+            del path[depth - 1].children[segments[depth - 1]]
+
+    def get(self, key):
+        node = self.root
+        for segment in key.split('/'):
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node.entry
+
+    def _start_nodes(self, prefix):
+        """定位前缀对应的起始节点，返回 [(节点, 已走过的key前缀)]"""
+        segments = prefix.split('/')
+        complete, partial = segments[:-1], segments[-1]
+        node = self.root
+        walked = ''
+        for segment in complete:
+            node = node.children.get(segment)
+            if node is None:
+                return []
+            walked += segment + '/'
+        return [
+            (child, walked + name)
+            for name, child in node.children.items()
+            if name.startswith(partial)
+        ]
+
+    def items(self, prefix=''):
+        """枚举前缀下所有 (key, entry)，按key排序"""
+        stack = sorted(self._start_nodes(prefix), key=lambda x: x[1], reverse=True)
+        while stack:
+            node, key = stack.pop()
+            if node.entry is not None:
+                yield key, node.entry
+            stack.extend(
+                (child, f"{key}/{name}")
+                for name, child in sorted(node.children.items(), reverse=True)
+            )
+
+    def directories(self, prefix):
+        """列出目录前缀下一级子目录名（带尾部斜杠）"""
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        node = self.root
+        for segment in prefix.split('/')[:-1]:
+            node = node.children.get(segment)
+            if node is None:
+                return []
+        return sorted(name + '/' for name, child in node.children.items() if child.children)
+
+
+class Inventory:
+    """本地桶清单快照 + 前缀树索引"""
+
+    def __init__(self, path=INVENTORY_PATH):
+        self.path = path
+        self.albums = {}
+        self.index = PrefixIndex()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') == SNAPSHOT_VERSION:
+                self.albums = snapshot['albums']
+        for album in self.albums.values():
+            for key, entry in album['objects'].items():
+                self.index.add(key, entry)
+
+    def save(self):
+        """原子写回快照文件"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'albums': self.albums}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_stale(self, album, max_age=DEFAULT_MAX_AGE):
+        """相册是否需要重新列举"""
+        state = self.albums.get(album)
+        return state is None or time.time() - state['refreshed_at'] > max_age
+
+    def invalidate(self, album):
+        """标记相册过期（脚本修改过相册后调用），下次refresh时重新列举"""
+        if album in self.albums:
+            self.albums[album]['refreshed_at'] = 0
+
+    def refresh_album(self, album, metrics=None):
+        """重新列举一个相册，把差异合并进快照，返回变更集"""
+        return self.refresh([album], force=True, metrics=metrics)[album]
+
+    def _apply(self, album, old_objects, new_objects):
+        """对比新旧清单并更新索引"""
+        changes = {'added': [], 'changed': [], 'removed': []}
+        for key, entry in new_objects.items():
+            old = old_objects.get(key)
+            if old is None:
+                changes['added'].append(key)
+            elif old['etag'] != entry['etag'] or old['size'] != entry['size']:
+                changes['changed'].append(key)
+            self.index.add(key, entry)
+        for key in old_objects:
+            if key not in new_objects:
+                changes['removed'].append(key)
+                self.index.remove(key)
+        self.albums[album] = {'refreshed_at': time.time(), 'objects': new_objects}
+        return changes
+
+    def refresh(self, albums=None, max_age=DEFAULT_MAX_AGE, force=False, metrics=None):
+        """只重新列举过期的相册（并发列举），返回 {相册: 变更集}"""
+        stale = [
+            album for album in albums or s3_client.ALBUMS
+            if force or self.is_stale(album, max_age)
+        ]
+        if not stale:
+            return {}
+
+        listings = {album: {} for album in stale}
+        for obj in s3_lister.iter_objects([f"{album}/" for album in stale], metrics=metrics):
+            album = obj['Key'].split('/', 1)[0]
+            listings[album][obj['Key']] = {
+                'size': obj['Size'],
+                'etag': obj['ETag'].strip('"'),
+                'mtime': obj['LastModified'].isoformat()
+            }
+
+        all_changes = {}
+        for album, new_objects in listings.items():
+            old_objects = self.albums.get(album, {}).get('objects', {})
+            all_changes[album] = self._apply(album, old_objects, new_objects)
+        self.save()
+        return all_changes
+
+    def get(self, key):
+        """按key查询对象元数据"""
+        return self.index.get(key)
+
+    def objects(self, prefix=''):
+        """枚举前缀下的 (key, entry)"""
+        return self.index.items(prefix)
+
+    def keys(self, prefix=''):
+        """枚举前缀下的key"""
+        return [key for key, _ in self.index.items(prefix)]
+
+    def directories(self, prefix):
+        """列出前缀下一级子目录名（等同于 aws s3 ls 的 PRE 行）"""
+        return self.index.directories(prefix)
+
+
+def load_inventory(albums=None, max_age=DEFAULT_MAX_AGE, force=False):
+    """加载快照并刷新过期相册"""
+    inventory = Inventory()
+    inventory.refresh(albums, max_age=max_age, force=force)
+    return inventory
+
+
+def main():
+    force = '--force' in sys.argv
+    inventory = Inventory()
+    metrics = s3_lister.ListingMetrics()
+    changes = inventory.refresh(force=force, metrics=metrics)
+    if changes:
+        print(f"列举: {metrics.summary()}")
+
+    for album in s3_client.ALBUMS:
+        album_changes = changes.get(album)
+        count = len(inventory.albums.get(album, {}).get('objects', {}))
+        if album_changes is None:
+            print(f"  {album}: {count} 个对象 (使用缓存)")
+        else:
+            print(f"  {album}: {count} 个对象 "
+                  f"(+{len(album_changes['added'])} ~{len(album_changes['changed'])} "
+                  f"-{len(album_changes['removed'])})")
+    print(f"快照: {inventory.path}")
+
+
+if __name__ == "__main__":
+    main()
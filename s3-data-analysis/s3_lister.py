@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+并行分页桶列举器
+把 s3://baliciaga-database/ 拆成相册前缀，再拆成商户目录前缀，用有界线程池并发分页列举，
+结果以生成器形式流式返回：第一批key可以在整个列举完成之前就开始处理。
+列举吞吐（keys/sec）记录在 ListingMetrics 中。
+
+    python3 s3_lister.py                             # 列举8个标准相册
+    python3 s3_lister.py bar-image-dev --workers 32  # 只列举指定相册
+"""
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import s3_client
+
+DEFAULT_WORKERS = 16
+
+_DONE = object()
+
+
+class ListingMetrics:
+    """列举过程的计数器"""
+
+    def __init__(self):
+        self.keys = 0
+        self.pages = 0
+        self.prefixes = 0
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add_page(self):
+        with self._lock:
+            self.pages += 1
+
+    def add_prefix(self):
+        with self._lock:
+            self.prefixes += 1
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def keys_per_second(self):
+        return self.keys / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.keys} 个key, {self.pages} 页, {self.prefixes} 个前缀, "
+                f"{self.elapsed:.2f} 秒, {self.keys_per_second:.1f} keys/sec")
+
+
+def iter_objects(prefixes=None, max_workers=DEFAULT_WORKERS, metrics=None):
+    """并发列举前缀（默认8个标准相册），逐个yield ListObjectsV2的对象字典"""
+    if prefixes is None:
+        prefixes = [f"{album}/" for album in s3_client.ALBUMS]
+    if metrics is None:
+        metrics = ListingMetrics()
+
+    client = s3_client.get_client()
+    paginator = client.get_paginator('list_objects_v2')
+    results = queue.Queue(maxsize=max_workers * 4)
+    stop = threading.Event()
+    # 初始计数1代表提交阶段本身，避免首个相册提前列完就误判结束
+    pending = [1]
+    pending_lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def put(item):
+        # 队列满时阻塞，形成背压；消费者提前退出时放弃
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def submit(walk, prefix):
+        with pending_lock:
+            pending[0] += 1
+        metrics.add_prefix()
+        executor.submit(run, walk, prefix)
+
+    def release():
+        with pending_lock:
+            pending[0] -= 1
+            done = pending[0] == 0
+        if done:
+            put(_DONE)
+
+    def run(walk, prefix):
+        try:
+            walk(prefix)
+        except Exception as e:
+            put(e)
+        finally:
+            release()
+
+    def walk_album(prefix):
+        # 相册一级：文件直接返回，商户目录拆成独立任务
+        for page in paginator.paginate(Bucket=s3_client.BUCKET, Prefix=prefix, Delimiter='/'):
+            if stop.is_set():
+                return
+            metrics.add_page()
+            if page.get('Contents'):
+                put(page['Contents'])
+            for common in page.get('CommonPrefixes', []):
+                submit(walk_merchant, common['Prefix'])
+
+    def walk_merchant(prefix):
+        for page in paginator.paginate(Bucket=s3_client.BUCKET, Prefix=prefix):
+            if stop.is_set():
+                return
+            metrics.add_page()
+            if page.get('Contents'):
+                put(page['Contents'])
+
+    try:
+        for prefix in prefixes:
+            submit(walk_album, prefix)
+        release()
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            for obj in item:
+                metrics.keys += 1
+                yield obj
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        metrics.finished = time.time()
+
+
+def main():
+    args = sys.argv[1:]
+    max_workers = DEFAULT_WORKERS
+    if '--workers' in args:
+        i = args.index('--workers')
+        max_workers = int(args[i + 1])
+        del args[i:i + 2]
+    prefixes = [a.rstrip('/') + '/' for a in args] or None
+
+    metrics = ListingMetrics()
+    first_key_at = None
+    for _ in iter_objects(prefixes, max_workers=max_workers, metrics=metrics):
+        if first_key_at is None:
+            first_key_at = metrics.elapsed
+    print(f"并发: {max_workers}")
+    if first_key_at is not None:
+        print(f"首个key耗时: {first_key_at:.3f} 秒")
+    print(f"列举完成: {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
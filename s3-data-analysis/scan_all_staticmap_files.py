@@ -1,22 +1,16 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 from collections import defaultdict
 
+import s3_client
+import s3_inventory
+
 def scan_staticmap_files():
     """扫描所有相册中的静态地图文件"""
     
-    # 定义所有8个标准相册
-    albums = [
-        'cafe-image-dev',
-        'cafe-image-prod',
-        'dining-image-dev',
-        'dining-image-prod',
-        'bar-image-dev',
-        'bar-image-prod',
-        'cowork-image-dev',
-        'cowork-image-prod'
-    ]
+    # 所有8个标准相册
+    albums = s3_client.ALBUMS
+    inventory = s3_inventory.load_inventory(albums)
     
     all_staticmap_files = []
     pattern_stats = defaultdict(int)
@@ -24,66 +18,48 @@ def scan_staticmap_files():
     for album in albums:
         print(f"\n扫描 {album}/ ...")
         
-        # 使用AWS CLI递归列出所有文件
-        cmd = [
-            'aws', 's3', 'ls', 
-            f's3://baliciaga-database/{album}/',
-            '--recursive'
-        ]
+        # 从清单缓存中枚举相册下的所有文件
+        album_files = []
+        for file_path in inventory.keys(f'{album}/'):
+            # 查找包含static的文件
+            if 'static' in file_path.lower():
+                full_path = f"s3://baliciaga-database/{file_path}"
+                file_info = {
+                    'album': album,
+                    'path': full_path,
+                    'key': file_path,
+                    'filename': file_path.split('/')[-1]
+                }
+                
+                # 分析文件命名模式
+                if '_static.webp' in file_path:
+                    pattern_stats['{merchant}_{placeId}/{merchant}_static.webp'] += 1
+                    file_info['pattern'] = 'merchant_placeId'
+                elif '_static.png' in file_path:
+                    pattern_stats['{merchant}_{placeId}/{merchant}_static.png'] += 1
+                    file_info['pattern'] = 'merchant_placeId_png'
+                elif '/staticmap.webp' in file_path:
+                    pattern_stats['{merchant}/staticmap.webp'] += 1
+                    file_info['pattern'] = 'simple_webp'
+                elif '/staticmap.png' in file_path:
+                    pattern_stats['{merchant}/staticmap.png'] += 1
+                    file_info['pattern'] = 'simple_png'
+                else:
+                    pattern_stats['other'] += 1
+                    file_info['pattern'] = 'other'
+                
+                all_staticmap_files.append(file_info)
+                album_files.append(file_info)
+        
+        print(f"  找到 {len(album_files)} 个静态地图文件")
         
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            # 解析输出并查找静态地图文件
-            album_files = []
-            for line in result.stdout.splitlines():
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        file_path = parts[3]
-                        
-                        # 查找包含static的文件
-                        if 'static' in file_path.lower():
-                            full_path = f"s3://baliciaga-database/{file_path}"
-                            file_info = {
-                                'album': album,
-                                'path': full_path,
-                                'key': file_path,
-                                'filename': file_path.split('/')[-1]
-                            }
-                            
-                            # 分析文件命名模式
-                            if '_static.webp' in file_path:
-                                pattern_stats['{merchant}_{placeId}/{merchant}_static.webp'] += 1
-                                file_info['pattern'] = 'merchant_placeId'
-                            elif '_static.png' in file_path:
-                                pattern_stats['{merchant}_{placeId}/{merchant}_static.png'] += 1
-                                file_info['pattern'] = 'merchant_placeId_png'
-                            elif '/staticmap.webp' in file_path:
-                                pattern_stats['{merchant}/staticmap.webp'] += 1
-                                file_info['pattern'] = 'simple_webp'
-                            elif '/staticmap.png' in file_path:
-                                pattern_stats['{merchant}/staticmap.png'] += 1
-                                file_info['pattern'] = 'simple_png'
-                            else:
-                                pattern_stats['other'] += 1
-                                file_info['pattern'] = 'other'
-                            
-                            all_staticmap_files.append(file_info)
-                            album_files.append(file_info)
-            
-            print(f"  找到 {len(album_files)} 个静态地图文件")
-            
-            # 显示前几个示例
-            if album_files:
-                print("  示例:")
-                for i, file_info in enumerate(album_files[:3]):
-                    print(f"    {file_info['key']}")
-                if len(album_files) > 3:
-                    print(f"    ... 还有 {len(album_files) - 3} 个文件")
-            
-        except subprocess.CalledProcessError as e:
-            print(f"  错误: 无法访问 {album}: {e}")
+        # 显示前几个示例
+        if album_files:
+            print("  示例:")
+            for i, file_info in enumerate(album_files[:3]):
+                print(f"    {file_info['key']}")
+            if len(album_files) > 3:
+                print(f"    ... 还有 {len(album_files) - 3} 个文件")
     
     # 保存结果
     with open('all_staticmap_files.json', 'w', encoding='utf-8') as f:
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+静态地图记忆化索引
+以 (纬度, 经度, zoom, 尺寸, 样式) 为键（经纬度按可配置的小数位数取整，默认5位约1米）记录已生成地图所在的对象key和ETag，
+保存在 s3://baliciaga-database/data/.staticmaps/index.json。
+商户坐标没变且地图对象还在时直接跳过；同一坐标的地图已存在于别的key（例如dev/prod两个相册）时服务端复制；
+只有坐标真正变化或从未生成过的商户才需要重新渲染。
+
+    python3 static_map_memo.py            # 查看索引统计
+"""
+import json
+import os
+import sys
+
+import s3_client
+
+INDEX_PATH = f"s3://{s3_client.BUCKET}/data/.staticmaps/index.json"
+INDEX_VERSION = 1
+DEFAULT_PRECISION = int(os.environ.get('STATIC_MAP_PRECISION', '5'))
+
+
+def memo_key(latitude, longitude, zoom, size, style, precision=DEFAULT_PRECISION):
+    """取整后的坐标和渲染参数组成的键，例如 "-8.65458,115.12968|z16|600x350|roadmap" """
+    return f"{latitude:.{precision}f},{longitude:.{precision}f}|z{zoom}|{size[0]}x{size[1]}|{style}"
+
+
+class StaticMapMemo:
+    """{记忆键: {对象key: ETag}}，并维护 对象key -> 记忆键 的反向索引"""
+
+    def __init__(self, precision=DEFAULT_PRECISION, path=INDEX_PATH):
+        self.precision = precision
+        self.path = path
+        self.maps = {}
+        self.by_object = {}
+
+    def load(self):
+        try:
+            data = json.loads(s3_client.download_bytes(self.path))
+        except s3_client.ClientError as e:
+            if s3_client.is_not_found(e):
+                return self
+            raise
+        # 取整精度变了键就不再可比，整个索引作废
+        if data.get('version') == INDEX_VERSION and data.get('precision') == self.precision:
+            self.maps = data['maps']
+            self.by_object = {key: mk for mk, objects in self.maps.items() for key in objects}
+        return self
+
+    def save(self):
+        body = json.dumps(
+            {'version': INDEX_VERSION, 'precision': self.precision, 'maps': self.maps}, ensure_ascii=False
+        ).encode('utf-8')
+        s3_client.upload_bytes(body, self.path, 'application/json')
+
+    def key(self, latitude, longitude, zoom, size, style):
+        return memo_key(latitude, longitude, zoom, size, style, self.precision)
+
+    def record(self, mk, object_key, etag):
+        """记录 object_key 现在是记忆键 mk 的地图；它之前对应的坐标作废"""
+        previous = self.by_object.get(object_key)
+        if previous and previous != mk:
+            self.maps[previous].pop(object_key, None)
+            if not self.maps[previous]:
+                del self.maps[previous]
+        self.maps.setdefault(mk, {})[object_key] = etag.strip('"')
+        self.by_object[object_key] = mk
+
+    def plan(self, jobs, current_etag, zoom, size, style):
+        """把 [(目标key, 纬度, 经度)] 分成三类:
+        unchanged  [(目标key, 记忆键)]              目标已是该坐标的地图
+        copy       [(源key, 目标key, 记忆键)]       同坐标的地图在别的key，服务端复制
+        render     [(目标key, 纬度, 经度, 记忆键)]  需要渲染
+        current_etag(key) 返回对象当前ETag（不存在时None），用来确认索引里的对象没被改动或删除"""
+        result = {'unchanged': [], 'copy': [], 'render': []}
+        for target, latitude, longitude in jobs:
+            mk = self.key(latitude, longitude, zoom, size, style)
+            objects = self.maps.get(mk, {})
+            valid = [key for key, etag in objects.items() if current_etag(key) == etag]
+            if target in valid:
+                result['unchanged'].append((target, mk))
+            elif valid:
+                result['copy'].append((valid[0], target, mk))
+            else:
+                result['render'].append((target, latitude, longitude, mk))
+        return result
+
+
+def head_etag(key):
+    """HEAD取对象ETag，不存在时返回None"""
+    head = s3_client.head_object(f"s3://{s3_client.BUCKET}/{key}")
+    return head['ETag'].strip('"') if head else None
+
+
+def main():
+    memo = StaticMapMemo().load()
+    objects = sum(len(objects) for objects in memo.maps.values())
+    print(f"索引: {memo.path} (精度 {memo.precision} 位小数)")
+    print(f"  {len(memo.maps)} 个坐标, {objects} 个地图对象")
+    if '--verbose' in sys.argv:
+        for mk, entries in sorted(memo.maps.items()):
+            print(f"  {mk}")
+            for key in sorted(entries):
+                print(f"    {key}")
+
+
+if __name__ == "__main__":
+    main()
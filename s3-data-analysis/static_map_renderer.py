@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+本地静态地图渲染器
+取代每个商户一次 Google Static Maps 请求再把PNG转WebP的流程: 用本地瓦片缓存按Web墨卡托投影拼出
+以商户 latitude/longitude 为中心的 600x350 地图，在中心画红色标记，直接编码为WebP。
+渲染和编码在进程池里并行，全程不访问网络，全部四个分类的地图几秒内即可重新生成。
+批量运行经 static_map_memo 按坐标记忆化: 坐标没变的商户跳过，同坐标地图已存在时服务端复制，只渲染位置变化的商户。
+
+瓦片来自 tile_cache（按 (z, x, y, style) 的磁盘LRU缓存）；缺失的瓦片用底色填充并计数，--fetch 时现场下载
+（需设置 TILE_URL 和 TILE_CONTACT，见 tile_cache）。每张地图右下角都画上瓦片数据的署名 tile_cache.ATTRIBUTION。
+
+    python3 static_map_renderer.py --dry-run                 # 渲染全部8个目录文件的地图，不上传
+    python3 static_map_renderer.py dining-dev.json dining.json
+    python3 static_map_renderer.py --fetch                   # 缓存未命中的瓦片现场下载
+    python3 static_map_renderer.py --allow-missing           # 瓦片不全时也上传（缺失处为底色）
+    python3 static_map_renderer.py --force --precision 4     # 忽略记忆化索引全部重新渲染
+    python3 static_map_renderer.py --point -8.654581,115.129677 teamo_static.webp
+"""
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+import catalog_commit
+import catalog_index
+import catalog_store
+import image_transcoder
+import s3_client
+import s3_inventory
+import static_map_memo
+import tile_cache
+
+DEFAULT_ZOOM = 16
+DEFAULT_SIZE = (600, 350)
+DEFAULT_STYLE = tile_cache.DEFAULT_STYLE
+DEFAULT_QUALITY = 90
+BACKGROUND = (232, 228, 220)
+MARKER_COLOR = (234, 67, 53)
+MARKER_OUTLINE = (165, 39, 20)
+UPLOAD_WORKERS = 16
+ATTRIBUTION_SIZE = 11
+ATTRIBUTION_PADDING = 3
+ATTRIBUTION_BACKGROUND = (255, 255, 255, 190)
+ATTRIBUTION_COLOR = (51, 51, 51)
+
+_marker = None
+_font = None
+
+
+def marker_image():
+    """红色水滴标记（4倍尺寸绘制后缩小抗锯齿），尖端位于底边中点"""
+    global _marker
+    if _marker is None:
+        w, h, s = 22, 36, 4
+        image = Image.new('RGBA', (w * s, h * s), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        r = w * s // 2 - s
+        cx, cy = w * s // 2, r + s
+        draw.polygon([(cx - r * 0.78, cy + r * 0.62), (cx + r * 0.78, cy + r * 0.62), (cx, h * s - s)],
+                     fill=MARKER_COLOR, outline=MARKER_OUTLINE)
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=MARKER_COLOR, outline=MARKER_OUTLINE, width=s)
+        draw.ellipse((cx - r // 3, cy - r // 3, cx + r // 3, cy + r // 3), fill=MARKER_OUTLINE)
+        _marker = image.resize((w, h), Image.LANCZOS)
+    return _marker
+
+
+def attribution_font():
+    global _font
+    if _font is None:
+        try:
+            _font = ImageFont.load_default(size=ATTRIBUTION_SIZE)
+        except (TypeError, OSError):
+            # 旧版Pillow或没有FreeType时只有固定大小的位图字体
+            _font = ImageFont.load_default()
+    return _font
+
+
+def draw_attribution(image, text=None):
+    """在右下角半透明底上写瓦片数据署名"""
+    text = text or tile_cache.ATTRIBUTION
+    font = attribution_font()
+    left, top, right, bottom = font.getbbox(text)
+    box_w = right - left + 2 * ATTRIBUTION_PADDING
+    box_h = bottom - top + 2 * ATTRIBUTION_PADDING
+    x0, y0 = image.width - box_w, image.height - box_h
+    overlay = Image.new('RGBA', (box_w, box_h), ATTRIBUTION_BACKGROUND)
+    image.paste(overlay, (x0, y0), overlay)
+    ImageDraw.Draw(image).text(
+        (x0 + ATTRIBUTION_PADDING - left, y0 + ATTRIBUTION_PADDING - top), text, font=font, fill=ATTRIBUTION_COLOR
+    )
+
+
+def render(latitude, longitude, zoom=DEFAULT_ZOOM, size=DEFAULT_SIZE, style=DEFAULT_STYLE, fetch=False):
+    """从瓦片缓存拼接视野，画标记和署名，返回 (RGB图片, 本次的瓦片计数 {hits, misses, fetched, ..., missing})
+    fetch=True 时缓存未命中的瓦片现场下载"""
+    cache = tile_cache.get_cache()
+    before = cache.metrics.counts()
+    image = Image.new('RGB', size, BACKGROUND)
+    missing = 0
+    for x, y, offset_x, offset_y in tile_cache.tiles_for_view(latitude, longitude, zoom, size):
+        path = cache.get(zoom, x, y, style, fetch=fetch)
+        if path is None:
+            missing += 1
+            continue
+        with Image.open(path) as tile:
+            image.paste(tile.convert('RGB'), (offset_x, offset_y))
+
+    marker = marker_image()
+    left, top = tile_cache.view_origin(latitude, longitude, zoom, size)
+    center_x, center_y = tile_cache.project(latitude, longitude, zoom)
+    tip_x = int(round(center_x)) - left
+    tip_y = int(round(center_y)) - top
+    image.paste(marker, (tip_x - marker.width // 2, tip_y - marker.height), marker)
+    draw_attribution(image)
+    stats = {k: v - before[k] for k, v in cache.metrics.counts().items()}
+    stats['missing'] = missing
+    return image, stats
+
+
+def render_webp(latitude, longitude, zoom=DEFAULT_ZOOM, size=DEFAULT_SIZE, style=DEFAULT_STYLE,
+                quality=DEFAULT_QUALITY, fetch=False):
+    """渲染并编码为WebP，返回 (字节, 瓦片计数)；在工作进程中执行"""
+    image, stats = render(latitude, longitude, zoom, size, style, fetch)
+    output = io.BytesIO()
+    image.save(output, format='WEBP', quality=quality, method=image_transcoder.DEFAULT_METHOD)
+    return output.getvalue(), stats
+
+
+def save_static_map(latitude, longitude, filename, **options):
+    """渲染到本地WebP文件，返回缺失瓦片数"""
+    data, stats = render_webp(float(latitude), float(longitude), **options)
+    with open(filename, 'wb') as f:
+        f.write(data)
+    return stats['missing']
+
+
+def coordinates(item):
+    """目录条目的 (纬度, 经度)，兼容旧的 lat/lng 字段，没有时返回None"""
+    latitude = item.get('latitude', item.get('lat'))
+    longitude = item.get('longitude', item.get('lng'))
+    if latitude is None or longitude is None:
+        return None
+    return float(latitude), float(longitude)
+
+
+def static_map_key(item, album):
+    """地图对象key: 沿用已有 staticMapS3Url（扩展名换成.webp），否则按迁移后的规则放在
+    <相册>/<商户>/staticmap.webp，商户目录去掉 _placeId 后缀（不再生成旧的 商户名_placeId/ 目录）"""
+    url = item.get('staticMapS3Url')
+    if url:
+        key = s3_client.parse_s3_path(url)[1]
+        if key.startswith(f"{album}/"):
+            return os.path.splitext(key)[0] + '.webp'
+    directory = next(
+        (d for d in map(catalog_index.merchant_directory, item.get('photos') or []) if d), None
+    )
+    if directory is None:
+        return None
+    merchant = catalog_index.split_place_id(directory)[0]
+    return f"{album}/{merchant}/staticmap.webp"
+
+
+def static_map_url(item, key):
+    """用条目已有URL的域名（没有时用照片的域名）拼出地图URL"""
+    for url in [item.get('staticMapS3Url')] + list(item.get('photos') or []):
+        if isinstance(url, str) and '://' in url:
+            scheme, rest = url.split('://', 1)
+            return f"{scheme}://{rest.split('/', 1)[0]}/{key}"
+    return f"s3://{s3_client.BUCKET}/{key}"
+
+
+def render_catalog_maps(jobs, dry_run=False, processes=None, allow_missing=False, **options):
+    """并行渲染 [(key, 纬度, 经度)] 并上传，逐个yield (key, 字节数, ETag, 瓦片计数, 错误)
+    有瓦片缺失的地图默认不上传，避免用空白底图覆盖线上地图"""
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count() or 1) as pool:
+        def run(job):
+            key, latitude, longitude = job
+            try:
+                data, stats = pool.submit(render_webp, latitude, longitude, **options).result()
+                if stats['missing'] and not allow_missing:
+                    return key, None, None, stats, Exception(f"本地缓存缺少 {stats['missing']} 个瓦片")
+                etag = None
+                if not dry_run:
+                    etag = s3_client.upload_bytes(data, f"s3://{s3_client.BUCKET}/{key}", 'image/webp')
+                return key, len(data), etag, stats, None
+            except Exception as e:
+                return key, None, None, None, e
+
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            yield from executor.map(run, jobs)
+
+
+def copy_maps(copies, dry_run=False):
+    """并发服务端复制 [(源key, 目标key, 记忆键)]，逐个yield (复制项, 目标ETag, 错误)"""
+    def run(copy):
+        source, target, _ = copy
+        if dry_run:
+            return copy, None, None
+        try:
+            etag = s3_client.verified_copy(
+                f"s3://{s3_client.BUCKET}/{source}", f"s3://{s3_client.BUCKET}/{target}"
+            )
+            return copy, etag, None
+        except Exception as e:
+            return copy, None, e
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        yield from executor.map(run, copies)
+
+
+def ensure_static_map(latitude, longitude, key, memo=None, dry_run=False, zoom=DEFAULT_ZOOM,
+                      size=DEFAULT_SIZE, style=DEFAULT_STYLE, **options):
+    """保证 key 处是该坐标的地图: 未变化时跳过，同坐标地图已存在时复制，否则渲染上传
+    返回 'unchanged' / 'copied' / 'rendered'；渲染时瓦片缺失会抛出异常。memo 由调用方负责 save()"""
+    memo = memo or static_map_memo.StaticMapMemo().load()
+    plan = memo.plan([(key, float(latitude), float(longitude))], static_map_memo.head_etag, zoom, size, style)
+    if plan['unchanged']:
+        return 'unchanged'
+    for copy, etag, error in copy_maps(plan['copy'], dry_run):
+        if error is None:
+            if etag:
+                memo.record(copy[2], key, etag)
+            return 'copied'
+    mk = memo.key(float(latitude), float(longitude), zoom, size, style)
+    data, stats = render_webp(float(latitude), float(longitude), zoom, size, style, **options)
+    if stats['missing']:
+        raise Exception(f"{stats['missing']} 个瓦片缺失")
+    if not dry_run:
+        etag = s3_client.upload_bytes(data, f"s3://{s3_client.BUCKET}/{key}", 'image/webp')
+        memo.record(mk, key, etag)
+    return 'rendered'
+
+
+def main():
+    args = sys.argv[1:]
+    if '--fetch' in args:
+        tile_cache.check_tile_source()
+    if '--point' in args:
+        i = args.index('--point')
+        latitude, longitude = (float(v) for v in args[i + 1].split(','))
+        filename = args[i + 2] if len(args) > i + 2 else 'staticmap.webp'
+        missing = save_static_map(latitude, longitude, filename)
+        print(f"✅ {filename} ({os.path.getsize(filename) / 1024:.1f} KB, 缺失瓦片 {missing})")
+        return
+
+    dry_run = '--dry-run' in args
+    precision = static_map_memo.DEFAULT_PRECISION
+    if '--precision' in args:
+        i = args.index('--precision')
+        precision = int(args[i + 1])
+        del args[i:i + 2]
+    json_files = [a for a in args if not a.startswith('--')] or catalog_store.CATALOG_FILES
+    catalogs = {}
+    jobs = []
+    skipped = 0
+    for json_file in json_files:
+        data, etag = catalog_store.load_with_etag(json_file)
+        catalogs[json_file] = (data, etag)
+        album = catalog_store.album_for(json_file)
+        for item in data:
+            point = coordinates(item)
+            key = static_map_key(item, album) if point else None
+            if key is None:
+                skipped += 1
+                continue
+            jobs.append((key, point[0], point[1]))
+
+    # 坐标没变的商户只查索引；--force 时全部重新渲染
+    memo = static_map_memo.StaticMapMemo(precision).load()
+    # 目标相册和索引中同坐标地图所在的相册都要有清单，才能确认可复制的源对象
+    keys = {key for key, _, _ in jobs}
+    for _, lat, lng in jobs:
+        keys.update(memo.maps.get(memo.key(lat, lng, DEFAULT_ZOOM, DEFAULT_SIZE, DEFAULT_STYLE), {}))
+    albums = sorted({key.split('/', 1)[0] for key in keys} & set(s3_client.ALBUMS))
+    inventory = s3_inventory.load_inventory(albums)
+
+    def current_etag(key):
+        entry = inventory.get(key)
+        return entry['etag'] if entry else None
+
+    if '--force' in args:
+        plan = {'unchanged': [], 'copy': [],
+                'render': [(k, lat, lng, memo.key(lat, lng, DEFAULT_ZOOM, DEFAULT_SIZE, DEFAULT_STYLE))
+                           for k, lat, lng in jobs]}
+    else:
+        plan = memo.plan(jobs, current_etag, DEFAULT_ZOOM, DEFAULT_SIZE, DEFAULT_STYLE)
+    print(f"地图 {len(jobs)} 张: 未变化 {len(plan['unchanged'])}, 复制 {len(plan['copy'])}, "
+          f"需渲染 {len(plan['render'])}, 缺少坐标或目录跳过 {skipped}")
+
+    start = time.time()
+    points = {key: (lat, lng) for key, lat, lng in jobs}
+    done = {key for key, _ in plan['unchanged']}
+    to_render = list(plan['render'])
+    for (source, target, mk), etag, error in copy_maps(plan['copy'], dry_run):
+        if error:
+            # 复制失败时退回渲染
+            to_render.append((target, *points[target], mk))
+            continue
+        done.add(target)
+        if etag:
+            memo.record(mk, target, etag)
+
+    memo_keys = {key: mk for key, _, _, mk in to_render}
+    total_bytes = 0
+    metrics = tile_cache.TileCacheMetrics()
+    missing_tiles = 0
+    rendered = 0
+    for key, size, etag, stats, error in render_catalog_maps(
+        [(key, lat, lng) for key, lat, lng, _ in to_render], dry_run,
+        allow_missing='--allow-missing' in args, fetch='--fetch' in args
+    ):
+        if stats:
+            missing_tiles += stats.pop('missing')
+            metrics.merge(stats)
+        if error:
+            print(f"  ❌ {key}: {error}")
+            continue
+        done.add(key)
+        rendered += 1
+        total_bytes += size
+        if etag:
+            memo.record(memo_keys[key], key, etag)
+    elapsed = time.time() - start
+    print(f"渲染 {rendered}/{len(to_render)} 张地图, {elapsed:.2f} 秒, 共 {total_bytes / 1024 / 1024:.1f} MB")
+    if to_render:
+        metrics.evicted = tile_cache.get_cache().evict()
+        print(f"瓦片缓存: {metrics.summary()}")
+    if missing_tiles:
+        print(f"⚠️  缺少 {missing_tiles} 个瓦片（已用底色填充），先运行 python3 tile_cache.py --warm 预取，或加 --fetch")
+
+    if not dry_run:
+        memo.save()
+        inventory = s3_inventory.Inventory()
+        for album in albums:
+            inventory.invalidate(album)
+        inventory.save()
+
+    commit = catalog_commit.CatalogCommit('本地渲染静态地图')
+    for json_file, (data, etag) in catalogs.items():
+        album = catalog_store.album_for(json_file)
+        updated = 0
+        for item in data:
+            key = static_map_key(item, album) if coordinates(item) else None
+            if key not in done:
+                continue
+            url = static_map_url(item, key)
+            if item.get('staticMapS3Url') != url:
+                item['staticMapS3Url'] = url
+                updated += 1
+        if updated:
+            commit.stage(json_file, data, base_etag=etag)
+            print(f"  {json_file}: 更新 {updated} 个 staticMapS3Url")
+    catalog_commit.print_commit(commit.commit(dry_run))
+
+
+if __name__ == "__main__":
+    main()
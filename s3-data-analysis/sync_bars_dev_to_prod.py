@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
-import subprocess
+
+import s3_client
 
 def sync_bars_merchants():
     """将Hippie Fish和Miss Fish从bars-dev.json同步到bars.json"""
@@ -66,16 +67,15 @@ def sync_bars_merchants():
     
     # 6. 上传到S3
     s3_path = 's3://baliciaga-database/data/bars.json'
-    upload_cmd = ['aws', 's3', 'cp', output_file, s3_path]
-    result = subprocess.run(upload_cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
+    try:
+        s3_client.upload_file(output_file, s3_path)
+    except Exception as e:
+        print(f"❌ 上传失败: {e}")
+    else:
         print(f"✅ 成功上传到S3: {s3_path}")
         
         # 7. 验证结果
         verify_sync(output_file)
-    else:
-        print(f"❌ 上传失败: {result.stderr}")
 
 def verify_sync(json_file):
     """验证同步结果"""
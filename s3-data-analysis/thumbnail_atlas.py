@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+分类列表缩略图图集
+列表页为每个商户分别加载 photos[0] 和 staticMapS3Url，40个咖啡馆就是80多次CDN往返。
+这里把每个目录文件（分类+环境）的首图缩略图拼成一张WebP图集、地图缩略图拼成另一张，
+再写一个JSON偏移表，列表页两次请求即可渲染全部缩略图:
+
+    data/atlas/<目录名>/photos-<内容哈希>.webp
+    data/atlas/<目录名>/maps-<内容哈希>.webp
+    data/atlas/<目录名>/atlas.json    {"atlases": {"photos": [...], "maps": [...]},
+                                       "merchants": {"<placeId或名称>": {"photo": {atlas, x, y, w, h}, "map": {...}}}}
+
+增量重建: atlas.json 记录每个格子来源对象的key和ETag。缩放后的格子按来源ETag无损缓存在本地
+（<ATLAS_CELL_CACHE_DIR>/<宽>x<高>/<ETag>.png），图集每次都从这些无损格子重新拼出并只编码一次，
+不会从上一版有损图集裁切再编码；只有首图或地图变化了（或本地没有缓存）的格子才下载、缩放。全部没变时不上传。
+图集文件名带内容哈希，只需失效 atlas.json。CDN和浏览器在失效生效前仍可能拿到上一版 atlas.json，
+所以上一代图集保留不删，只删除两代以前的图集。
+
+    python3 thumbnail_atlas.py                   # 全部8个目录文件
+    python3 thumbnail_atlas.py cafes-dev.json --dry-run
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+import catalog_commit
+import catalog_store
+import photo_variants
+import promotion_manifest
+import s3_client
+
+CELL_CACHE_DIR = os.environ.get(
+    'ATLAS_CELL_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.atlas_cells')
+)
+ATLAS_PREFIX = 'data/atlas/'
+ATLAS_VERSION = 1
+CELL_SIZES = {'photo': (240, 180), 'map': (240, 140)}
+ATLAS_KINDS = {'photo': 'photos', 'map': 'maps'}
+# 单张图集的最大边长，超出时按列数换行拼多张
+MAX_ATLAS_SIDE = 4096
+COLUMNS = 16
+QUALITY = 80
+IO_WORKERS = 16
+
+
+def atlas_dir(json_file):
+    return f"{ATLAS_PREFIX}{json_file.rsplit('.', 1)[0]}/"
+
+
+def cell_sources(item):
+    """商户的 {格子类型: 来源对象key}"""
+    sources = {}
+    photos = item.get('photos') or []
+    if photos and isinstance(photos[0], str) and photos[0]:
+        sources['photo'] = s3_client.parse_s3_path(photos[0])[1]
+    if isinstance(item.get('staticMapS3Url'), str) and item['staticMapS3Url']:
+        sources['map'] = s3_client.parse_s3_path(item['staticMapS3Url'])[1]
+    return sources
+
+
+def cdn_base(data):
+    """目录中第一个http(s) URL的 scheme://host"""
+    for item in data:
+        for url in (item.get('photos') or []) + [item.get('staticMapS3Url')]:
+            if isinstance(url, str) and '://' in url and not url.startswith('s3://'):
+                scheme, rest = url.split('://', 1)
+                return f"{scheme}://{rest.split('/', 1)[0]}"
+    return None
+
+
+def load_atlas(json_file):
+    """读取上一版 atlas.json，不存在时返回None"""
+    try:
+        data = json.loads(s3_client.download_bytes(f"s3://{s3_client.BUCKET}/{atlas_dir(json_file)}atlas.json"))
+    except s3_client.ClientError as e:
+        if s3_client.is_not_found(e):
+            return None
+        raise
+    return data if data.get('version') == ATLAS_VERSION else None
+
+
+def thumbnail(data, size):
+    """解码并居中裁切缩放到格子大小"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (size[0] * 2, size[1] * 2))
+        return ImageOps.fit(image.convert('RGB'), size, Image.LANCZOS)
+
+
+def cell_cache_path(etag, size):
+    return os.path.join(CELL_CACHE_DIR, f"{size[0]}x{size[1]}", f"{etag}.png")
+
+
+def cached_cell(etag, size):
+    """本地无损缓存的格子，没有时返回None"""
+    path = cell_cache_path(etag, size)
+    if not os.path.exists(path):
+        return None
+    with Image.open(path) as image:
+        return image.convert('RGB')
+
+
+def cache_cell(etag, size, image):
+    """把格子存成PNG（先写临时文件再原子替换）"""
+    path = cell_cache_path(etag, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(tmp_path, format='PNG')
+    os.replace(tmp_path, path)
+
+
+def layout(count, size):
+    """count个格子在图集中的 [(图集序号, x, y)] 和每张图集的 (宽, 高)"""
+    per_column = max(1, MAX_ATLAS_SIDE // size[1])
+    per_atlas = COLUMNS * per_column
+    positions = []
+    sheets = []
+    for i in range(count):
+        sheet, index = divmod(i, per_atlas)
+        row, column = divmod(index, COLUMNS)
+        positions.append((sheet, column * size[0], row * size[1]))
+    for sheet in range((count + per_atlas - 1) // per_atlas):
+        cells = min(per_atlas, count - sheet * per_atlas)
+        columns = min(COLUMNS, cells)
+        rows = (cells + COLUMNS - 1) // COLUMNS
+        sheets.append((columns * size[0], rows * size[1]))
+    return positions, sheets
+
+
+def plan(data, previous, etags):
+    """把格子分成可复用（来源key和ETag与上一版一致）和需重新生成两类
+    返回 ({类型: [(商户键, 来源key)]}, 需生成的 {(类型, 商户键)})"""
+    cells = {kind: [] for kind in CELL_SIZES}
+    stale = set()
+    old_merchants = (previous or {}).get('merchants', {})
+    for item in data:
+        name = promotion_manifest.entry_key(item)
+        for kind, key in cell_sources(item).items():
+            if etags.get(key) is None:
+                continue
+            cells[kind].append((name, key))
+            old = old_merchants.get(name, {}).get(kind)
+            if not old or old['source'] != key or old['etag'] != etags[key]:
+                stale.add((kind, name))
+    return cells, stale
+
+
+def build(json_file, dry_run=False, force=False):
+    """重建一个目录文件的图集，返回统计；没有变化时不上传
+    force 时忽略上一版的格子记录全部重新下载缩放（上一版图集仍按代保留和清理）"""
+    data = catalog_store.load(json_file)
+    previous = load_atlas(json_file)
+    keys = sorted({key for item in data for key in cell_sources(item).values()})
+    etags = photo_variants.source_etags(keys)
+    cells, stale = plan(data, None if force else previous, etags)
+    stats = {'merchants': len(data), 'cells': sum(len(c) for c in cells.values()), 'regenerated': len(stale)}
+
+    # 格子顺序和内容都没变的类型沿用上一版图集，不重新编码
+    unchanged = {
+        kind for kind in CELL_SIZES
+        if previous and not force and not any(k == kind for k, _ in stale)
+        and [name for name, _ in cells[kind]] == previous.get('order', {}).get(kind)
+    }
+    if len(unchanged) == len(CELL_SIZES):
+        stats['uploaded'] = False
+        return stats
+
+    # 需要重新拼的类型: 来源变了或本地没有无损缓存的格子才下载缩放
+    images = {}
+    jobs = []
+    for kind, size in CELL_SIZES.items():
+        if kind in unchanged:
+            continue
+        for name, key in cells[kind]:
+            image = None if (kind, name) in stale and force else cached_cell(etags[key], size)
+            if image is None:
+                jobs.append((kind, name, key))
+            else:
+                images[(kind, name)] = image
+
+    def fetch(job):
+        kind, name, key = job
+        try:
+            image = thumbnail(s3_client.download_bytes(f"s3://{s3_client.BUCKET}/{key}"), CELL_SIZES[kind])
+            cache_cell(etags[key], CELL_SIZES[kind], image)
+            return kind, name, image, None
+        except Exception as e:
+            return kind, name, None, e
+
+    stats['downloaded'] = len(jobs)
+    stats['errors'] = []
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+        for kind, name, image, error in executor.map(fetch, jobs):
+            if error:
+                stats['errors'].append((name, kind, error))
+            else:
+                images[(kind, name)] = image
+
+    result = {
+        'version': ATLAS_VERSION,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'catalog': json_file,
+        'atlases': {},
+        'order': {},
+        'merchants': {},
+        'retained': []
+    }
+    base = cdn_base(data)
+    uploads = []
+    current = set()
+    for kind, size in CELL_SIZES.items():
+        if kind in unchanged:
+            result['order'][kind] = previous['order'][kind]
+            result['atlases'][ATLAS_KINDS[kind]] = previous['atlases'][ATLAS_KINDS[kind]]
+            for name in result['order'][kind]:
+                result['merchants'].setdefault(name, {})[kind] = previous['merchants'][name][kind]
+            current.update(sheet['key'] for sheet in result['atlases'][ATLAS_KINDS[kind]])
+            continue
+        entries = [(name, key, images[(kind, name)]) for name, key in cells[kind] if (kind, name) in images]
+        positions, sheets = layout(len(entries), size)
+        canvases = [Image.new('RGB', sheet, (255, 255, 255)) for sheet in sheets]
+        for (name, key, image), (sheet, x, y) in zip(entries, positions):
+            canvases[sheet].paste(image, (x, y))
+            result['merchants'].setdefault(name, {})[kind] = {
+                'atlas': sheet, 'x': x, 'y': y, 'w': size[0], 'h': size[1],
+                'source': key, 'etag': etags[key]
+            }
+        result['order'][kind] = [name for name, _, _ in entries]
+        result['atlases'][ATLAS_KINDS[kind]] = []
+        for canvas in canvases:
+            output = io.BytesIO()
+            canvas.save(output, format='WEBP', quality=QUALITY, method=6)
+            body = output.getvalue()
+            key = f"{atlas_dir(json_file)}{ATLAS_KINDS[kind]}-{hashlib.sha256(body).hexdigest()[:12]}.webp"
+            result['atlases'][ATLAS_KINDS[kind]].append({
+                'key': key,
+                'url': f"{base}/{key}" if base else f"s3://{s3_client.BUCKET}/{key}",
+                'width': canvas.width,
+                'height': canvas.height,
+                'bytes': len(body)
+            })
+            uploads.append((body, key))
+            current.add(key)
+
+    # 上一版 atlas.json 引用的图集保留一代（retained），上一版已保留的更早一代此时才删除
+    previous_sheets = {
+        sheet['key'] for sheets in (previous or {}).get('atlases', {}).values() for sheet in sheets
+    }
+    result['retained'] = sorted(previous_sheets - current)
+    obsolete = sorted(set((previous or {}).get('retained', [])) - current - previous_sheets)
+
+    stats['atlas_bytes'] = sum(len(body) for body, _ in uploads)
+    stats['deleted'] = len(obsolete)
+    stats['uploaded'] = not dry_run
+    if dry_run:
+        return stats
+
+    # 先上传带哈希的图集，再换上新的偏移表，最后删掉两代以前的图集
+    for body, key in uploads:
+        s3_client.upload_bytes(body, f"s3://{s3_client.BUCKET}/{key}", 'image/webp')
+    index_key = f"{atlas_dir(json_file)}atlas.json"
+    s3_client.upload_bytes(catalog_commit.serialize(result), f"s3://{s3_client.BUCKET}/{index_key}", 'application/json')
+    s3_client.delete_keys(f"s3://{s3_client.BUCKET}/{key}" for key in obsolete)
+    try:
+        stats['invalidation_id'] = catalog_commit.create_invalidation([f"/{index_key}"])
+    except Exception as e:
+        print(f"⚠️  CloudFront失效请求失败: {e}")
+    return stats
+
+
+def main():
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    json_files = [a for a in args if not a.startswith('--')] or catalog_store.CATALOG_FILES
+    for json_file in json_files:
+        start = time.time()
+        stats = build(json_file, dry_run, force='--force' in args)
+        if not stats['uploaded'] and 'atlas_bytes' not in stats:
+            print(f"  {json_file}: {stats['cells']} 个格子未变化，跳过 ({time.time() - start:.2f} 秒)")
+            continue
+        print(f"  {json_file}: {stats['merchants']} 个商户, {stats['cells']} 个格子, 重新生成 {stats['regenerated']}, "
+              f"下载 {stats['downloaded']}, 图集 {stats['atlas_bytes'] / 1024:.0f} KB, "
+              f"删除两代前图集 {stats['deleted']} 张 ({time.time() - start:.2f} 秒)"
+              f"{' [DRY RUN]' if dry_run else ''}")
+        for name, kind, error in stats['errors']:
+            print(f"    ❌ {name} {kind}: {error}")
+
+
+if __name__ == "__main__":
+    main()
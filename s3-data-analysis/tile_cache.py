@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+本地地图瓦片缓存
+按 (z, x, y, style) 把瓦片存成 <TILE_CACHE_DIR>/<style>/<z>/<x>/<y>.png，所有静态地图生成路径
+（static_map_renderer 及调用它的脚本）都从这里取瓦片。巴厘岛商户集中在 Canggu / Seminyak / Pererenan，
+相邻商户的地图大部分瓦片相同，只需下载一次。
+
+缓存有总大小上限，按最近使用时间（命中时刷新文件mtime，多进程共享）做LRU淘汰；每次运行统计命中率。
+预热模式按目录文件中所有商户的坐标算出覆盖各自地图视野的瓦片集合，去重后只下载缺失的瓦片。
+下载需要显式设置 TILE_URL（允许批量下载的瓦片服务）和 TILE_CONTACT（User-Agent 中的联系方式），没有默认的公共服务。
+
+    python3 tile_cache.py                       # 查看缓存大小
+    TILE_URL='https://tiles.example.com/{z}/{x}/{y}.png' TILE_CONTACT=ops@example.com \
+    python3 tile_cache.py --warm                # 为8个目录文件的全部商户预取 zoom 16 瓦片
+    python3 tile_cache.py --warm --zooms 15,16 cafes-dev.json
+    python3 tile_cache.py --evict               # 按上限做一次LRU淘汰
+"""
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import catalog_store
+
+TILE_CACHE_DIR = os.environ.get(
+    'TILE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.tile_cache')
+)
+MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# 淘汰到上限的这个比例，避免每写一个瓦片就淘汰一次
+EVICT_TARGET = 0.9
+EVICT_CHECK_EVERY = 256
+TILE_SIZE = 256
+DEFAULT_STYLE = 'roadmap'
+# 不内置公共瓦片服务: tile.openstreetmap.org 的使用政策禁止批量预取，必须显式配置允许批量使用的
+# 瓦片服务（自建或商用，URL模板如 https://tiles.example.com/{z}/{x}/{y}.png），并提供联系方式写进 User-Agent
+TILE_URLS = {
+    'roadmap': os.environ.get('TILE_URL')
+}
+TILE_CONTACT = os.environ.get('TILE_CONTACT')
+USER_AGENT = f"baliciaga-staticmap/1.0 (+{TILE_CONTACT})"
+# 渲染的每张地图都要带上瓦片数据的署名
+ATTRIBUTION = os.environ.get('TILE_ATTRIBUTION', '© OpenStreetMap contributors')
+# 公共瓦片服务要求限制并发
+FETCH_WORKERS = 2
+FETCH_TIMEOUT = 15.0
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def check_tile_source(style=DEFAULT_STYLE):
+    """下载瓦片前确认已配置瓦片服务地址和联系方式，未配置时抛出异常"""
+    if not TILE_URLS.get(style):
+        raise Exception("未设置 TILE_URL（瓦片服务URL模板），不使用公共OSM瓦片服务批量下载")
+    if not TILE_CONTACT:
+        raise Exception("未设置 TILE_CONTACT（写进 User-Agent 的联系邮箱或网址）")
+
+
+def project(latitude, longitude, zoom):
+    """经纬度 -> 该缩放级别下的全局像素坐标（Web墨卡托）"""
+    scale = TILE_SIZE * (1 << zoom)
+    sin_lat = min(max(math.sin(math.radians(latitude)), -0.9999), 0.9999)
+    x = (longitude + 180.0) / 360.0 * scale
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def view_origin(latitude, longitude, zoom, size):
+    """以坐标为中心、size大小的视野左上角全局像素坐标"""
+    center_x, center_y = project(latitude, longitude, zoom)
+    return int(round(center_x - size[0] / 2)), int(round(center_y - size[1] / 2))
+
+
+def tiles_for_view(latitude, longitude, zoom, size):
+    """覆盖视野的瓦片 [(x, y, 视野内偏移x, 视野内偏移y)]，x按经度回绕，超出纬度范围的行省略"""
+    left, top = view_origin(latitude, longitude, zoom, size)
+    count = 1 << zoom
+    tiles = []
+    for ty in range(top // TILE_SIZE, (top + size[1] - 1) // TILE_SIZE + 1):
+        if not 0 <= ty < count:
+            continue
+        for tx in range(left // TILE_SIZE, (left + size[0] - 1) // TILE_SIZE + 1):
+            tiles.append((tx % count, ty, tx * TILE_SIZE - left, ty * TILE_SIZE - top))
+    return tiles
+
+
+class TileCacheMetrics:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.fetched = 0
+        self.failed = 0
+        self.evicted = 0
+        self.fetched_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def counts(self):
+        return {'hits': self.hits, 'misses': self.misses, 'fetched': self.fetched,
+                'failed': self.failed, 'fetched_bytes': self.fetched_bytes}
+
+    def merge(self, counts):
+        """合并工作进程返回的计数字典"""
+        self.add(**counts)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def summary(self):
+        rate = f"{self.hit_rate:.1%}" if self.hit_rate is not None else '-'
+        return (f"命中 {self.hits}, 未命中 {self.misses} (命中率 {rate}), 下载 {self.fetched} 个 "
+                f"{self.fetched_bytes / 1024:.0f} KB, 失败 {self.failed}, 淘汰 {self.evicted}")
+
+
+class TileCache:
+    """磁盘瓦片缓存；fetch=True 时未命中的瓦片从 TILE_URLS 下载"""
+
+    def __init__(self, root=TILE_CACHE_DIR, max_bytes=MAX_BYTES, fetch=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.metrics = TileCacheMetrics()
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._writes = 0
+
+    def path(self, z, x, y, style=DEFAULT_STYLE):
+        return os.path.join(self.root, style, str(z), str(x), f"{y}.png")
+
+    def _http(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    headers={'User-Agent': USER_AGENT}, timeout=FETCH_TIMEOUT, follow_redirects=True
+                )
+            return self._client
+
+    def contains(self, z, x, y, style=DEFAULT_STYLE):
+        return os.path.exists(self.path(z, x, y, style))
+
+    def get(self, z, x, y, style=DEFAULT_STYLE, fetch=None):
+        """返回瓦片文件路径；命中时刷新mtime作为LRU时间，未命中且不允许下载时返回None
+        fetch 为None时使用实例的设置"""
+        path = self.path(z, x, y, style)
+        try:
+            os.utime(path)
+            self.metrics.add(hits=1)
+            return path
+        except FileNotFoundError:
+            self.metrics.add(misses=1)
+        if not (self.fetch if fetch is None else fetch):
+            return None
+        return path if self.download(z, x, y, style) else None
+
+    def download(self, z, x, y, style=DEFAULT_STYLE):
+        """下载一个瓦片并原子写入缓存，返回是否成功；未配置瓦片服务时抛出异常"""
+        check_tile_source(style)
+        url = TILE_URLS[style].format(z=z, x=x, y=y)
+        try:
+            response = self._http().get(url)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self.metrics.add(failed=1)
+            return False
+        self.put(z, x, y, response.content, style)
+        self.metrics.add(fetched=1, fetched_bytes=len(response.content))
+        return True
+
+    def put(self, z, x, y, data, style=DEFAULT_STYLE):
+        path = self.path(z, x, y, style)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._client_lock:
+            self._writes += 1
+            check = self._writes % EVICT_CHECK_EVERY == 0
+        if check:
+            self.evict()
+
+    def entries(self):
+        """缓存中所有瓦片 [(mtime, 大小, 路径)]"""
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self):
+        """总大小超过上限时按mtime从旧到新删除，直到降到上限的 EVICT_TARGET，返回删除数"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        target = self.max_bytes * EVICT_TARGET
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.metrics.add(evicted=removed)
+        return removed
+
+    def warm(self, tiles, workers=FETCH_WORKERS):
+        """预取 [(z, x, y, style)] 中缓存没有的瓦片，返回需要下载的数量"""
+        tiles = list(tiles)
+        missing = [tile for tile in tiles if not self.contains(*tile)]
+        self.metrics.add(hits=len(tiles) - len(missing), misses=len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda tile: self.download(*tile), missing))
+        self.evict()
+        return len(missing)
+
+
+def get_cache():
+    """进程内共享的缓存实例（渲染工作进程各自一个，LRU时间通过文件mtime共享）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TileCache()
+        return _cache
+
+
+def catalog_points(json_files=None):
+    """目录文件中所有商户的 (纬度, 经度)，兼容旧的 lat/lng 字段"""
+    points = []
+    for json_file in json_files or catalog_store.CATALOG_FILES:
+        for item in catalog_store.load(json_file):
+            latitude = item.get('latitude', item.get('lat'))
+            longitude = item.get('longitude', item.get('lng'))
+            if latitude is not None and longitude is not None:
+                points.append((float(latitude), float(longitude)))
+    return points
+
+
+def tiles_for_points(points, zooms, size, style=DEFAULT_STYLE):
+    """所有坐标视野覆盖的瓦片，返回 (去重后的瓦片集合, 去重前的瓦片引用数)"""
+    tiles = set()
+    references = 0
+    for latitude, longitude in points:
+        for zoom in zooms:
+            view = tiles_for_view(latitude, longitude, zoom, size)
+            references += len(view)
+            tiles.update((zoom, x, y, style) for x, y, _, _ in view)
+    return tiles, references
+
+
+def main():
+    args = sys.argv[1:]
+    zooms = (16,)
+    if '--zooms' in args:
+        i = args.index('--zooms')
+        zooms = tuple(int(z) for z in args[i + 1].split(','))
+        del args[i:i + 2]
+    cache = TileCache(fetch=True)
+
+    if '--warm' in args:
+        check_tile_source()
+        json_files = [a for a in args if not a.startswith('--')] or None
+        points = catalog_points(json_files)
+        tiles, references = tiles_for_points(points, zooms, (600, 350))
+        print(f"商户坐标 {len(points)} 个, zoom {', '.join(map(str, zooms))}: "
+              f"需要瓦片 {len(tiles)} 个 (去重前 {references} 个, 共享率 {1 - len(tiles) / max(references, 1):.0%})")
+        start = time.time()
+        missing = cache.warm(sorted(tiles))
+        print(f"已缓存 {len(tiles) - missing}, 需下载 {missing}, {time.time() - start:.1f} 秒")
+        print(cache.metrics.summary())
+    elif '--evict' in args:
+        print(f"淘汰 {cache.evict()} 个瓦片")
+
+    count, total = cache.size()
+    print(f"缓存: {cache.root} {count} 个瓦片, {total / 1024 / 1024:.1f} MB / 上限 {cache.max_bytes / 1024 / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
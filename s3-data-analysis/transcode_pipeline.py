@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+流式 下载 -> 转码 -> 上传 流水线
+三个阶段各自一组线程，编码阶段的线程只负责把任务交给 image_transcoder 的进程池；
+阶段之间是有界队列，下游慢时上游阻塞（背压），所以网络I/O和CPU编码可以重叠，
+同时在途的图片字节数有上限，内存占用与相册大小无关。源文件删除按每1000个key一批进行。
+
+    python3 transcode_pipeline.py staticmap_pngs_to_convert.json --dry-run
+    S3_ENDPOINT_URL=http://127.0.0.1:5000 python3 transcode_pipeline.py staticmap_pngs_to_convert.json --seed
+"""
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageDraw
+
+import image_transcoder
+import s3_client
+
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_UPLOAD_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 16
+
+_END = object()
+
+
+class StageMetrics:
+    """单个阶段的计数: 处理数、累计忙碌时间、下游队列的最大深度"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.max_queue = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, queue_depth):
+        with self._lock:
+            self.items += 1
+            self.busy += elapsed
+            self.max_queue = max(self.max_queue, queue_depth)
+
+
+class PipelineMetrics:
+    def __init__(self):
+        self.stages = {name: StageMetrics(name) for name in ('download', 'encode', 'upload')}
+        self.started = time.time()
+        self.finished = None
+        self.in_flight_bytes = 0
+        self.peak_in_flight_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.in_flight_bytes += n
+            self.peak_in_flight_bytes = max(self.peak_in_flight_bytes, self.in_flight_bytes)
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def summary(self):
+        lines = []
+        for stage in self.stages.values():
+            lines.append(f"  {stage.name}: {stage.items} 个, 累计 {stage.busy:.2f} 秒, 下游队列峰值 {stage.max_queue}")
+        busy = sum(s.busy for s in self.stages.values())
+        lines.append(f"  墙钟 {self.elapsed:.2f} 秒, 各阶段累计 {busy:.2f} 秒 (重叠度 {busy / self.elapsed:.1f}x), "
+                     f"在途字节峰值 {self.peak_in_flight_bytes / 1024 / 1024:.1f} MB")
+        return '\n'.join(lines)
+
+
+def _put(q, item, stop):
+    """放入有界队列；队列满时阻塞（背压），流水线停止时放弃"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class TranscodePipeline:
+    """下载 / 编码 / 上传三阶段流水线
+    options 原样传给 image_transcoder.transcode（format / quality / lossless / max_width）"""
+
+    def __init__(self, processes=None, download_workers=DEFAULT_DOWNLOAD_WORKERS,
+                 upload_workers=DEFAULT_UPLOAD_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 dry_run=False, delete_source=False, **options):
+        self.processes = processes
+        self.download_workers = download_workers
+        self.upload_workers = upload_workers
+        self.queue_size = queue_size
+        self.dry_run = dry_run
+        self.delete_source = delete_source
+        self.options = options
+        self.content_type = image_transcoder.CONTENT_TYPES.get(options.get('format', 'WEBP'))
+        self.metrics = PipelineMetrics()
+        self._stop = threading.Event()
+
+    def _stage(self, name, workers, fn, inbox, outbox, downstream_workers, results):
+        """启动一个阶段的线程组；最后一个线程退出时给下游每个线程发一个结束标记"""
+        remaining = [workers]
+        lock = threading.Lock()
+        stats = self.metrics.stages[name]
+
+        def worker():
+            try:
+                while not self._stop.is_set():
+                    item = inbox.get()
+                    if item is _END:
+                        break
+                    start = time.perf_counter()
+                    try:
+                        output = fn(*item)
+                    except Exception as e:
+                        # 失败的任务直接进入结果队列，不再流向下游
+                        _put(results, (item[0], None, e), self._stop)
+                        continue
+                    stats.record(time.perf_counter() - start, outbox.qsize())
+                    _put(outbox, output, self._stop)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for _ in range(downstream_workers):
+                        _put(outbox, _END, self._stop)
+
+        for i in range(workers):
+            threading.Thread(target=worker, daemon=True, name=f"{name}-{i}").start()
+
+    def _download(self, job):
+        data = s3_client.download_bytes(job[0])
+        self.metrics.add_bytes(len(data))
+        return job, data
+
+    def _upload(self, job, encoded, stats):
+        try:
+            if not self.dry_run:
+                stats['etag'] = s3_client.upload_bytes(encoded, job[1], self.content_type).strip('"')
+        finally:
+            self.metrics.add_bytes(-len(encoded))
+        return job, stats, None
+
+    def _delete_sources(self, batch):
+        """批量删除一批已上传任务的源文件，只yield删除失败的任务（统计非空、错误为删除失败）"""
+        errors = dict(s3_client.delete_keys([job[0] for job, _ in batch]))
+        for job, stats in batch:
+            bucket, key = s3_client.parse_s3_path(job[0])
+            error = errors.get(f"s3://{bucket}/{key}")
+            if error:
+                yield job[0], job[1], stats, Exception(f"已上传但删除源文件失败: {error}")
+
+    def run(self, jobs):
+        """流式处理 (源, 目标) 任务，逐个yield (源, 目标, 统计或None, 错误或None)
+        每个任务上传完成即产出一次；delete_source 时源文件按批删除，删除失败的任务在该批删除后
+        再产出一次 (源, 目标, 统计, 删除错误)，调用方不应把它再计为一次成功"""
+        self._stop = stop = threading.Event()
+        downloads = queue.Queue(maxsize=self.queue_size)
+        encodes = queue.Queue(maxsize=self.queue_size)
+        uploads = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        self.metrics = PipelineMetrics()
+
+        with image_transcoder.TranscodeEngine(processes=self.processes) as engine:
+            encode_workers = engine.processes
+
+            def encode(job, data):
+                try:
+                    encoded, stats = engine.submit(data, **self.options).result()
+                finally:
+                    self.metrics.add_bytes(-len(data))
+                self.metrics.add_bytes(len(encoded))
+                return job, encoded, stats
+
+            def feed():
+                try:
+                    for job in jobs:
+                        if not _put(downloads, (tuple(job),), stop):
+                            return
+                finally:
+                    for _ in range(self.download_workers):
+                        _put(downloads, _END, stop)
+
+            threading.Thread(target=feed, daemon=True, name='feeder').start()
+            self._stage('download', self.download_workers, self._download, downloads, encodes,
+                        encode_workers, results)
+            self._stage('encode', encode_workers, encode, encodes, uploads, self.upload_workers, results)
+            self._stage('upload', self.upload_workers, self._upload, uploads, results, 1, results)
+
+            to_delete = []
+            try:
+                while True:
+                    item = results.get()
+                    if item is _END:
+                        break
+                    job, stats, error = item
+                    if error is None and self.delete_source and not self.dry_run and job[0] != job[1]:
+                        # 源文件攒够一批再删除，删除失败的任务在删除后另行报告
+                        to_delete.append((job, stats))
+                    yield job[0], job[1], stats, error
+                    if len(to_delete) >= s3_client.DELETE_BATCH_SIZE:
+                        yield from self._delete_sources(to_delete)
+                        to_delete = []
+                if to_delete:
+                    yield from self._delete_sources(to_delete)
+            finally:
+                stop.set()
+                self.metrics.finished = time.time()
+
+
+def seed_sources(jobs, workers=16):
+    """在本地S3替身上为每个源路径写入一张600x350的合成PNG（只用于离线压测）"""
+    def make(i):
+        image = Image.new('RGB', (600, 350), (236, 232, 224))
+        draw = ImageDraw.Draw(image)
+        for n in range(12):
+            offset = (i * 37 + n * 53) % 600
+            draw.line((offset, 0, 600 - offset, 350), fill=(255, 255, 255), width=6)
+            draw.line((0, (offset * 7) % 350, 600, (offset * 3) % 350), fill=(200, 214, 229), width=10)
+        draw.ellipse((290, 160, 310, 180), fill=(234, 67, 53))
+        output = io.BytesIO()
+        image.save(output, 'PNG')
+        return output.getvalue()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda x: s3_client.upload_bytes(make(x[0]), x[1][0], 'image/png'), enumerate(jobs)))
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print("用法: python3 transcode_pipeline.py <文件列表.json> [--dry-run] [--delete-source] [--seed]")
+        sys.exit(1)
+    with open(args[0], 'r', encoding='utf-8') as f:
+        files = json.load(f)
+    jobs = [(f['path'], image_transcoder.webp_key_for(f['path'])) for f in files]
+
+    if '--seed' in args:
+        if not s3_client.ENDPOINT_URL:
+            print("❌ --seed 只允许在本地S3替身上运行，请设置 S3_ENDPOINT_URL")
+            sys.exit(1)
+        client = s3_client.get_client()
+        try:
+            client.head_bucket(Bucket=s3_client.BUCKET)
+        except s3_client.ClientError:
+            client.create_bucket(
+                Bucket=s3_client.BUCKET,
+                CreateBucketConfiguration={'LocationConstraint': s3_client.REGION}
+            )
+        seed_sources(jobs)
+        print(f"已写入 {len(jobs)} 张合成PNG")
+
+    pipeline = TranscodePipeline(
+        dry_run='--dry-run' in args, delete_source='--delete-source' in args, quality=90
+    )
+    ok = []
+    for source, _, stats, error in pipeline.run(jobs):
+        if error and stats:
+            # 该任务已在上传完成时计入成功
+            print(f"⚠️  {source}: {error}")
+        elif error:
+            print(f"❌ {source}: {error}")
+        else:
+            ok.append(stats)
+    summary = image_transcoder.summarize(ok)
+    print(f"\n{len(ok)}/{len(jobs)} 张成功, {pipeline.metrics.elapsed:.2f} 秒, "
+          f"{len(ok) / pipeline.metrics.elapsed:.1f} 张/秒, 总压缩比 {summary['ratio']}")
+    print(pipeline.metrics.summary())
+
+
+if __name__ == "__main__":
+    main()
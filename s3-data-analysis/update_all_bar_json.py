@@ -1,24 +1,26 @@
 #!/usr/bin/env python3
 import json
-import subprocess
+import os
 import time
 from urllib.parse import urlparse
 
+import s3_client
+
 def download_json(s3_path, local_path):
     """从S3下载JSON文件"""
     print(f"下载 {s3_path}")
-    cmd = ['aws', 's3', 'cp', s3_path, local_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"下载失败: {result.stderr}")
+    try:
+        s3_client.download_file(s3_path, local_path)
+    except Exception as e:
+        raise Exception(f"下载失败: {e}")
 
 def upload_json(local_path, s3_path):
     """上传JSON文件到S3"""
     print(f"上传 {local_path} 到 {s3_path}")
-    cmd = ['aws', 's3', 'cp', local_path, s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"上传失败: {result.stderr}")
+    try:
+        s3_client.upload_file(local_path, s3_path)
+    except Exception as e:
+        raise Exception(f"上传失败: {e}")
 
 def extract_merchant_directory(photo_url):
     """从photos URL中提取商户目录"""
@@ -107,7 +109,7 @@ def main():
         upload_json(env_config['json_file'], env_config['s3_path'])
         
         # 清理本地文件
-        subprocess.run(['rm', env_config['json_file']])
+        os.remove(env_config['json_file'])
     
     # 最终报告
     print("\n" + "="*60)
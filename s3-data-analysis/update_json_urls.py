@@ -1,28 +1,29 @@
 #!/usr/bin/env python3
-import json
 import re
 
+import catalog_stream
+
 def update_urls(json_file, old_prefix, new_prefix):
-    """更新JSON文件中的所有URL"""
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
+    """更新JSON文件中的所有URL（逐条读取、逐条写出，不载入整个文件）"""
     updated_count = 0
     
-    # 遍历所有cafe条目
-    for cafe in data:
-        if 'photos' in cafe and cafe['photos']:
-            # 更新每个photo URL
-            for i, photo_url in enumerate(cafe['photos']):
-                if old_prefix in photo_url:
-                    new_url = photo_url.replace(old_prefix, new_prefix)
-                    cafe['photos'][i] = new_url
-                    updated_count += 1
+    def updated(records):
+        nonlocal updated_count
+        # 遍历所有cafe条目
+        for cafe in records:
+            if 'photos' in cafe and cafe['photos']:
+                # 更新每个photo URL
+                for i, photo_url in enumerate(cafe['photos']):
+                    if old_prefix in photo_url:
+                        new_url = photo_url.replace(old_prefix, new_prefix)
+                        cafe['photos'][i] = new_url
+                        updated_count += 1
+            yield cafe
     
     # 保存更新后的JSON
     output_file = json_file.replace('backup/', 'updated/')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with catalog_stream.open_records(json_file) as records:
+        catalog_stream.save_records(updated(records), output_file)
     
     return updated_count, output_file
 
@@ -53,8 +54,7 @@ def main():
     print("\n\nVerification - Sample URLs from updated files:")
     
     # 检查dev文件
-    with open(file_dev, 'r') as f:
-        dev_data = json.load(f)
+    with catalog_stream.open_records(file_dev) as dev_data:
         print("\nFrom cafes-dev.json (first 3 URLs):")
         count = 0
         for cafe in dev_data:
@@ -68,8 +68,7 @@ def main():
                 break
     
     # 检查prod文件
-    with open(file_prod, 'r') as f:
-        prod_data = json.load(f)
+    with catalog_stream.open_records(file_prod) as prod_data:
         print("\nFrom cafes.json (first 3 URLs):")
         count = 0
         for cafe in prod_data:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+JSON中URL的流式提取
+deep_scan_urls 原来递归遍历整个JSON，每个节点都拼一次路径字符串再把含 http 的字符串追加到列表:
+路径拼接随深度重复复制，深层数据还会触发递归上限。这里改为显式栈迭代，按需逐个产出
+(JSON Pointer, URL)；栈上只记录 (父节点, 键) 链，只有命中的URL才回溯拼出 Pointer（RFC 6901，如 /12/photos/0）。
+extract_records 接 catalog_stream 逐条读出的商户，整个目录文件不必先载入内存。
+
+parse_url 把URL一次解析为 host / bucket / key / album / merchant / file 并缓存，
+相册分布、image-v2 检查、对象key查找等下游分析共用同一份解析结果。
+
+    python3 url_extractor.py current-cafes-dev.json              # 按域名和相册统计
+    python3 url_extractor.py current-cafes-dev.json --verbose    # 列出每个 Pointer 和 URL
+"""
+import sys
+from collections import Counter, namedtuple
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import catalog_stream
+import s3_client
+
+# album: key的第一段；merchant: 商户目录（第二段，尺寸变体等子目录不计）；file: 最后一段
+UrlParts = namedtuple('UrlParts', 'host bucket key album merchant file')
+
+
+def is_url(value):
+    """deep_scan_urls 沿用的判定: 含 cloudfront.net 或 http"""
+    return 'http' in value or 'cloudfront.net' in value
+
+
+def _pointer(node, root):
+    """沿 (父节点, 键) 链回溯拼出 JSON Pointer"""
+    tokens = []
+    while node is not None:
+        node, token = node
+        tokens.append(str(token).replace('~', '~0').replace('/', '~1'))
+    return root + ''.join('/' + t for t in reversed(tokens))
+
+
+def extract_urls(obj, match=is_url, root=''):
+    """按文档顺序逐个产出 (JSON Pointer, URL)；match 为字符串判定函数，root 为Pointer前缀"""
+    stack = [(obj, None)]
+    while stack:
+        value, node = stack.pop()
+        if isinstance(value, str):
+            if match(value):
+                yield _pointer(node, root), value
+        elif isinstance(value, dict):
+            stack.extend(
+                (v, (node, k)) for k, v in reversed(value.items())
+                if isinstance(v, (str, dict, list))
+            )
+        elif isinstance(value, list):
+            stack.extend(
+                (value[i], (node, i)) for i in range(len(value) - 1, -1, -1)
+                if isinstance(value[i], (str, dict, list))
+            )
+
+
+def extract_records(records, match=is_url):
+    """对逐条产出的目录条目（catalog_stream）提取URL，Pointer与在整个数组上调用 extract_urls 相同"""
+    for i, record in enumerate(records):
+        yield from extract_urls(record, match, root=f"/{i}")
+
+
+@lru_cache(maxsize=65536)
+def parse_url(url):
+    """URL（或 s3:// 路径）解析为 UrlParts，相同URL只解析一次"""
+    parsed = urlsplit(url)
+    if parsed.scheme == 's3':
+        host, bucket = '', parsed.netloc
+    else:
+        host, bucket = parsed.netloc, s3_client.BUCKET
+    key = parsed.path.lstrip('/')
+    segments = key.split('/')
+    return UrlParts(
+        host=host,
+        bucket=bucket,
+        key=key,
+        album=segments[0] if len(segments) > 1 else '',
+        merchant=segments[1] if len(segments) > 2 else '',
+        file=segments[-1]
+    )
+
+
+def main():
+    args = sys.argv[1:]
+    files = [a for a in args if not a.startswith('--')]
+    for path in files:
+        hosts = Counter()
+        albums = Counter()
+        total = 0
+        for pointer, url in extract_records(catalog_stream.open_records(path)):
+            parts = parse_url(url)
+            hosts[parts.host] += 1
+            albums[parts.album] += 1
+            total += 1
+            if '--verbose' in args:
+                print(f"  {pointer}: {url}")
+        print(f"{path}: {total} 个URL")
+        for host, count in hosts.most_common():
+            print(f"  域名 {host or '(无)'}: {count}")
+        for album, count in albums.most_common():
+            print(f"  相册 {album or '(无)'}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+目录URL规则检查
+各脚本里零散的URL规则集中声明在 RULES 中:
+    expected-album        URL包含目录文件对应的 /<相册>/（原 audit_all_json_urls.check_url_consistency）
+    cloudfront-host       使用 d2cmxnft4myi1k.cloudfront.net 域名（verify_cowork_fixes）
+    webp                  以 .webp 结尾（verify_cowork_fixes）
+    no-placeid-directory  静态地图不在 商户名_placeId/ 目录下（verify_migration_results）
+    no-image-v2           不再指向 image-v2（find_missed_urls / final_verification）
+
+全部规则按相册编译成一个正则: 每条规则是一个可选的前瞻命名组，对每个URL只做一次 match，
+从命中的组一次得到所有规则的结果。新增规则只是多一个组，不会多一遍扫描。
+对8个目录文件中所有图片URL字段一次遍历，输出每条规则的违规数。
+
+    python3 url_rules.py                       # 全部8个目录文件
+    python3 url_rules.py cowork-dev.json --verbose
+"""
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+import catalog_store
+import url_extractor
+
+CDN_HOST = 'd2cmxnft4myi1k.cloudfront.net'
+# 可能保存图片URL的顶层字段
+IMAGE_FIELDS = (
+    'photos', 'staticMapS3Url', 'photoVariants',
+    'mapUrl', 'coverImage', 'thumbnailUrl', 'logoUrl', 'bannerUrl'
+)
+
+# kind: require 为必须匹配，forbid 为不得匹配；pattern 中的 {album} 替换为目录文件对应的相册；
+# fields 为适用的顶层字段，None 表示全部图片字段
+RULES = [
+    {
+        'name': 'expected-album',
+        'kind': 'require',
+        'pattern': r'.*?/{album}/',
+        'fields': None,
+        'description': '路径包含目录文件对应的相册'
+    },
+    {
+        'name': 'cloudfront-host',
+        'kind': 'require',
+        'pattern': r'https://' + re.escape(CDN_HOST) + '/',
+        'fields': None,
+        'description': f'使用 {CDN_HOST} 域名'
+    },
+    {
+        'name': 'webp',
+        'kind': 'require',
+        'pattern': r'.*?\.webp$',
+        'fields': ('photos', 'staticMapS3Url'),
+        'description': '以 .webp 结尾（尺寸变体有AVIF/JPEG回退，不检查）'
+    },
+    {
+        'name': 'no-placeid-directory',
+        'kind': 'forbid',
+        'pattern': r'.*?/[^/]+_[^/]+/[^/]*static',
+        'fields': ('staticMapS3Url', 'mapUrl'),
+        'description': '静态地图不在旧的 商户名_placeId/ 目录下'
+    },
+    {
+        'name': 'no-image-v2',
+        'kind': 'forbid',
+        'pattern': r'.*?/image-v2/',
+        'fields': None,
+        'description': '不再指向 image-v2'
+    },
+]
+
+
+def rule(name):
+    return next(r for r in RULES if r['name'] == name)
+
+
+class RuleSet:
+    """按相册缓存编译好的组合匹配器"""
+
+    def __init__(self, rules=RULES):
+        self.rules = rules
+        self._matchers = {}
+        self._plans = {}
+
+    def matcher(self, album):
+        """所有规则组合成的正则，每条规则一个可选前瞻组 r<序号>；album为None时跳过含 {album} 的规则"""
+        if album not in self._matchers:
+            groups = []
+            for i, r in enumerate(self.rules):
+                if '{album}' in r['pattern'] and album is None:
+                    continue
+                pattern = r['pattern'].replace('{album}', re.escape(album or ''))
+                groups.append(f"(?=(?P<r{i}>{pattern}))?")
+            self._matchers[album] = re.compile(''.join(groups))
+        return self._matchers[album]
+
+    def _plan(self, field, album):
+        """对该字段生效的规则 [(组名, 规则名, 是否require)]"""
+        key = (field, album)
+        if key not in self._plans:
+            self._plans[key] = [
+                (f"r{i}", r['name'], r['kind'] == 'require')
+                for i, r in enumerate(self.rules)
+                if (r['fields'] is None or field in r['fields'])
+                and not ('{album}' in r['pattern'] and album is None)
+            ]
+        return self._plans[key]
+
+    def violations(self, url, field, album):
+        """url违反的规则名列表"""
+        groups = self.matcher(album).match(url).groupdict()
+        return [name for group, name, require in self._plan(field, album) if (groups[group] is None) == require]
+
+    def applicable(self, field, album):
+        """对该字段生效的规则名"""
+        return [name for _, name, _ in self._plan(field, album)]
+
+
+def image_urls(item):
+    """条目中图片字段的 (顶层字段, JSON Pointer, URL)，photos 为列表，photoVariants 为嵌套字典"""
+    for field in IMAGE_FIELDS:
+        value = item.get(field)
+        if value:
+            for pointer, url in url_extractor.extract_urls(value, match=bool, root=f"/{field}"):
+                yield field, pointer, url
+
+
+def check_catalogs(catalogs, rules=None):
+    """catalogs 为 {目录文件: 条目列表或逐条产出条目的迭代器}，一次遍历全部URL
+    返回 (违规列表 [{catalog, merchant, path, url, rules}], {目录文件: Counter(规则: 违规数)}, {目录文件: Counter(规则: 检查数)})"""
+    rules = rules or RuleSet()
+    violations = []
+    counts = defaultdict(Counter)
+    checked = defaultdict(Counter)
+    for json_file, data in catalogs.items():
+        album = catalog_store.album_for(json_file)
+        for item in data:
+            for field, path, url in image_urls(item):
+                checked[json_file].update(rules.applicable(field, album))
+                broken = rules.violations(url, field, album)
+                if broken:
+                    counts[json_file].update(broken)
+                    violations.append({
+                        'catalog': json_file, 'merchant': item.get('name', 'Unknown'),
+                        'path': path, 'url': url, 'rules': broken
+                    })
+    return violations, counts, checked
+
+
+def check_items(data, json_file=None, rules=None):
+    """单个目录（可以是本地文件内容）的违规列表和规则计数"""
+    violations, counts, checked = check_catalogs({json_file or '': data}, rules)
+    return violations, counts[json_file or ''], checked[json_file or '']
+
+
+def main():
+    args = sys.argv[1:]
+    json_files = [a for a in args if not a.startswith('--')] or catalog_store.CATALOG_FILES
+    # 逐条流式读取，检查时不在内存中保留整个目录文件
+    catalogs = {json_file: catalog_store.stream(json_file) for json_file in json_files}
+
+    start = time.time()
+    violations, counts, checked = check_catalogs(catalogs)
+    total = sum(sum(c.values()) for c in checked.values())
+    print(f"检查 {len(json_files)} 个目录文件, {len(RULES)} 条规则, {total} 次规则判定 ({time.time() - start:.3f} 秒)\n")
+
+    names = [r['name'] for r in RULES]
+    print(f"{'':<20}" + ''.join(f"{name:>22}" for name in names))
+    for json_file in json_files:
+        print(f"{json_file:<20}" + ''.join(
+            f"{f'{counts[json_file][name]}/{checked[json_file][name]}':>22}" for name in names
+        ))
+    print()
+    for r in RULES:
+        violated = sum(counts[json_file][r['name']] for json_file in json_files)
+        print(f"  {'✅' if not violated else '❌'} {r['name']}: {r['description']} — 违规 {violated}")
+
+    if '--verbose' in args:
+        for v in violations:
+            print(f"  {v['catalog']} {v['merchant']} {v['path']}: {', '.join(v['rules'])}\n    {v['url']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+异步CDN URL校验器
+用 httpx 的异步客户端并发发送 HEAD 请求，同一CloudFront域名复用少量长连接（装了 h2 时走HTTP/2多路复用），
+取代逐个URL fork `curl -I -s` 再匹配 `HTTP/2 200` 的做法。并发数有上限，超时/5xx/429 会按指数退避重试，
+每个URL返回一条结构化结果: 状态码、耗时、Content-Type、大小、重试次数、错误。
+
+    python3 url_verifier.py cafes-dev.json bars.json    # 校验目录文件中所有 photos[] 和 staticMapS3Url
+    python3 url_verifier.py --self-test                 # 在本地HTTP服务器上自测
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+import catalog_store
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_CONNECTIONS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # 秒，第n次重试等待 backoff * 2**(n-1)
+DEFAULT_TIMEOUT = 10.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# httpx 的HTTP/2支持依赖 h2 包，没装时退回HTTP/1.1长连接
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+def _result(url, status=None, latency_ms=None, content_type=None, size=None,
+            http_version=None, attempts=0, error=None):
+    return {
+        'url': url,
+        'ok': status == 200,
+        'status': status,
+        'latency_ms': latency_ms,
+        'content_type': content_type,
+        'size': size,
+        'http_version': http_version,
+        'attempts': attempts,
+        'error': error
+    }
+
+
+async def _head(client, semaphore, url, retries, backoff):
+    """对单个URL发HEAD请求，可重试的失败按指数退避重试"""
+    attempt = 0
+    while True:
+        attempt += 1
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.head(url)
+                error = None
+            except httpx.HTTPError as e:
+                response = None
+                error = f"{type(e).__name__}: {e}"
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        retryable = response is None or response.status_code in RETRY_STATUSES
+        if retryable and attempt <= retries:
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+            continue
+
+        if response is None:
+            return _result(url, latency_ms=latency_ms, attempts=attempt, error=error)
+        size = response.headers.get('content-length')
+        return _result(
+            url,
+            status=response.status_code,
+            latency_ms=latency_ms,
+            content_type=response.headers.get('content-type'),
+            size=int(size) if size and size.isdigit() else None,
+            http_version=response.http_version,
+            attempts=attempt
+        )
+
+
+async def verify_urls_async(urls, concurrency=DEFAULT_CONCURRENCY, max_connections=DEFAULT_CONNECTIONS,
+                            retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT):
+    """并发校验一组URL（去重），返回 {url: 结果}"""
+    unique = list(dict.fromkeys(u for u in urls if u))
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=timeout,
+                                 follow_redirects=True) as client:
+        results = await asyncio.gather(*(_head(client, semaphore, url, retries, backoff) for url in unique))
+    return dict(zip(unique, results))
+
+
+def verify_urls(urls, **kwargs):
+    """同步入口，返回 {url: 结果}"""
+    return asyncio.run(verify_urls_async(urls, **kwargs))
+
+
+def is_accessible(url, **kwargs):
+    """单个URL是否返回200"""
+    return verify_urls([url], **kwargs)[url]['ok']
+
+
+def catalog_urls(data):
+    """列出目录中所有 (商户名, 字段, URL)"""
+    entries = []
+    for merchant in data:
+        name = merchant.get('name', 'Unknown')
+        for i, url in enumerate(merchant.get('photos') or []):
+            if url:
+                entries.append((name, f'photos[{i}]', url))
+        if merchant.get('staticMapS3Url'):
+            entries.append((name, 'staticMapS3Url', merchant['staticMapS3Url']))
+    return entries
+
+
+def verify_catalog(json_file, **kwargs):
+    """校验一个目录文件中的所有URL，返回 [(商户名, 字段, 结果)]"""
+    entries = catalog_urls(catalog_store.load(json_file))
+    results = verify_urls([url for _, _, url in entries], **kwargs)
+    return [(name, field, results[url]) for name, field, url in entries]
+
+
+def summarize(results):
+    """汇总结果: 总数、成功数、按状态计数、平均/P95耗时、总大小"""
+    results = list(results)
+    latencies = sorted(r['latency_ms'] for r in results if r['latency_ms'] is not None)
+    by_status = {}
+    for r in results:
+        key = r['status'] if r['status'] is not None else 'error'
+        by_status[key] = by_status.get(key, 0) + 1
+    return {
+        'total': len(results),
+        'ok': sum(1 for r in results if r['ok']),
+        'by_status': by_status,
+        'avg_latency_ms': round(sum(latencies) / len(latencies), 1) if latencies else None,
+        'p95_latency_ms': latencies[int(len(latencies) * 0.95) - 1] if latencies else None,
+        'bytes': sum(r['size'] or 0 for r in results)
+    }
+
+
+def print_summary(label, results):
+    summary = summarize(results)
+    print(f"{label}: {summary['ok']}/{summary['total']} 可访问, 状态 {summary['by_status']}, "
+          f"平均 {summary['avg_latency_ms']} ms, P95 {summary['p95_latency_ms']} ms, "
+          f"共 {summary['bytes'] / 1024 / 1024:.1f} MB")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """支持keep-alive、不打印访问日志的本地静态文件服务；/flaky/ 下的路径第一次请求返回503"""
+    protocol_version = 'HTTP/1.1'
+    flaky_seen = set()
+
+    def do_HEAD(self):
+        if self.path.startswith('/flaky/') and self.path not in self.flaky_seen:
+            self.flaky_seen.add(self.path)
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/flaky/'):
+            self.path = self.path[len('/flaky'):]
+        super().do_HEAD()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def self_test(count=200):
+    """在本地HTTP服务器上校验存在的文件、不存在的URL和第一次返回503需要重试的URL"""
+    root = tempfile.mkdtemp(prefix='url_verifier_')
+    for i in range(count):
+        with open(os.path.join(root, f"{i:04d}.webp"), 'wb') as f:
+            f.write(os.urandom(1024))
+    handler = partial(_QuietHandler, directory=root)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        urls = ([f"{base}/{i:04d}.webp" for i in range(count)]
+                + [f"{base}/missing-{i}.webp" for i in range(5)]
+                + [f"{base}/flaky/{i:04d}.webp" for i in range(5)])
+        start = time.time()
+        results = verify_urls(urls, retries=1, backoff=0.05)
+        elapsed = time.time() - start
+    finally:
+        server.shutdown()
+    print_summary(f"本地服务器 {base}", results.values())
+    print(f"耗时 {elapsed:.2f} 秒, {len(urls) / elapsed:.1f} URLs/sec")
+    assert sum(r['ok'] for r in results.values()) == count + 5
+    assert all(results[f"{base}/flaky/{i:04d}.webp"]['attempts'] == 2 for i in range(5))
+    assert all(results[f"{base}/missing-{i}.webp"]['status'] == 404 for i in range(5))
+    assert all(r['size'] == 1024 for u, r in results.items() if r['ok'])
+
+
+def main():
+    args = sys.argv[1:]
+    if '--self-test' in args:
+        self_test()
+        return
+    json_files = args or catalog_store.CATALOG_FILES
+    print(f"HTTP/2: {'启用' if HTTP2_AVAILABLE else '未安装h2，使用HTTP/1.1长连接'}")
+    for json_file in json_files:
+        start = time.time()
+        checked = verify_catalog(json_file)
+        print_summary(f"{json_file} ({time.time() - start:.1f} 秒)", [r for _, _, r in checked])
+        for name, field, result in checked:
+            if not result['ok']:
+                print(f"  ❌ {name} {field}: {result['status'] or result['error']} {result['url']}")
+
+
+if __name__ == "__main__":
+    main()
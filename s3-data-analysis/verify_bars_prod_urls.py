@@ -1,12 +1,7 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
-def verify_url_accessible(url):
-    """验证URL是否可访问"""
-    cmd = ['curl', '-I', '-s', url]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return 'HTTP/2 200' in result.stdout or 'HTTP/1.1 200' in result.stdout
+import url_verifier
 
 def verify_bars_prod():
     """验证bars.json中新添加商户的URL可访问性"""
@@ -19,6 +14,12 @@ def verify_bars_prod():
     
     target_merchants = ['Hippie Fish Pererenan Beach', 'Miss Fish Bali']
     
+    # 并发校验目标商户的第一张照片和静态地图
+    targets = [m for m in data if m.get('name', '') in target_merchants]
+    results = url_verifier.verify_urls(
+        [(m.get('photos') or [''])[0] for m in targets] + [m.get('staticMapS3Url', '') for m in targets]
+    )
+    
     for merchant in data:
         if merchant.get('name', '') in target_merchants:
             print(f"{merchant['name']}:")
@@ -26,13 +27,13 @@ def verify_bars_prod():
             # 验证第一张照片
             if merchant.get('photos'):
                 first_photo = merchant['photos'][0]
-                accessible = verify_url_accessible(first_photo)
+                accessible = results[first_photo]['ok']
                 print(f"  第一张照片: {'✅' if accessible else '❌'} {first_photo.split('/')[-2]}/photo_a.webp")
             
             # 验证静态地图
             static_url = merchant.get('staticMapS3Url', '')
             if static_url:
-                accessible = verify_url_accessible(static_url)
+                accessible = results[static_url]['ok']
                 print(f"  静态地图: {'✅' if accessible else '❌'} {static_url.split('/')[-2]}/staticmap.webp")
             
             print()
@@ -1,14 +1,10 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
-def verify_url_accessible(url):
-    """验证URL是否可访问"""
-    cmd = ['curl', '-I', '-s', url]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return 'HTTP/2 200' in result.stdout or 'HTTP/1.1 200' in result.stdout
+import url_rules
+import url_verifier
 
-def verify_environment(env_name, json_file_path):
+def verify_environment(env_name, json_file_path, catalog_name):
     """验证环境的修复结果"""
     print(f"\n{'='*60}")
     print(f"验证 {env_name} 环境")
@@ -21,13 +17,16 @@ def verify_environment(env_name, json_file_path):
     success_count = 0
     total_count = 0
     
+    # 并发校验所有静态地图URL
+    results = url_verifier.verify_urls([m.get('staticMapS3Url', '') for m in data])
+    
     for merchant in data:
         merchant_name = merchant.get('name', 'Unknown')
         static_url = merchant.get('staticMapS3Url', '')
         
         if static_url:
             total_count += 1
-            accessible = verify_url_accessible(static_url)
+            accessible = results[static_url]['ok']
             
             if accessible:
                 success_count += 1
@@ -36,20 +35,22 @@ def verify_environment(env_name, json_file_path):
             else:
                 print(f"❌ {merchant_name}")
                 print(f"   URL: {static_url}")
+                print(f"   状态: {results[static_url]['status'] or results[static_url]['error']}")
     
     print(f"\n结果: {success_count}/{total_count} 个URL可访问")
     
-    # 检查URL格式
+    # 检查URL格式（url_rules 规则集一次匹配）
     print("\nURL格式检查:")
-    correct_format = 0
-    for merchant in data:
-        static_url = merchant.get('staticMapS3Url', '')
-        if static_url:
-            # 应该使用正确的CloudFront域名和webp格式
-            if 'd2cmxnft4myi1k.cloudfront.net' in static_url and static_url.endswith('.webp'):
-                correct_format += 1
+    violations, counts, checked = url_rules.check_items(data, catalog_name)
+    for name, total in checked.items():
+        print(f"  {'✅' if not counts[name] else '❌'} {name}: 违规 {counts[name]}/{total}")
+    # 静态地图应该使用正确的CloudFront域名和webp格式
+    wrong_format = sum(
+        1 for v in violations
+        if v['path'] == '/staticMapS3Url' and {'cloudfront-host', 'webp'} & set(v['rules'])
+    )
     
-    print(f"✅ 正确格式: {correct_format}/{total_count}")
+    print(f"✅ 正确格式: {total_count - wrong_format}/{total_count}")
     
     return success_count, total_count
 
@@ -59,13 +60,15 @@ def main():
     # 验证dev环境
     dev_success, dev_total = verify_environment(
         'DEV',
-        '/Users/troy/开发文档/Baliciaga/backend/scripts/cowork-dev_updated.json'
+        '/Users/troy/开发文档/Baliciaga/backend/scripts/cowork-dev_updated.json',
+        'cowork-dev.json'
     )
     
     # 验证prod环境
     prod_success, prod_total = verify_environment(
         'PROD',
-        '/Users/troy/开发文档/Baliciaga/backend/scripts/cowork_updated.json'
+        '/Users/troy/开发文档/Baliciaga/backend/scripts/cowork_updated.json',
+        'cowork.json'
     )
     
     # 总结
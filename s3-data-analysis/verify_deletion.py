@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import subprocess
+import s3_client
 
 # 验证这些目录是否已被删除
 directories_to_check = [
@@ -27,10 +27,7 @@ for env in environments:
         s3_path = base_path + directory
         
         # 尝试列出目录
-        cmd = ['aws', 's3', 'ls', s3_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0 and result.stdout.strip():
+        if next(s3_client.list_objects(s3_path), None) is not None:
             print(f"  ✗ {directory} - 仍然存在")
             all_deleted = False
         else:
@@ -50,19 +47,15 @@ for env in environments:
     print(f"### {env.upper()}环境剩余目录数:")
     base_path = f's3://baliciaga-database/bar-image-{env}/'
     
-    cmd = ['aws', 's3', 'ls', base_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    directories = s3_client.list_directories(base_path)
     
-    if result.returncode == 0:
-        directories = [line.split('PRE', 1)[1].strip() for line in result.stdout.strip().split('\n') if 'PRE' in line]
-        
-        # 检查是否还有非kebab-case格式的目录
-        non_kebab = [d for d in directories if ' ' in d or any(c.isupper() for c in d) or '|' in d]
-        
-        print(f"  总目录数: {len(directories)}")
-        if non_kebab:
-            print(f"  仍有非标准格式目录: {len(non_kebab)}")
-            for d in non_kebab[:3]:
-                print(f"    - {d}")
-        else:
-            print(f"  ✓ 所有目录都是kebab-case格式")
\ No newline at end of file
+    # 检查是否还有非kebab-case格式的目录
+    non_kebab = [d for d in directories if ' ' in d or any(c.isupper() for c in d) or '|' in d]
+    
+    print(f"  总目录数: {len(directories)}")
+    if non_kebab:
+        print(f"  仍有非标准格式目录: {len(non_kebab)}")
+        for d in non_kebab[:3]:
+            print(f"    - {d}")
+    else:
+        print(f"  ✓ 所有目录都是kebab-case格式")
\ No newline at end of file
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
-import subprocess
 import json
 
+import s3_client
+import url_verifier
+
 # 验证修复的6个路径不匹配问题
 fixes_to_verify = [
     {
@@ -49,26 +51,19 @@ old_file_check = {
     'should_exist': False
 }
 
-def check_url_accessible(url):
-    """检查URL是否可访问"""
-    cmd = ['curl', '-I', '-s', url]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return 'HTTP/2 200' in result.stdout or 'HTTP/1.1 200' in result.stdout
-
-def check_s3_file_exists(s3_path):
-    """检查S3文件是否存在"""
-    cmd = ['aws', 's3', 'ls', s3_path]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return result.returncode == 0
-
 print("验证dev环境修复结果")
 print("=" * 80)
 
+# 并发校验所有待验证的URL
+url_results = url_verifier.verify_urls(
+    [fix['expected_url'] for fix in fixes_to_verify] + [teamo_check['expected_url']]
+)
+
 # 1. 验证路径修复
 print("\n1. 验证路径修复（6个）：")
 success_count = 0
 for fix in fixes_to_verify:
-    accessible = check_url_accessible(fix['expected_url'])
+    accessible = url_results[fix['expected_url']]['ok']
     status = "✅" if accessible else "❌"
     print(f"{status} {fix['merchant']}")
     if accessible:
@@ -80,7 +75,7 @@ print(f"\n路径修复成功: {success_count}/{len(fixes_to_verify)}")
 
 # 2. 验证Te'amo静态地图
 print("\n2. 验证新创建的Te'amo静态地图：")
-teamo_accessible = check_url_accessible(teamo_check['expected_url'])
+teamo_accessible = url_results[teamo_check['expected_url']]['ok']
 status = "✅" if teamo_accessible else "❌"
 print(f"{status} {teamo_check['merchant']}")
 if not teamo_accessible:
@@ -88,7 +83,7 @@ if not teamo_accessible:
 
 # 3. 验证旧文件删除
 print("\n3. 验证旧格式文件删除：")
-old_file_exists = check_s3_file_exists(old_file_check['path'])
+old_file_exists = s3_client.object_exists(old_file_check['path'])
 status = "✅" if not old_file_exists else "❌"
 print(f"{status} 旧文件已删除: {old_file_check['path']}")
 